@@ -1,8 +1,13 @@
 # backend/app.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 from routers.upload import router as upload_router
+from routers.stems import router as stems_router
+from services.jobs import get_job_manager, MODEL_WARMUP
+from services.model_registry import get_registry
+from services.metrics import get_metrics
+from services.storage_janitor import get_janitor
 from pathlib import Path
 
 app = FastAPI(title="Music Notation ML Pipeline")
@@ -29,16 +34,48 @@ print(f"[INFO] Stems directory: {STEMS_DIR.absolute()}")
 print(f"[INFO] Stems directory exists: {STEMS_DIR.exists()}")
 print(f"[INFO] Uploads directory: {UPLOAD_DIR.absolute()}")
 
-# Mount stems directory so frontend can access the audio files
-app.mount("/stems", StaticFiles(directory=str(STEMS_DIR)), name="stems")
-
-# Include router
+# Include routers (stems are served with range-request support)
 app.include_router(upload_router)
+app.include_router(stems_router)
+
+@app.on_event("startup")
+async def warm_up_workers():
+    # Spawn pipeline workers and load their models before the first upload
+    if MODEL_WARMUP:
+        get_job_manager().warm_up()
+    # Expire old jobs and keep uploads/stems within their disk budget
+    get_janitor(UPLOAD_DIR, STEMS_DIR).start()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    # Stop pipeline worker processes with the server
+    get_janitor().stop()
+    get_job_manager().shutdown()
 
 @app.get("/")
 async def root():
     return {"message": "Music Separator API is running"}
 
+@app.get("/models")
+async def model_status():
+    """Model load times and memory per process (API process + pipeline workers)"""
+    return {
+        "api": get_registry().stats(),
+        "workers": list(get_job_manager().worker_models.values())
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency/CPU histograms and peak RSS (Prometheus text format)"""
+    manager = get_job_manager()
+    return PlainTextResponse(
+        get_metrics().render({
+            "pipeline_jobs_pending": manager.pending_count(),
+            "pipeline_workers": manager.max_workers,
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
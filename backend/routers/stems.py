@@ -0,0 +1,168 @@
+# backend/routers/stems.py
+"""
+Stem / MusicXML file serving with HTTP range requests
+
+Replaces the StaticFiles mount so <audio> elements can seek and stream
+without downloading whole stems. `?format=` transcodes a stem into another
+encoding on first request (cached next to it), e.g. older float-WAV results
+served as Ogg.
+"""
+
+import os
+import re
+import glob
+import time
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+
+from services.stem_encoding import MEDIA_TYPES, STEM_FORMATS, get_transcoded
+
+router = APIRouter()
+
+STEMS_DIR = Path(__file__).resolve().parents[1] / "stems"
+
+CHUNK_SIZE = 256 * 1024
+CACHE_CONTROL = "public, max-age=3600"
+TOUCH_INTERVAL = 60.0     # seconds between last-access updates of a stems directory
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def _resolve(file_path: str) -> Path:
+    """
+    File under STEMS_DIR (404 for anything outside it or not finished)
+
+    While a job is still running its stems live in a staging directory
+    (.<key>.<id>); final /stems/<key>/... URLs announced in progress events
+    are served from there until the directory is published.
+    """
+    root = STEMS_DIR.resolve()
+    path = (root / file_path).resolve()
+    if root not in path.parents or path.name.endswith(".tmp"):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    if not path.is_file():
+        key, _, rest = path.relative_to(root).as_posix().partition("/")
+        staged = []
+        if rest:
+            staged = [
+                p.resolve() for p in root.glob(f".{glob.escape(key)}.*/{glob.escape(rest)}")
+                if p.is_file() and root in p.resolve().parents
+            ]
+        # Published in the meantime?
+        if not staged and not path.is_file():
+            raise HTTPException(status_code=404, detail="Not found")
+        path = path if path.is_file() else staged[0]
+
+    return path
+
+
+def _touch(path: Path):
+    """Record access on the top-level stems directory (LRU for the storage janitor)"""
+    root = STEMS_DIR.resolve()
+    top = root / path.relative_to(root).parts[0]
+    try:
+        if top.is_dir() and time.time() - top.stat().st_mtime > TOUCH_INTERVAL:
+            os.utime(top, None)
+    except OSError:
+        pass
+
+
+def _parse_range(header: str, size: int):
+    """
+    Single byte range → (start, end) inclusive, or None for the whole file
+
+    Raises:
+        HTTPException(416) for unsatisfiable ranges
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None     # malformed or multi-range: serve the whole file
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _iter_file(path: Path, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@router.api_route("/stems/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_stem(request: Request, file_path: str, fmt: str = Query(None, alias="format")):
+    """Stem or MusicXML file; honours Range, If-Range and If-None-Match"""
+    path = _resolve(file_path)
+    _touch(path)
+
+    if fmt is not None:
+        if fmt not in STEM_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown format '{fmt}' (choose from: {', '.join(STEM_FORMATS)})"
+            )
+        if path.suffix not in MEDIA_TYPES or path.suffix == ".musicxml":
+            raise HTTPException(status_code=400, detail="Only audio stems can be transcoded")
+        try:
+            path = await run_in_threadpool(get_transcoded, path, fmt)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=f"Transcoding failed: {e}")
+
+    stat = path.stat()
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+    }
+    media_type = MEDIA_TYPES.get(path.suffix, "application/octet-stream")
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = _parse_range(range_header, size)
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
@@ -1,16 +1,21 @@
 # backend/routers/upload.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import os
+import json
+import time
+import uuid
+import asyncio
 from pathlib import Path
 
-from services.detect_instruments import detect_all_instruments
-from services.detect_monophonic_instrument import detect_single_instrument
-from services.monophonic.note_segmentation import frames_to_notes
-from services.separate_demucs import separate_polyphonic
-from services.detect_type import detect_type
-from services.monophonic.run_monophonic_pipeline import run_monophonic_pipeline
-from services.monophonic.tempo_beat_estimation import estimate_tempo_and_beats
+from services.jobs import get_job_manager, QueueFullError, JOB_TTL
+from services.progress import read_events
+from services.ingest import MultipartUpload, UploadError, UploadTooLargeError, MAX_UPLOAD_BYTES
+from services.pipeline import process_audio
+from services.monophonic.pitch_payload import PAYLOAD_FORMAT, to_bytes
+from services.monophonic.pitch_pyramid import DEFAULT_RESOLUTION, get_pitch_pyramid
+from services.separate_demucs import SEPARATION_PRESETS, DEFAULT_PRESET
 
 
 router = APIRouter()
@@ -20,87 +25,319 @@ STEMS_DIR = Path("stems")
 UPLOAD_DIR.mkdir(exist_ok=True)
 STEMS_DIR.mkdir(exist_ok=True)
 
+# Server-Sent Events: event log poll interval and keep-alive comment interval
+EVENTS_POLL_INTERVAL = 0.25
+EVENTS_KEEPALIVE = 15.0
+
+# A stream is closed after this long (clients reconnect with Last-Event-ID),
+# and each job serves at most this many streams at once
+EVENTS_MAX_STREAM_SECONDS = float(os.environ.get("EVENTS_MAX_STREAM_SECONDS", 3600))
+MAX_STREAMS_PER_JOB = int(os.environ.get("EVENTS_MAX_STREAMS_PER_JOB", 4))
+
+# job_id → open event streams (only touched from the event loop)
+_open_streams = {}
+
+
+def _check_preset(preset: str):
+    if preset not in SEPARATION_PRESETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown preset '{preset}' (choose from: {', '.join(SEPARATION_PRESETS)})"
+        )
+
+
 @router.post("/upload/")
-async def upload_audio(file: UploadFile = File(...)):
-    """Upload audio, detect type, and process accordingly"""
-    
+async def upload_audio(request: Request):
+    """
+    Upload audio (multipart fields: preset, file) and queue it for processing;
+    poll /jobs/{job_id} for the result
+
+    The body is streamed to disk and hashed as it arrives. If the preset field
+    comes before the file, the job starts once the first seconds of audio are
+    on disk instead of after the whole upload.
+    """
+
+    manager = get_job_manager()
+    if manager.pending_count() >= manager.max_pending:
+        raise HTTPException(status_code=503, detail=f"Job queue is full ({manager.max_pending} pending jobs)")
+
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES // 1024 ** 2} MB")
+
+    upload_id = uuid.uuid4().hex
+    state = {"job_id": None}
+
+    def submit(upload: MultipartUpload, preset: str, streaming: bool) -> str:
+        return manager.submit(
+            process_audio,
+            str(upload.path),
+            str(STEMS_DIR),
+            f"/uploads/{upload.path.name}",
+            preset,
+            streaming_upload=streaming,
+            upload_id=upload_id
+        )
+
+    def early_start(upload: MultipartUpload):
+        # Only when the preset is already known (field sent before the file)
+        if "preset" in upload.fields and upload.fields["preset"] in SEPARATION_PRESETS:
+            state["job_id"] = submit(upload, upload.fields["preset"], streaming=True)
+            print(f"[INFO] Job {state['job_id']} started while upload is still arriving")
+
+    try:
+        upload = MultipartUpload(request.headers.get("content-type", ""), UPLOAD_DIR, upload_id, early_start)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def fail(status_code: int, detail: str):
+        if state["job_id"] is not None:
+            manager.cancel(state["job_id"])
+        upload.abort()
+        return HTTPException(status_code=status_code, detail=detail)
+
     try:
-        # Save uploaded file
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"[INFO] File uploaded: {file_path}")
-        
-        # Detect audio type
-        print("[INFO] Detecting audio type...")
-        audio_type, confidence = detect_type(str(file_path))
-        print(f"[INFO] Detected type: {audio_type} ({confidence*100:.1f}% confidence)")
-        
-        # Decision: Monophonic or Polyphonic?
-        if audio_type == "monophonic":
-            print("[INFO] Monophonic audio detected - skipping stem separation")
-            
-            # Detect the single instrument directly
-            instrument_data = detect_single_instrument(str(file_path))
-            instrument_name = instrument_data.get("instrument", "unknown")
-
-            # Run monophonic preprocessing + pitch extraction
-            pitch_result = run_monophonic_pipeline(
-                audio_path=str(file_path),
-                instrument=instrument_name
-            )
-
-            # Convert pitch frames to note segments
-            import numpy as np
-            times = np.array([p["time"] for p in pitch_result["pitch_points"]])
-            freqs = np.array([p["frequency"] for p in pitch_result["pitch_points"]])
-            confs = np.array([p["confidence"] for p in pitch_result["pitch_points"]])
-            note_segments = frames_to_notes(times, freqs, confs)
-            tempo_data = estimate_tempo_and_beats(str(file_path))
-
-
-            return JSONResponse({
-                "message": "Monophonic audio detected",
-                "type": audio_type,
-                "confidence": float(confidence),
-                "is_monophonic": True,
-                "instrument": instrument_data,
-                "pitch_data": pitch_result,
-                "note_data": {"notes": note_segments},
-                "tempo_data": tempo_data,
-                "audio_file": f"/uploads/{file.filename}"
-            })
-
-        
-        else:  # Polyphonic
-            print("[INFO] Polyphonic audio detected - separating stems with Demucs...")
-            
-            # Separate stems using Demucs
-            stem_paths = separate_polyphonic(str(file_path), output_dir=str(STEMS_DIR))
-            print(f"[INFO] Stems separated: {list(stem_paths.keys())}")
-            
-            # Detect instruments in each stem
-            print("[INFO] Detecting instruments in stems...")
-            instruments = detect_all_instruments(stem_paths)
-            
-            # Create response with relative URLs
-            stems_response = {
-                name: f"/stems/{Path(path).name}" 
-                for name, path in stem_paths.items()
-            }
-            
-            return JSONResponse({
-                "message": "Processing complete",
-                "type": audio_type,
-                "confidence": float(confidence),
-                "is_monophonic": False,
-                "stems": stems_response,
-                "instruments": instruments
-            })
-        
+        async for chunk in request.stream():
+            await run_in_threadpool(upload.write, chunk)
+        await run_in_threadpool(upload.finish)
+    except UploadTooLargeError as e:
+        print(f"[WARNING] Upload rejected: {e}")
+        raise fail(413, str(e))
+    except UploadError as e:
+        raise fail(400, str(e))
+    except QueueFullError as e:
+        print(f"[WARNING] {str(e)}")
+        raise fail(503, str(e))
     except Exception as e:
         print(f"[ERROR] {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        raise fail(500, str(e))
+
+    preset = upload.fields.get("preset", DEFAULT_PRESET)
+    if preset not in SEPARATION_PRESETS:
+        upload.abort()
+        _check_preset(preset)
+
+    print(f"[INFO] File uploaded: {upload.path} ({upload.size} bytes, sha256 {upload.sha256[:12]})")
+
+    try:
+        job_id = state["job_id"] or submit(upload, preset, streaming=False)
+    except QueueFullError as e:
+        print(f"[WARNING] {str(e)}")
+        upload.abort()
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return JSONResponse(
+        {
+            "message": "Upload queued for processing",
+            "job_id": job_id,
+            "status": "queued",
+            "preset": preset,
+            "upload": {
+                "filename": upload.filename,
+                "bytes": upload.size,
+                "sha256": upload.sha256,
+                "duration": upload.duration,
+            },
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result",
+            "events_url": f"/jobs/{job_id}/events",
+            # Job, upload and stem URLs stay valid this long after the job finishes
+            "retention_sec": JOB_TTL
+        },
+        status_code=202
+    )
+
+
+@router.get("/presets")
+async def list_presets():
+    """Available separation presets and their Demucs settings"""
+    return JSONResponse({"default": DEFAULT_PRESET, "presets": SEPARATION_PRESETS})
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Current status of a processing job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return JSONResponse(job)
+
+
+def _finished_result(job_id: str) -> dict:
+    """Result of a finished job; 404 unknown, 500 failed, 409 still queued/running"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    return manager.get_result(job_id)
+
+
+def _pitch_payload(job_id: str) -> dict:
+    """Columnar pitch_data of a finished monophonic job (404 otherwise)"""
+    payload = _finished_result(job_id).get("pitch_data")
+    if not payload or payload.get("format") != PAYLOAD_FORMAT:
+        raise HTTPException(status_code=404, detail="Job has no pitch track")
+    return payload
+
+
+def _sse(event: str, data, event_id=None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events with partial results as the pipeline produces them:
+    status, type, stem, instruments, instrument, pitch_preview, pitch_chunk,
+    notes, tempo, key, quantized_notes — then a final result or error event
+
+    Reconnecting clients (Last-Event-ID) only receive the events they missed.
+    Streams end with a reconnect event after EVENTS_MAX_STREAM_SECONDS, and a
+    job serves at most MAX_STREAMS_PER_JOB of them at once (429 beyond that).
+    """
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if _open_streams.get(job_id, 0) >= MAX_STREAMS_PER_JOB:
+        raise HTTPException(status_code=429, detail=f"Too many event streams for job {job_id}")
+
+    try:
+        last_seq = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_seq = 0
+
+    async def events():
+        # Counted once the stream actually runs, so an abandoned response never leaks a slot
+        if _open_streams.get(job_id, 0) >= MAX_STREAMS_PER_JOB:
+            yield _sse("error", {"detail": "Too many event streams for this job"})
+            return
+        _open_streams[job_id] = _open_streams.get(job_id, 0) + 1
+        try:
+            async for message in _job_events(job_id, request, last_seq):
+                yield message
+        finally:
+            _open_streams[job_id] -= 1
+            if not _open_streams[job_id]:
+                del _open_streams[job_id]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _job_events(job_id: str, request: Request, last_seq: int):
+    """SSE messages of one stream (see stream_job_events)"""
+    manager = get_job_manager()
+    offset = 0
+    last_status = None
+    last_sent = opened = time.monotonic()
+
+    while True:
+        job = manager.get(job_id)
+        # Finished jobs past their TTL are gone for good, even before expire() runs
+        if job is None or (job["expires_at"] is not None and time.time() > job["expires_at"]):
+            yield _sse("error", {"detail": "Job expired"})
+            return
+
+        if job["status"] != last_status:
+            last_status = job["status"]
+            yield _sse("status", {"status": last_status})
+            last_sent = time.monotonic()
+
+        # Read the log after the status check, so nothing emitted before completion is missed
+        new_events, offset = await run_in_threadpool(read_events, job_id, offset)
+        for event in new_events:
+            if event["seq"] <= last_seq:
+                continue
+            yield _sse(event["event"], event["data"], event_id=event["seq"])
+            last_sent = time.monotonic()
+
+        if job["status"] == "done":
+            yield _sse("result", manager.get_result(job_id))
+            return
+        if job["status"] in ("failed", "cancelled"):
+            yield _sse("error", {"status": job["status"], "detail": job["error"]})
+            return
+
+        if await request.is_disconnected():
+            return
+        if time.monotonic() - opened > EVENTS_MAX_STREAM_SECONDS:
+            # EventSource reconnects on its own and resumes from Last-Event-ID
+            yield _sse("reconnect", {"detail": "Stream lifetime reached"})
+            return
+        if time.monotonic() - last_sent > EVENTS_KEEPALIVE:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished job (409 while it is still queued/running)"""
+    return JSONResponse(_finished_result(job_id))
+
+
+@router.get("/jobs/{job_id}/pitch")
+async def get_pitch_range(job_id: str, start: float = None, end: float = None,
+                          resolution: int = DEFAULT_RESOLUTION):
+    """
+    Pitch curve for [start, end) seconds as at most `resolution` min/max/mean buckets,
+    taken from the finest pyramid level that fits
+    """
+    payload = _pitch_payload(job_id)
+    if resolution < 1:
+        raise HTTPException(status_code=400, detail="resolution must be >= 1")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+
+    pyramid = await run_in_threadpool(get_pitch_pyramid, job_id, payload)
+    return JSONResponse(pyramid.query(start, end, resolution))
+
+
+@router.get("/jobs/{job_id}/pitch.bin")
+async def get_pitch_binary(job_id: str):
+    """
+    Full pitch track as raw little-endian float32:
+    frame_count frequencies (NaN = unvoiced) followed by frame_count confidences
+    """
+    payload = _pitch_payload(job_id)
+
+    return Response(
+        content=to_bytes(payload),
+        media_type="application/octet-stream",
+        headers={
+            "X-Frame-Count": str(payload["frame_count"]),
+            "X-Pitch-Start": str(payload["start"]),
+            "X-Pitch-Step": str(payload["step"]),
+            "X-Sample-Rate": str(payload["sample_rate"]),
+        }
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    cancelled = manager.cancel(job_id)
+    return JSONResponse({
+        "job_id": job_id,
+        "cancelled": cancelled,
+        "status": manager.get(job_id)["status"]
+    })
@@ -0,0 +1,99 @@
+# backend/services/audio_buffer.py
+"""
+Decode-once audio container shared by all pipeline stages
+
+The upload is decoded a single time at its native rate; each stage asks for
+the view it needs (mono 16 kHz for CREPE, 22.05 kHz for librosa features,
+44.1 kHz stereo for Demucs) and resampled views are memoized.
+"""
+
+import threading
+
+import numpy as np
+import librosa
+
+
+class AudioBuffer:
+    """Decoded audio with lazily memoized resampled views"""
+
+    def __init__(self, samples: np.ndarray, sr: int, path: str = None):
+        """
+        Args:
+            samples: (channels, n) or (n,) float waveform at native rate
+            sr: native sample rate
+            path: source file (kept for services that still need a path)
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+
+        self.samples = samples
+        self.sr = int(sr)
+        self.path = path
+        self._mono = {}
+        self._channels = {}
+        # Stages may ask for the same view concurrently; resample it once
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str, mono: bool = False) -> "AudioBuffer":
+        """
+        Decode a file once at its native rate
+
+        mono: downmix while decoding (half the memory of stereo; only for
+            callers that never ask for channels())
+        """
+        print(f"[INFO] Decoding audio: {path}")
+        y, sr = librosa.load(path, sr=None, mono=mono)
+        return cls(y, sr, path=str(path))
+
+    @property
+    def num_channels(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        return self.samples.shape[1] / self.sr
+
+    def mono(self, sr: int = None) -> np.ndarray:
+        """
+        Mono waveform at sr (native rate if None)
+
+        The returned array is shared between callers — copy before modifying.
+        """
+        sr = self.sr if sr is None else int(sr)
+
+        with self._lock:
+            if sr not in self._mono:
+                if sr == self.sr:
+                    y = librosa.to_mono(self.samples) if self.num_channels > 1 else self.samples[0]
+                else:
+                    y = librosa.resample(self.mono(), orig_sr=self.sr, target_sr=sr)
+                self._mono[sr] = np.ascontiguousarray(y, dtype=np.float32)
+
+            return self._mono[sr]
+
+    def channels(self, sr: int = None) -> np.ndarray:
+        """
+        (channels, n) waveform at sr (native rate if None)
+
+        The returned array is shared between callers — copy before modifying.
+        """
+        sr = self.sr if sr is None else int(sr)
+
+        if sr == self.sr:
+            return self.samples
+
+        with self._lock:
+            if sr not in self._channels:
+                y = librosa.resample(self.samples, orig_sr=self.sr, target_sr=sr, axis=-1)
+                self._channels[sr] = np.ascontiguousarray(y, dtype=np.float32)
+
+            return self._channels[sr]
+
+
+def as_audio_buffer(audio) -> AudioBuffer:
+    """Accept either a file path or an AudioBuffer"""
+    if isinstance(audio, AudioBuffer):
+        return audio
+    return AudioBuffer.load(str(audio))
@@ -7,11 +7,10 @@ Advanced instrument detection using ensemble of models:
 """
 
 from typing import List, Dict
-from pathlib import Path
 
-from services.models.yamnet_detector import YAMNetDetector
 from services.models.rule_based_detector import RuleBasedDetector
 from services.models.ensemble_detector import EnsembleDetector
+from services.yamnet_batch import YAMNET_SR, SharedYAMNetDetector, score_stems, scores_to_instruments
 
 # Global detector instance (loaded once)
 _ensemble_detector = None
@@ -25,21 +24,12 @@ def get_ensemble_detector():
         
         _ensemble_detector = EnsembleDetector()
         
-        # Try to add YAMNet (primary detector)
+        # Try to add YAMNet (primary detector, shared through the model registry)
         try:
-            # Check if YAMNet model exists locally
-            yamnet_path = Path(__file__).parent.parent / "models" / "yamnet"
-            
-            if yamnet_path.exists():
-                yamnet = YAMNetDetector(model_path=str(yamnet_path))
-                _ensemble_detector.add_detector(yamnet, weight=1.2)  # Higher weight for YAMNet
-                print("[INFO] ✓ YAMNet detector loaded (local model)")
-            else:
-                print("[WARNING] YAMNet model not found locally")
-                print("[INFO] Run 'python save_yamnet.py' to download YAMNet model")
-                yamnet = YAMNetDetector()  # Load from TF Hub
-                _ensemble_detector.add_detector(yamnet, weight=1.2)
-                print("[INFO] ✓ YAMNet detector loaded (from TF Hub)")
+            # Default threshold, not the low one of monophonic detection
+            yamnet = SharedYAMNetDetector()
+            _ensemble_detector.add_detector(yamnet, weight=1.2)  # Higher weight for YAMNet
+            print("[INFO] ✓ YAMNet detector added to ensemble")
                 
         except Exception as e:
             print(f"[WARNING] Could not load YAMNet: {e}")
@@ -62,7 +52,14 @@ class InstrumentDetector:
     """Main instrument detector interface"""
     
     def __init__(self):
-        self.ensemble = get_ensemble_detector()
+        self._ensemble = None
+
+    @property
+    def ensemble(self):
+        """Ensemble detector, loaded on first use (the batched path does not need it)"""
+        if self._ensemble is None:
+            self._ensemble = get_ensemble_detector()
+        return self._ensemble
     
     def detect_instruments_in_stem(self, audio_path: str, stem_name: str) -> List[Dict]:
         """
@@ -98,7 +95,10 @@ class InstrumentDetector:
         
         # Run ensemble detection (both YAMNet and Rule-Based)
         instruments = self.ensemble.detect_instruments(audio_path)
-        
+        return self._filter_melodic(instruments)
+
+    def _filter_melodic(self, instruments: List[Dict]) -> List[Dict]:
+        """Keep melodic instruments for the 'other' stem (top 5)"""
         # Filter out vocals, drums, bass (should be in other stems)
         filtered = []
         exclude_keywords = ['vocal', 'drum', 'bass', 'singing', 'speech', 'voice']
@@ -129,6 +129,43 @@ class InstrumentDetector:
         filtered.sort(key=lambda x: x['confidence'], reverse=True)
         return filtered[:5]
     
+    def detect_instruments_in_stems_batched(self, stem_audio: Dict) -> Dict[str, List[Dict]]:
+        """
+        Detect instruments in all stems with a single batched YAMNet pass
+
+        Args:
+            stem_audio: stem name → AudioBuffer (in-memory Demucs output)
+
+        Returns:
+            Dictionary mapping stem names to detected instruments
+        """
+        print(f"[INFO] Running batched YAMNet on {len(stem_audio)} stems...")
+
+        waveforms = {name: buf.mono(YAMNET_SR) for name, buf in stem_audio.items()}
+        stem_scores = score_stems(waveforms)
+
+        fallbacks = {
+            "drums": self._analyze_drums,
+            "bass": self._analyze_bass,
+            "vocals": self._analyze_vocals,
+        }
+
+        results = {}
+        for stem_name, scores in stem_scores.items():
+            detections = scores_to_instruments(stem_name, scores)
+
+            if stem_name == "other":
+                results[stem_name] = self._filter_melodic(detections)
+            elif detections:
+                results[stem_name] = detections[:5]
+            elif stem_name in fallbacks:
+                # Nothing confident: fall back to what Demucs' stem label implies
+                results[stem_name] = fallbacks[stem_name](None)
+            else:
+                results[stem_name] = [{'instrument': stem_name, 'confidence': 0.5, 'category': 'unknown'}]
+
+        return results
+
     def _analyze_drums(self, audio_path: str) -> List[Dict]:
         """Analyze drum stem - simple fixed detection"""
         return [{
@@ -184,21 +221,45 @@ def detect_all_instruments(stem_paths: Dict[str, str]) -> Dict[str, List[Dict]]:
         
         instruments = detector.detect_instruments_in_stem(stem_path, stem_name)
         all_instruments[stem_name] = instruments
-        
-        print(f"\n[RESULT] {stem_name} stem: Found {len(instruments)} instrument(s)")
-        for inst in instruments:
-            sources = inst.get('sources', ['Unknown'])
-            detectors = inst.get('detectors_agreed', 1)
-            
-            print(f"  • {inst['instrument']:20s} ({inst['confidence']*100:5.1f}% confidence)")
-            print(f"    Category: {inst.get('category', 'unknown'):15s}")
-            print(f"    Detected by: {', '.join(sources)} ({detectors} detector(s) agreed)")
-            
-            if 'characteristics' in inst:
-                print(f"    Info: {inst['characteristics']}")
+        _print_stem_result(stem_name, instruments)
     
     print(f"\n{'='*60}")
     print("Instrument detection complete!")
     print(f"{'='*60}\n")
     
-    return all_instruments
\ No newline at end of file
+    return all_instruments
+
+
+def detect_all_instruments_batched(stem_audio: Dict) -> Dict[str, List[Dict]]:
+    """
+    Detect instruments in all stems from in-memory audio (one YAMNet pass)
+    
+    Args:
+        stem_audio: Dictionary mapping stem names to AudioBuffers
+        
+    Returns:
+        Dictionary mapping stem names to detected instruments
+    """
+    detector = InstrumentDetector()
+    all_instruments = detector.detect_instruments_in_stems_batched(stem_audio)
+    
+    for stem_name, instruments in all_instruments.items():
+        _print_stem_result(stem_name, instruments)
+    
+    print("\n[INFO] Batched instrument detection complete!")
+    
+    return all_instruments
+
+
+def _print_stem_result(stem_name: str, instruments: List[Dict]):
+    print(f"\n[RESULT] {stem_name} stem: Found {len(instruments)} instrument(s)")
+    for inst in instruments:
+        sources = inst.get('sources', ['Unknown'])
+        detectors = inst.get('detectors_agreed', 1)
+        
+        print(f"  • {inst['instrument']:20s} ({inst['confidence']*100:5.1f}% confidence)")
+        print(f"    Category: {inst.get('category', 'unknown'):15s}")
+        print(f"    Detected by: {', '.join(sources)} ({detectors} detector(s) agreed)")
+        
+        if 'characteristics' in inst:
+            print(f"    Info: {inst['characteristics']}")
\ No newline at end of file
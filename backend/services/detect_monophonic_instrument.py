@@ -4,26 +4,28 @@ Detect instrument in monophonic audio using YAMNet
 Only runs after CREPE confirms it's monophonic
 """
 
-from services.models.yamnet_detector import YAMNetDetector
+from services.model_registry import YAMNET_CONFIDENCE_THRESHOLD
+from services.yamnet_batch import SharedYAMNetDetector
 
-def detect_single_instrument(audio_path: str) -> dict:
+def detect_single_instrument(audio) -> dict:
     """
     Use YAMNet to identify the instrument in monophonic audio
     
     Args:
-        audio_path: Path to the monophonic audio file
+        audio: Path to the monophonic audio file, or its AudioBuffer
         
     Returns:
         dict with instrument details from YAMNet
     """
     print("[INFO] Running YAMNet for monophonic instrument detection...")
-    
+
     try:
-        # Initialize YAMNet detector
-        detector = YAMNetDetector(confidence_threshold=0.001)
-        
+        # Shared YAMNet model (loaded once per process), threshold 0.001; an
+        # AudioBuffer is scored from its 16 kHz view (shared with CREPE)
+        detector = SharedYAMNetDetector(confidence_threshold=YAMNET_CONFIDENCE_THRESHOLD)
+
         # Detect instruments using YAMNet in MONOPHONIC MODE
-        detections = detector.detect_instruments(audio_path, monophonic_mode=True)
+        detections = detector.detect_instruments(audio, monophonic_mode=True)
         
         if not detections:
             print("[WARNING] YAMNet found no instruments, using fallback")
@@ -1,9 +1,6 @@
 #backend/services/detect_monophonic_yamnet.py
 
-from services.models.yamnet_detector import YAMNetDetector
-
-# Load YAMNet ONCE (important for speed)
-yamnet = YAMNetDetector(model_path="../models/yamnet")
+from services.yamnet_batch import SharedYAMNetDetector
 
 
 def detect_monophonic_instrument(audio_path: str) -> dict:
@@ -11,6 +8,8 @@ def detect_monophonic_instrument(audio_path: str) -> dict:
     Identify instrument in MONOPHONIC audio using YAMNet
     """
 
+    # Shared model: loaded ONCE per process (important for speed); default threshold
+    yamnet = SharedYAMNetDetector()
     results = yamnet.detect_instruments(audio_path)
 
     if not results:
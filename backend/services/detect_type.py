@@ -7,19 +7,65 @@ SAFE for flute, violin, solo voice
 ~10x faster than naive CREPE usage
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import librosa
 import numpy as np
+import soundfile as sf
 import crepe
 
+from services.audio_buffer import AudioBuffer
+from services.model_registry import get_model
+
+# Analysis window for the mono/poly decision
+ANALYSIS_SR = 22050
+ANALYSIS_DURATION = 5.0
+
+# Long inputs: vote over several windows spread across the track
+ANALYSIS_WINDOWS = 4
+MULTI_WINDOW_MIN_DURATION = 30.0
+WINDOW_WORKERS = 4
+
+# Shared STFT for all spectral features
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Harmonic-peak analysis
+PEAK_FRAMES = 48            # frames sampled for peak picking
+MAX_PEAKS = 8               # strongest peaks per frame
+PEAK_REL_HEIGHT = 0.03      # ~ -30 dB below the frame maximum
+HARMONIC_TOLERANCE = 0.12   # allowed deviation from an integer harmonic ratio
+
+# First-stage thresholds (outside them CREPE decides)
+FAST_MONO_HARMONICITY = 0.85
+FAST_POLY_HARMONICITY = 0.45
+FAST_MAX_FLATNESS = 0.05
+
+# CREPE settings for the mono/poly decision (also part of the result cache key)
+CREPE_MODEL_CAPACITY = "small"
+CREPE_STEP_SIZE = 30      # was 10 → 3x faster
+
+_crepe_lock = threading.Lock()
+
 
 # ============================================================
 # PUBLIC API
 # ============================================================
 
-def detect_type(audio_path: str) -> tuple:
+def detect_type(audio, use_fast_path: bool = True, windows: int = None,
+                raise_errors: bool = False) -> tuple:
     """
     Detect if audio is monophonic or polyphonic
 
+    Args:
+        audio: file path or already-decoded AudioBuffer
+        use_fast_path: decide confident cases from spectral features alone,
+            running CREPE only for the ambiguous band
+        windows: number of analysis windows spread across the track
+            (default: ANALYSIS_WINDOWS for long inputs, 1 otherwise)
+        raise_errors: propagate failures instead of defaulting to polyphonic
+
     Returns:
         (type_string, confidence)
     """
@@ -27,85 +73,297 @@ def detect_type(audio_path: str) -> tuple:
     try:
         print("[INFO] Analyzing audio characteristics...")
 
-        # ✅ Only 5 seconds is enough for mono/poly decision
-        y, sr = librosa.load(audio_path, sr=22050, mono=True, duration=5.0)
+        duration = _duration(audio)
+        if windows is None:
+            windows = ANALYSIS_WINDOWS if duration >= MULTI_WINDOW_MIN_DURATION else 1
 
-        features = _extract_features(y, sr)
-        audio_type, confidence = _classify_audio(features)
+        offsets = _window_offsets(duration, windows)
+        if len(offsets) == 1:
+            # ✅ Only 5 seconds is enough for a short clip
+            y, sr = _load_window(audio, offsets[0])
+            return _classify_window(y, sr, use_fast_path)
 
-        print(f"[INFO] Classification: {audio_type} ({confidence*100:.1f}%)")
-        print(
-            f"[DEBUG] CREPE pitch_presence={features['pitch_presence_ratio']:.2f}, "
-            f"pitch_stability={features['pitch_stability']:.1f}, "
-            f"percussive_ratio={features['percussive_ratio']:.2f}"
-        )
+        # Long input: several short windows, scored in parallel, then voted
+        print(f"[INFO] Sampling {len(offsets)} windows of {ANALYSIS_DURATION:.0f}s "
+              f"across {duration:.0f}s")
+
+        with ThreadPoolExecutor(max_workers=min(WINDOW_WORKERS, len(offsets))) as pool:
+            clips = list(pool.map(lambda offset: _load_window(audio, offset), offsets))
+            votes = list(pool.map(lambda clip: _classify_window(*clip, use_fast_path), clips))
+
+        for offset, (audio_type, confidence) in zip(offsets, votes):
+            print(f"[DEBUG] Window @ {offset:.0f}s → {audio_type} ({confidence*100:.1f}%)")
+
+        audio_type, confidence = _aggregate_votes(votes)
+        print(f"[INFO] Classification (vote): {audio_type} ({confidence*100:.1f}%)")
 
         return audio_type, confidence
 
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"[WARNING] detect_type failed: {e}")
         return "polyphonic", 0.75
 
 
+def _classify_window(y, sr, use_fast_path=True):
+    """Mono/poly decision for one analysis window"""
+
+    features = _spectral_features(y, sr)
+
+    # ⚡ Stage 1: cheap spectral decision
+    if use_fast_path:
+        decision = _quick_classify(features)
+        if decision is not None:
+            audio_type, confidence = decision
+            print(f"[INFO] Classification (fast path): {audio_type} ({confidence*100:.1f}%)")
+            print(
+                f"[DEBUG] harmonicity={features['harmonicity']:.2f}, "
+                f"flatness={features['spectral_flatness']:.3f}, "
+                f"percussive_ratio={features['percussive_ratio']:.2f}"
+            )
+            return audio_type, confidence
+
+    # Stage 2: ambiguous → add CREPE pitch features
+    features = _extract_features(y, sr, features)
+    audio_type, confidence = _classify_audio(features)
+
+    print(f"[INFO] Classification: {audio_type} ({confidence*100:.1f}%)")
+    print(
+        f"[DEBUG] CREPE pitch_presence={features['pitch_presence_ratio']:.2f}, "
+        f"pitch_stability={features['pitch_stability']:.1f}, "
+        f"percussive_ratio={features['percussive_ratio']:.2f}"
+    )
+
+    return audio_type, confidence
+
+
+def _aggregate_votes(votes):
+    """
+    Confidence-weighted vote over windows
+
+    The winner's confidence is its mean window confidence scaled by the
+    share of the total vote weight it received (ties → polyphonic).
+    """
+    weight = {"monophonic": 0.0, "polyphonic": 0.0}
+    for audio_type, confidence in votes:
+        weight[audio_type] += confidence
+
+    winner = "monophonic" if weight["monophonic"] > weight["polyphonic"] else "polyphonic"
+    winner_conf = [c for t, c in votes if t == winner]
+    if not winner_conf:
+        return "polyphonic", 0.65
+
+    agreement = weight[winner] / (sum(weight.values()) + 1e-10)
+    return winner, round(float(np.mean(winner_conf) * agreement), 3)
+
+
+# ============================================================
+# PARTIAL DECODING
+# ============================================================
+
+def _duration(audio) -> float:
+    """Track length in seconds without decoding the samples"""
+    if isinstance(audio, AudioBuffer):
+        return audio.duration
+    try:
+        return sf.info(str(audio)).duration
+    except RuntimeError:
+        return librosa.get_duration(path=str(audio))
+
+
+def _window_offsets(duration: float, windows: int):
+    """Start times of evenly spread windows, first one at the very start"""
+    if windows <= 1 or duration <= ANALYSIS_DURATION * windows:
+        return [0.0]
+    return list(np.linspace(0.0, duration - ANALYSIS_DURATION, windows))
+
+
+def _load_window(audio, offset: float):
+    """
+    Decode ANALYSIS_DURATION seconds at offset as mono ANALYSIS_SR
+
+    Files are read by seeking (soundfile), so only the window is decoded;
+    formats soundfile cannot seek fall back to librosa's offset/duration load.
+    """
+    sr = ANALYSIS_SR
+
+    if isinstance(audio, AudioBuffer):
+        # Resample only the window, not the whole track
+        start = int(offset * audio.sr)
+        clip = audio.samples[:, start:start + int(ANALYSIS_DURATION * audio.sr)]
+        y = librosa.to_mono(clip) if audio.num_channels > 1 else clip[0]
+        return librosa.resample(y, orig_sr=audio.sr, target_sr=sr), sr
+
+    try:
+        with sf.SoundFile(str(audio)) as f:
+            f.seek(int(offset * f.samplerate))
+            clip = f.read(int(ANALYSIS_DURATION * f.samplerate), dtype="float32", always_2d=True)
+            native_sr = f.samplerate
+        y = clip.mean(axis=1)
+        return librosa.resample(y, orig_sr=native_sr, target_sr=sr), sr
+    except RuntimeError:
+        y, sr = librosa.load(audio, sr=sr, mono=True, offset=offset, duration=ANALYSIS_DURATION)
+        return y, sr
+
+
 # ============================================================
 # FEATURE EXTRACTION
 # ============================================================
 
-def _extract_features(y, sr):
+def _spectral_features(y, sr):
     """
-    Extract mono/poly relevant features
+    Cheap features that all come from one STFT:
+    HPSS energy ratios, onsets/rhythm, spectral flatness, harmonic peaks
     """
 
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
     # --------------------------------
-    # HPSS (Percussion detection)
+    # HPSS (Percussion detection) on the shared magnitude spectrogram
     # --------------------------------
-    y_harm, y_perc = librosa.effects.hpss(y, margin=2.0)
+    H, P = librosa.decompose.hpss(S, margin=2.0)
 
-    harm_energy = np.sum(y_harm ** 2)
-    perc_energy = np.sum(y_perc ** 2)
+    harm_energy = np.sum(H ** 2)
+    perc_energy = np.sum(P ** 2)
     total = harm_energy + perc_energy + 1e-10
 
-    harmonic_ratio = harm_energy / total
-    percussive_ratio = perc_energy / total
-
-    # 🔥 EARLY EXIT: strong percussion → polyphonic
-    if percussive_ratio > 0.35:
-        return {
-            'harmonic_ratio': harmonic_ratio,
-            'percussive_ratio': percussive_ratio,
-            'onset_density': 10.0,
-            'rhythmic_strength': 0.5,
-            'pitch_presence_ratio': 0.0,
-            'pitch_stability': 999.0,
-        }
-
     # --------------------------------
-    # Onset density
+    # Onset density + rhythm strength from one onset envelope
     # --------------------------------
-    onsets = librosa.onset.onset_detect(y=y, sr=sr)
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr))
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+
+    onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
     onset_density = len(onsets) / (len(y) / sr)
 
-    # --------------------------------
-    # Rhythm strength
-    # --------------------------------
-    tempogram = librosa.feature.tempogram(y=y, sr=sr)
+    tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
     rhythmic_strength = np.mean(np.max(tempogram, axis=0))
 
     # --------------------------------
-    # CREPE pitch analysis (OPTIMIZED)
+    # Tonal vs noisy, single vs multiple harmonic series
     # --------------------------------
-    pitch_presence_ratio, pitch_stability = _crepe_pitch_analysis(y, sr)
+    spectral_flatness = float(np.mean(librosa.feature.spectral_flatness(S=S)))
+    harmonicity, peak_count = _harmonic_peak_stats(H, sr)
 
     return {
-        'harmonic_ratio': harmonic_ratio,
-        'percussive_ratio': percussive_ratio,
+        'harmonic_ratio': harm_energy / total,
+        'percussive_ratio': perc_energy / total,
         'onset_density': onset_density,
         'rhythmic_strength': rhythmic_strength,
-        'pitch_presence_ratio': pitch_presence_ratio,
-        'pitch_stability': pitch_stability,
+        'spectral_flatness': spectral_flatness,
+        'harmonicity': harmonicity,
+        'harmonic_peak_count': peak_count,
     }
 
 
+def _harmonic_peak_stats(H, sr):
+    """
+    How well the strongest spectral peaks fit ONE harmonic series
+
+    Returns:
+        harmonicity: mean fraction of peaks at integer multiples of the lowest peak
+        peak_count: median number of prominent peaks per frame
+    """
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
+    frame_energy = H.sum(axis=0)
+    if frame_energy.max() <= 0:
+        return 0.0, 0.0
+
+    active = np.flatnonzero(frame_energy > 0.1 * frame_energy.max())
+    frames = active[np.linspace(0, len(active) - 1, min(PEAK_FRAMES, len(active))).astype(int)]
+
+    scores = []
+    counts = []
+    for t in frames:
+        spec = H[:, t]
+        is_peak = (
+            (spec[1:-1] > spec[:-2])
+            & (spec[1:-1] >= spec[2:])
+            & (spec[1:-1] > spec.max() * PEAK_REL_HEIGHT)
+        )
+        idx = np.flatnonzero(is_peak) + 1
+        idx = idx[freqs[idx] >= 50.0]
+        if len(idx) < 2:
+            continue
+
+        # Strongest peaks only, in ascending frequency
+        idx = idx[np.argsort(spec[idx])[::-1][:MAX_PEAKS]]
+        peak_freqs = np.sort(freqs[idx])
+
+        ratios = peak_freqs / peak_freqs[0]
+        on_series = np.abs(ratios - np.round(ratios)) < HARMONIC_TOLERANCE
+
+        scores.append(np.mean(on_series))
+        counts.append(len(idx))
+
+    if not scores:
+        return 0.0, 0.0
+
+    return float(np.mean(scores)), float(np.median(counts))
+
+
+def _extract_features(y, sr, spectral=None):
+    """
+    Extract mono/poly relevant features (spectral + CREPE)
+    """
+
+    f = dict(spectral) if spectral is not None else _spectral_features(y, sr)
+
+    # 🔥 EARLY EXIT: strong percussion → polyphonic
+    if f['percussive_ratio'] > 0.35:
+        f.update({
+            'onset_density': 10.0,
+            'rhythmic_strength': 0.5,
+            'pitch_presence_ratio': 0.0,
+            'pitch_stability': 999.0,
+        })
+        return f
+
+    # --------------------------------
+    # CREPE pitch analysis (OPTIMIZED)
+    # --------------------------------
+    pitch_presence_ratio, pitch_stability = _crepe_pitch_analysis(y, sr)
+
+    f['pitch_presence_ratio'] = pitch_presence_ratio
+    f['pitch_stability'] = pitch_stability
+    return f
+
+
+# ============================================================
+# FAST FIRST-STAGE CLASSIFIER
+# ============================================================
+
+def _quick_classify(f):
+    """
+    Decide confident cases without CREPE
+
+    Returns:
+        (type_string, confidence) or None for the ambiguous band
+    """
+
+    # Strong percussion → polyphonic (CREPE was never consulted here)
+    if f['percussive_ratio'] > 0.35:
+        return "polyphonic", 0.9
+
+    # One clean harmonic series, little percussion/noise → monophonic
+    if (
+        f['harmonicity'] >= FAST_MONO_HARMONICITY
+        and f['percussive_ratio'] < 0.1
+        and f['spectral_flatness'] < FAST_MAX_FLATNESS
+        and f['onset_density'] < 6.0
+    ):
+        return "monophonic", 0.9
+
+    # Peaks from several unrelated series, or rhythmic + percussive → polyphonic
+    if f['harmonicity'] <= FAST_POLY_HARMONICITY and f['harmonic_peak_count'] >= 4:
+        return "polyphonic", 0.9
+    if f['percussive_ratio'] > 0.25 and f['rhythmic_strength'] > 0.3:
+        return "polyphonic", 0.9
+
+    return None
+
+
 # ============================================================
 # CREPE ANALYSIS (FAST VERSION)
 # ============================================================
@@ -124,15 +382,19 @@ def _crepe_pitch_analysis(y, sr):
         y = librosa.resample(y, orig_sr=sr, target_sr=16000)
         sr = 16000
 
-    # ⚡ FAST SETTINGS
-    time, freq, conf, _ = crepe.predict(
-        y,
-        sr,
-        model_capacity="small",
-        step_size=30,      # was 10 → 3x faster
-        viterbi=False,     # disable smoothing (classification only)
-        verbose=0
-    )
+    # Loads the CREPE network once per process; crepe.predict reuses it
+    get_model(f"crepe_{CREPE_MODEL_CAPACITY}")
+
+    # ⚡ FAST SETTINGS (one window at a time: the shared Keras model is not thread-safe)
+    with _crepe_lock:
+        time, freq, conf, _ = crepe.predict(
+            y,
+            sr,
+            model_capacity=CREPE_MODEL_CAPACITY,
+            step_size=CREPE_STEP_SIZE,
+            viterbi=False,     # disable smoothing (classification only)
+            verbose=0
+        )
 
     valid = conf > 0.6
     pitch_presence_ratio = np.sum(valid) / len(conf)
@@ -0,0 +1,253 @@
+# backend/services/ingest.py
+"""
+Streaming upload ingestion
+
+The multipart body is parsed chunk by chunk as it arrives: the audio part is
+written to a unique per-job path (as <name>.part, renamed when complete) and
+hashed on the fly, size and duration limits are enforced as soon as they can
+be checked, and a callback fires once the first EARLY_START_BYTES are on disk
+so processing can start while the rest is still arriving.
+"""
+
+import os
+import re
+import time
+import hashlib
+from pathlib import Path
+
+import soundfile as sf
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Limits (bytes / seconds)
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 1024 ** 3))
+MAX_UPLOAD_DURATION = float(os.environ.get("UPLOAD_MAX_DURATION", 3600))
+
+# Start the job once this much audio is on disk (a few seconds of typical audio)
+EARLY_START_BYTES = int(os.environ.get("UPLOAD_EARLY_START_BYTES", 2 * 1024 ** 2))
+
+# How long a worker waits for an upload that is still arriving
+UPLOAD_WAIT_TIMEOUT = 600.0
+UPLOAD_POLL_INTERVAL = 0.1
+
+# Text form fields are small; anything bigger is rejected
+MAX_FIELD_BYTES = 1024
+
+HASH_SUFFIX = ".sha256"
+PART_SUFFIX = ".part"
+
+
+class UploadError(Exception):
+    """Malformed upload (maps to HTTP 400)"""
+
+
+class UploadTooLargeError(UploadError):
+    """Upload exceeds the size or duration limit (maps to HTTP 413)"""
+
+
+def safe_filename(name: str) -> str:
+    """Strip directories and unusual characters from a client filename"""
+    name = Path(name or "upload").name
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._")
+    return name[:120] or "upload"
+
+
+def probe_duration(path):
+    """Duration from the file header without decoding (None if unknown)"""
+    try:
+        info = sf.info(str(path))
+    except RuntimeError:
+        return None
+    return info.duration if info.frames > 0 else None
+
+
+def check_duration(path):
+    """Raise UploadTooLargeError if the header reports a too-long file"""
+    duration = probe_duration(path)
+    if duration is not None and duration > MAX_UPLOAD_DURATION:
+        raise UploadTooLargeError(
+            f"Audio is {duration:.0f}s long (limit {MAX_UPLOAD_DURATION:.0f}s)"
+        )
+    return duration
+
+
+class MultipartUpload:
+    """
+    Incremental multipart/form-data receiver
+
+    Usage:
+        upload = MultipartUpload(content_type, upload_dir, job_id, on_early_start)
+        for chunk in body: upload.write(chunk)
+        upload.finish()
+    """
+
+    def __init__(self, content_type: str, upload_dir: Path, job_id: str, on_early_start=None):
+        content_type, params = parse_options_header(content_type)
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadError("Expected multipart/form-data")
+
+        self.upload_dir = Path(upload_dir)
+        self.job_id = job_id
+        self.on_early_start = on_early_start
+
+        self.fields = {}
+        self.filename = None
+        self.path = None
+        self.sha256 = None
+        self.size = 0
+        self.duration = None
+
+        self._hash = hashlib.sha256()
+        self._file = None
+        self._early_started = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._current = None     # ("file", None) or ("field", name)
+        self._field_data = b""
+
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    @property
+    def part_path(self):
+        return self.path.with_name(self.path.name + PART_SUFFIX) if self.path else None
+
+    def write(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def finish(self):
+        """Complete the upload: checks, hash sidecar, atomic rename"""
+        self._parser.finalize()
+        if self.path is None or self.size == 0:
+            raise UploadError("No audio file in upload")
+
+        # Always probe the complete file: the early-start probe saw only a prefix
+        # (a partial MP3/OGG reports the duration of the bytes written so far)
+        self.duration = check_duration(self.part_path)
+
+        self.sha256 = self._hash.hexdigest()
+        self.path.with_name(self.path.name + HASH_SUFFIX).write_text(self.sha256)
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        """Remove everything written for this upload"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None:
+            for path in (self.part_path, self.path, self.path.with_name(self.path.name + HASH_SUFFIX)):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    # --------------------------------
+    # Parser callbacks
+    # --------------------------------
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+
+        if name == "file" and filename is not None:
+            if self.path is not None:
+                raise UploadError("Only one file per upload")
+            self.filename = safe_filename(filename.decode("utf-8", "replace"))
+            self.path = self.upload_dir / f"{self.job_id}_{self.filename}"
+            self._file = open(self.part_path, "wb")
+            self._current = ("file", None)
+        else:
+            self._current = ("field", name)
+            self._field_data = b""
+
+    def _on_part_data(self, data, start, end):
+        chunk = data[start:end]
+
+        if self._current[0] == "field":
+            self._field_data += chunk
+            if len(self._field_data) > MAX_FIELD_BYTES:
+                raise UploadError(f"Form field '{self._current[1]}' is too large")
+            return
+
+        self.size += len(chunk)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise UploadTooLargeError(f"Upload exceeds {MAX_UPLOAD_BYTES // 1024 ** 2} MB")
+
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+        if not self._early_started and self.size >= EARLY_START_BYTES:
+            self._early_started = True
+            self._file.flush()
+            # Header-only formats (WAV/FLAC/AIFF) already know the full duration,
+            # so too-long files are rejected before the job starts; finish()
+            # probes again once the whole file is on disk
+            check_duration(self.part_path)
+            if self.on_early_start is not None:
+                self.on_early_start(self)
+
+    def _on_part_end(self):
+        if self._current and self._current[0] == "file":
+            self._file.close()
+            self._file = None
+        elif self._current:
+            self.fields[self._current[1]] = self._field_data.decode("utf-8", "replace")
+        self._current = None
+
+
+# ============================================================
+# WORKER SIDE
+# ============================================================
+
+def wait_for_upload(path, timeout: float = UPLOAD_WAIT_TIMEOUT):
+    """
+    Block until a streaming upload has been renamed into place
+
+    Raises:
+        RuntimeError if the upload was aborted or did not finish in time
+    """
+    path = Path(path)
+    part = path.with_name(path.name + PART_SUFFIX)
+    deadline = time.monotonic() + timeout
+
+    while not path.exists():
+        # The rename may land between the two checks: only both missing means aborted
+        if not part.exists() and not path.exists():
+            raise RuntimeError(f"Upload aborted: {path.name}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Upload did not finish within {timeout:.0f}s: {path.name}")
+        time.sleep(UPLOAD_POLL_INTERVAL)
+
+
+def read_upload_hash(path):
+    """sha256 of the raw upload computed during ingestion (None if absent)"""
+    try:
+        return Path(str(path) + HASH_SUFFIX).read_text().strip() or None
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,274 @@
+# backend/services/jobs.py
+"""
+Background job queue for the heavy audio pipeline
+Jobs run in a bounded process pool so the API event loop never blocks
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+from services.metrics import get_metrics
+from services.progress import run_with_events, delete_events, job_started
+from services.result_cache import get_result_cache
+from services.model_registry import warm_up_models, model_stats
+
+# Worker count: each worker holds its own copy of Demucs/CREPE/YAMNet, so keep it small
+MAX_WORKERS = int(os.environ.get("PIPELINE_WORKERS", max(1, min(2, os.cpu_count() or 1))))
+
+# Reject new uploads once this many jobs are waiting or running
+MAX_PENDING_JOBS = int(os.environ.get("PIPELINE_MAX_PENDING", 16))
+
+# Finished jobs (and the uploads/stems they reference) are kept this long
+JOB_TTL = float(os.environ.get("JOB_TTL_SECONDS", 24 * 3600))
+
+# Load all models in each worker when it starts (instead of on the first upload)
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+def _init_worker():
+    """Worker process initializer"""
+    if MODEL_WARMUP:
+        warm_up_models()
+
+
+class JobManager:
+    """Tracks pipeline jobs submitted to a process pool"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING_JOBS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._jobs = {}
+        self.worker_models = {}   # pid → model registry stats reported by warm-up
+        self._lock = threading.RLock()  # cancel() may run the done-callback inline
+
+    def _get_executor(self):
+        """Start the worker pool on first use"""
+        if self._executor is None:
+            print(f"[INFO] Starting pipeline worker pool ({self.max_workers} worker(s))...")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def warm_up(self):
+        """
+        Start every worker now so models are loaded before the first upload
+
+        The worker initializer does the loading; the submitted tasks only
+        report each worker's model stats once it is up.
+        """
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(model_stats).add_done_callback(self._on_warm_up)
+
+    def _on_warm_up(self, future):
+        try:
+            stats = future.result()
+        except Exception as e:
+            print(f"[WARNING] Worker warm-up failed: {e}")
+            return
+        with self._lock:
+            self.worker_models[stats["pid"]] = stats
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(
+                1 for job in self._jobs.values()
+                if job["status"] in ("queued", "running")
+            )
+
+    def submit(self, fn, *args, upload_id: str = None, **kwargs) -> str:
+        """
+        Queue fn(*args, **kwargs) on the worker pool; progress events it emits
+        are logged for GET /jobs/{job_id}/events
+
+        upload_id: upload the job reads (kept on disk while the job is known)
+
+        Returns:
+            job_id
+        """
+        # Finished jobs are forgotten here too, so the table stays bounded
+        # even when no storage janitor is running
+        self.expire()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "future": None,
+            "upload_id": upload_id,
+        }
+
+        # Capacity check and insert are one step, so concurrent uploads cannot overshoot
+        with self._lock:
+            if self.pending_count() >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending jobs)")
+
+            self._jobs[job_id] = job
+            try:
+                future = self._get_executor().submit(run_with_events, job_id, fn, args, kwargs)
+            except Exception:
+                del self._jobs[job_id]
+                raise
+            job["future"] = future
+
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+
+        print(f"[INFO] Job {job_id} queued")
+        return job_id
+
+    def _on_done(self, job_id: str, future):
+        """Store the outcome of a finished future"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+
+            job["finished_at"] = time.time()
+
+            # Cancelled while running: the worker finished, but nobody wants the result
+            if job["status"] == "cancelled":
+                return
+
+            try:
+                job["result"] = future.result()
+                job["status"] = "done"
+                print(f"[INFO] Job {job_id} done")
+            except CancelledError:
+                job["status"] = "cancelled"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                print(f"[ERROR] Job {job_id} failed: {e}")
+
+        # Keep the result's stems on disk for as long as this job is known
+        result = job["result"]
+        if isinstance(result, dict) and "cache" in result:
+            try:
+                get_result_cache().pin(job_id, result["cache"]["key"])
+            except OSError as e:
+                print(f"[WARNING] Could not pin result of job {job_id}: {e}")
+
+        # Worker breakdowns are aggregated here, in the API process
+        metrics = get_metrics()
+        metrics.count_job(job["status"])
+        if isinstance(result, dict) and "timings" in result:
+            metrics.observe_request(result["timings"], cache_hit=result.get("cache", {}).get("hit", False))
+
+    def get(self, job_id: str):
+        """
+        Get a JSON-safe status snapshot for a job
+
+        Returns:
+            dict or None if the job is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+
+            # The pool moves futures to its call queue (future.running() is
+            # True) before a worker takes them; the worker's "started" event
+            # marks the real start
+            if job["status"] == "queued" and job_started(job_id):
+                job["status"] = "running"
+
+            status = job["status"]
+            finished_at = job["finished_at"]
+            return {
+                "job_id": job_id,
+                "status": status,
+                "created_at": job["created_at"],
+                "finished_at": finished_at,
+                "expires_at": finished_at + JOB_TTL if finished_at is not None else None,
+                "error": job["error"],
+            }
+
+    def get_result(self, job_id: str):
+        """Return the stored result dict of a finished job (None otherwise)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["result"] if job is not None else None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job
+
+        Queued jobs are removed from the pool. A job that is already running
+        cannot be interrupted inside its worker process, so it is marked
+        cancelled and its result is discarded when it finishes.
+
+        Returns:
+            True if the job was cancelled, False if it had already finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                return False
+
+            future = job["future"]
+            if future is not None:
+                future.cancel()
+            job["status"] = "cancelled"
+            job["finished_at"] = time.time()
+
+        print(f"[INFO] Job {job_id} cancelled")
+        return True
+
+    def expire(self, ttl: float = JOB_TTL) -> list:
+        """
+        Forget jobs that finished more than ttl seconds ago and unpin their results
+
+        Returns:
+            ids of the expired jobs
+        """
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] not in ("queued", "running")
+                and job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+        cache = get_result_cache()
+        for job_id in expired:
+            cache.unpin(job_id)
+            delete_events(job_id)
+        return expired
+
+    def upload_ids(self) -> set:
+        """Uploads referenced by known jobs"""
+        with self._lock:
+            return {job["upload_id"] for job in self._jobs.values() if job["upload_id"]}
+
+    def shutdown(self):
+        """Stop the worker pool (pending jobs are dropped)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global job manager (one per API process)
+_job_manager = None
+
+def get_job_manager() -> JobManager:
+    """Get or create the job manager"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
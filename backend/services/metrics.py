@@ -0,0 +1,258 @@
+# backend/services/metrics.py
+"""
+Lightweight pipeline instrumentation
+
+measure(stage) records wall time, process CPU time and peak RSS of a block
+of work. Records made while a request is active (begin_request/end_request,
+one request at a time per worker process) form the per-request timing
+breakdown returned in the JSON response. The API process feeds finished
+breakdowns into histograms rendered in Prometheus text format at /metrics.
+"""
+
+import os
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+# Histogram buckets (seconds)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# RSS sampling period while at least one stage is being measured
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def rss_bytes():
+    """Resident set size of this process (None if it cannot be measured)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# ============================================================
+# PEAK RSS SAMPLER
+# ============================================================
+
+class _RssSampler:
+    """Background thread tracking the peak RSS seen by each active stage"""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._peaks = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self) -> int:
+        rss = rss_bytes() or 0
+        with self._lock:
+            token = next(self._tokens)
+            self._peaks[token] = rss
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def stop(self, token: int):
+        """Peak RSS in bytes since start(token)"""
+        self._sample()
+        with self._lock:
+            return self._peaks.pop(token, None)
+
+    def _sample(self):
+        rss = rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            for token, peak in self._peaks.items():
+                if rss > peak:
+                    self._peaks[token] = rss
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._peaks
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            self._sample()
+            time.sleep(self.interval)
+
+
+_sampler = _RssSampler()
+
+
+# ============================================================
+# STAGE MEASUREMENT / PER-REQUEST BREAKDOWN
+# ============================================================
+
+_request = None
+_request_lock = threading.Lock()
+
+
+def begin_request():
+    """Start collecting stage records for the request handled by this process"""
+    global _request
+    with _request_lock:
+        _request = {"start": time.perf_counter(), "stages": []}
+
+
+def end_request() -> dict:
+    """Stop collecting; returns {"total_sec", "stages": [...]}"""
+    global _request
+    with _request_lock:
+        request, _request = _request, None
+
+    if request is None:
+        return {"total_sec": 0.0, "stages": []}
+
+    return {
+        "total_sec": round(time.perf_counter() - request["start"], 3),
+        "stages": request["stages"],
+    }
+
+
+@contextmanager
+def measure(stage: str):
+    """
+    Time a block of work
+
+    CPU time is process-wide (it includes model threads and any stage running
+    concurrently); peak RSS is the highest resident size sampled during the
+    block.
+    """
+    record = {"stage": stage}
+    token = _sampler.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    try:
+        yield record
+    finally:
+        peak = _sampler.stop(token)
+        record["wall_sec"] = round(time.perf_counter() - wall_start, 3)
+        record["cpu_sec"] = round(time.process_time() - cpu_start, 3)
+        record["peak_rss_mb"] = round(peak / 1024 ** 2, 1) if peak else None
+
+        with _request_lock:
+            if _request is not None:
+                record["start_sec"] = round(wall_start - _request["start"], 3)
+                _request["stages"].append(record)
+
+
+# ============================================================
+# HISTOGRAMS (API PROCESS)
+# ============================================================
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one label"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.setdefault(
+            label_value, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        )
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, series in sorted(self._series.items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+            lines.append(f"{self.name}_sum{{{label}}} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms and counters aggregated in the API process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_wall = Histogram(
+            "pipeline_stage_wall_seconds", "Wall time per pipeline stage", "stage")
+        self.stage_cpu = Histogram(
+            "pipeline_stage_cpu_seconds", "Process CPU time per pipeline stage", "stage")
+        self.request_wall = Histogram(
+            "pipeline_request_seconds", "End-to-end pipeline time per job", "cache")
+        self.stage_peak_rss = {}
+        self.jobs = {}
+
+    def observe_request(self, timings: dict, cache_hit: bool = False):
+        """Add one request's breakdown (from end_request) to the histograms"""
+        with self._lock:
+            self.request_wall.observe("hit" if cache_hit else "miss", timings.get("total_sec", 0.0))
+            for record in timings.get("stages", []):
+                stage = record["stage"]
+                self.stage_wall.observe(stage, record["wall_sec"])
+                self.stage_cpu.observe(stage, record["cpu_sec"])
+                if record.get("peak_rss_mb") is not None:
+                    peak = record["peak_rss_mb"] * 1024 ** 2
+                    self.stage_peak_rss[stage] = max(self.stage_peak_rss.get(stage, 0), peak)
+
+    def count_job(self, status: str):
+        with self._lock:
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+
+    def render(self, gauges: dict = None) -> str:
+        """
+        Prometheus text exposition format
+
+        gauges: extra {name: value} gauges sampled at scrape time
+        """
+        with self._lock:
+            lines = []
+            for histogram in (self.stage_wall, self.stage_cpu, self.request_wall):
+                lines.extend(histogram.render())
+
+            lines.append("# HELP pipeline_stage_peak_rss_bytes Highest RSS observed during a stage")
+            lines.append("# TYPE pipeline_stage_peak_rss_bytes gauge")
+            for stage, peak in sorted(self.stage_peak_rss.items()):
+                lines.append(f'pipeline_stage_peak_rss_bytes{{stage="{stage}"}} {int(peak)}')
+
+            lines.append("# HELP pipeline_jobs_total Finished jobs by status")
+            lines.append("# TYPE pipeline_jobs_total counter")
+            for status, count in sorted(self.jobs.items()):
+                lines.append(f'pipeline_jobs_total{{status="{status}"}} {count}')
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry (one per process)
+_metrics = None
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create the metrics registry"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
@@ -0,0 +1,173 @@
+# backend/services/model_registry.py
+"""
+Process-wide model registry
+
+Every heavy model (YAMNet, CREPE small/medium, Demucs) is loaded once per
+process through this registry and shared by all services. Load time and the
+resident-memory growth caused by each load are recorded so they can be
+reported by the API.
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+
+from services.metrics import rss_bytes
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+YAMNET_PATH = BASE_DIR / "models" / "yamnet"
+
+# Threshold of monophonic instrument detection (solo recordings need it low);
+# other YAMNet users keep their own
+YAMNET_CONFIDENCE_THRESHOLD = 0.001
+
+
+class ModelRegistry:
+    """Loads named models once and keeps them for the life of the process"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, loader):
+        """Register a zero-argument loader under name"""
+        self._loaders[name] = loader
+
+    def get(self, name: str, loader=None):
+        """
+        Return the model, loading it on first use
+
+        loader: registers name on the fly if it is not registered yet
+        """
+        if name in self._models:
+            return self._models[name]
+
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            if name not in self._loaders:
+                if loader is None:
+                    raise KeyError(f"Unknown model: {name}")
+                self.register(name, loader)
+
+            print(f"[INFO] Loading model '{name}'...")
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+
+            model = self._loaders[name]()
+
+            load_time = time.perf_counter() - start
+            rss_after = rss_bytes()
+            memory = (
+                rss_after - rss_before
+                if rss_before is not None and rss_after is not None
+                else None
+            )
+
+            self._models[name] = model
+            self._stats[name] = {
+                "load_time_sec": round(load_time, 3),
+                "memory_mb": round(memory / 1024 ** 2, 1) if memory is not None else None,
+                "loaded_at": time.time(),
+            }
+            print(f"[INFO] ✓ Model '{name}' loaded in {load_time:.2f}s"
+                  + (f" (+{memory / 1024 ** 2:.0f} MB)" if memory is not None else ""))
+
+            return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warm_up(self, names=None) -> dict:
+        """Load the given models (default: default_warmup()) and return stats"""
+        for name in names or default_warmup():
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"[WARNING] Warm-up of '{name}' failed: {e}")
+        return self.stats()
+
+    def stats(self) -> dict:
+        """Load time / memory per loaded model, plus process RSS"""
+        rss = rss_bytes()
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(rss / 1024 ** 2, 1) if rss is not None else None,
+            "models": dict(self._stats),
+        }
+
+
+def default_warmup() -> list:
+    """
+    Models the configured pipeline loads up front
+
+    Demucs for the default preset, YAMNet (one copy, shared by the batched
+    stem path and every detector wrapper), and the CREPE capacities of
+    detect_type and pitch extraction (once if they are the same).
+    """
+    # Imported here: these modules import the registry themselves
+    from services.separate_demucs import DEFAULT_PRESET, get_preset
+    from services.detect_type import CREPE_MODEL_CAPACITY as TYPE_CREPE_CAPACITY
+    from services.monophonic.pitch_extraction import CREPE_MODEL_CAPACITY as PITCH_CREPE_CAPACITY
+
+    names = [f"demucs:{get_preset(DEFAULT_PRESET)['model']}", "yamnet"]
+    for capacity in (TYPE_CREPE_CAPACITY, PITCH_CREPE_CAPACITY):
+        if f"crepe_{capacity}" not in names:
+            names.append(f"crepe_{capacity}")
+    return names
+
+
+# ============================================================
+# LOADERS
+# ============================================================
+
+def _load_demucs(name: str):
+    from services.separate_demucs import load_demucs_model
+    return load_demucs_model(name)
+
+
+def _load_yamnet():
+    """Raw YAMNet SavedModel + class names (the only YAMNet copy in the process)"""
+    from services.yamnet_batch import load_yamnet_model
+    return load_yamnet_model()
+
+
+def _load_crepe(capacity: str):
+    """CREPE keeps built models in its own module cache; build it there once"""
+    from crepe.core import build_and_load_model
+    return build_and_load_model(capacity)
+
+
+# Global registry (one per process)
+_registry = None
+
+def get_registry() -> ModelRegistry:
+    """Get or create the model registry"""
+    global _registry
+    if _registry is None:
+        registry = ModelRegistry()
+        registry.register("demucs:htdemucs", lambda: _load_demucs("htdemucs"))
+        registry.register("demucs:htdemucs_ft", lambda: _load_demucs("htdemucs_ft"))
+        registry.register("yamnet", _load_yamnet)
+        registry.register("crepe_small", lambda: _load_crepe("small"))
+        registry.register("crepe_medium", lambda: _load_crepe("medium"))
+        _registry = registry
+    return _registry
+
+
+def get_model(name: str, loader=None):
+    """Shortcut for get_registry().get(name)"""
+    return get_registry().get(name, loader)
+
+
+def warm_up_models(names=None) -> dict:
+    """Load models in this process (used as pool initializer)"""
+    return get_registry().warm_up(names)
+
+
+def model_stats() -> dict:
+    """Stats of the models already loaded in this process (loads nothing)"""
+    return get_registry().stats()
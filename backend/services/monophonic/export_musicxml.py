@@ -21,6 +21,11 @@ def export_key_aware_notes_to_musicxml(notes, detected_key, bpm=120, output_file
     p.append(ts)
 
     for n in notes:
+        # Gap to the previous note on the beat grid (quantize_notes)
+        rest = n.get('rest_before_beats', 0.0)
+        if rest > 1e-6:
+            p.append(note.Rest(quarterLength=rest))
+
         pitch_name = n['pitch']  # e.g., "C4"
         dur = n['quantized_beats']
 
@@ -1,6 +1,6 @@
 # backend/services/monophonic/note_quantization.py
 
-import math
+import numpy as np
 
 # Supported musical durations (in beats)
 NOTE_VALUES = {
@@ -14,7 +14,44 @@ NOTE_VALUES = {
     "sixteenth": 0.25
 }
 
-def quantize_notes(notes, tempo, tolerance=0.3):
+# Durations of notes quantized to the triplet grid
+TRIPLET_NOTE_VALUES = {
+    "whole": 4.0,
+    "dotted_half": 3.0,
+    "half": 2.0,
+    "half_triplet": 4.0 / 3.0,
+    "quarter": 1.0,
+    "quarter_triplet": 2.0 / 3.0,
+    "eighth_triplet": 1.0 / 3.0
+}
+
+# Grid divisions per beat: binary (sixteenths) and triplet (eighth triplets)
+BINARY_DIVISION = 4
+TRIPLET_DIVISION = 3
+
+# A note moves to the triplet grid only if that fits better by this many beats
+TRIPLET_BIAS = 0.05
+
+# Tracked beats are used as the grid when their tempo is within this ratio of
+# the final tempo (or of half / double it); otherwise the grid is uniform
+GRID_TEMPO_TOLERANCE = 0.1
+MIN_GRID_BEATS = 4
+
+_EPS = 1e-6
+
+# Beat positions in the note dicts are rounded to this many decimals, so float
+# noise (0.9999999999999998) never reaches the payload; triplets stay exact
+# enough for music21 to recover their fractions
+BEAT_DECIMALS = 6
+
+# All names that can appear in a tie, largest first (column order of value_counts)
+_TIE_VALUES = sorted(
+    {**NOTE_VALUES, **TRIPLET_NOTE_VALUES}.items(), key=lambda item: -item[1]
+)
+VALUE_NAMES = [name for name, _ in _TIE_VALUES]
+
+
+def quantize_notes(notes, tempo, tolerance=0.3, beats=None, triplets=True, beat_offset=0.0):
     """
     Convert note durations into musical note values
 
@@ -22,41 +59,190 @@ def quantize_notes(notes, tempo, tolerance=0.3):
         notes: list of {start, end, pitch}
         tempo: BPM (final accepted tempo)
         tolerance: allowed snapping error in beats
+        beats: beat times in seconds (estimate_tempo_and_beats) for the grid
+        triplets: allow notes to snap to the triplet grid
+        beat_offset: seconds between the beat timeline and the note timeline
+            (the leading silence trimmed before pitch tracking); subtracted
+            from beats so both share the notes' time axis
 
     Returns:
-        Quantized notes with duration info
+        Quantized notes with duration info; onset_beats / rest_before_beats
+        place each note on the beat grid and tie lists the note values of
+        durations that need tied notes
     """
 
-    quantized = []
-
-    for note in notes:
-        duration_sec = note["end"] - note["start"]
-        beats = (duration_sec * tempo) / 60.0
-
-        # Find closest note value with tolerance
-        best_match = None
-        smallest_error = float("inf")
+    columns = quantize_notes_columnar(
+        [n["start"] for n in notes],
+        [n["end"] for n in notes],
+        [n["pitch"] for n in notes],
+        tempo,
+        tolerance=tolerance,
+        beats=beats,
+        triplets=triplets,
+        beat_offset=beat_offset
+    )
 
-        for name, value in NOTE_VALUES.items():
-            error = abs(beats - value)
-            if error < smallest_error:
-                smallest_error = error
-                best_match = (name, value)
+    quantized = []
+    for i, note in enumerate(notes):
+        tie = [
+            name
+            for name, count in zip(VALUE_NAMES, columns["value_counts"][i])
+            for _ in range(int(count))
+        ]
 
-        # Snap to closest note if within tolerance, else unknown
-        if smallest_error <= tolerance:
-            duration_name, quantized_beats = best_match
-        else:
+        if not columns["representable"][i]:
             duration_name = "unknown"
-            quantized_beats = round(beats, 2)
+        else:
+            duration_name = "+".join(tie)
 
         quantized.append({
             "start": note["start"],
             "end": note["end"],
             "pitch": note["pitch"],
-            "duration_beats": round(beats, 2),
-            "quantized_beats": quantized_beats,
-            "duration_name": duration_name
+            "duration_beats": round(float(columns["duration_beats"][i]), 2),
+            "quantized_beats": round(float(columns["quantized_beats"][i]), BEAT_DECIMALS),
+            "duration_name": duration_name,
+            "onset_beats": round(float(columns["onset_beats"][i]), BEAT_DECIMALS),
+            "rest_before_beats": round(float(columns["rest_before_beats"][i]), BEAT_DECIMALS),
+            "triplet": bool(columns["triplet"][i]),
+            "tie": tie if len(tie) > 1 else []
         })
 
     return quantized
+
+
+def quantize_notes_columnar(start, end, pitch, tempo, tolerance=0.3, beats=None, triplets=True,
+                            beat_offset=0.0):
+    """
+    Vectorized quantize_notes
+
+    Onsets and ends are mapped to fractional beat positions (through the
+    tracked beats when they agree with the tempo, so the grid follows tempo
+    drift), then both snapped to a sixteenth grid or, where that fits
+    clearly better, an eighth-triplet grid. Durations are the difference of
+    the snapped positions, so rounding never accumulates across notes. The
+    value decomposition (ties) iterates over note values, not notes.
+
+    Returns:
+        dict of arrays: start, end, pitch, onset_beats, end_beats,
+        duration_beats, quantized_beats, rest_before_beats, triplet,
+        representable and value_counts (notes × VALUE_NAMES)
+    """
+
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    pitch = np.asarray(pitch, dtype=np.float64)
+    n = len(start)
+
+    if beats is not None:
+        beats = np.asarray(beats, dtype=np.float64) - beat_offset
+
+    on = _beat_positions(start, tempo, beats)
+    off = _beat_positions(end, tempo, beats)
+
+    # Snap onset and end together to each grid; pick the better fit per note
+    on_bin, off_bin = _snap(on, BINARY_DIVISION), _snap(off, BINARY_DIVISION)
+    on_tri, off_tri = _snap(on, TRIPLET_DIVISION), _snap(off, TRIPLET_DIVISION)
+
+    if triplets:
+        err_bin = np.abs(on - on_bin) + np.abs(off - off_bin)
+        err_tri = np.abs(on - on_tri) + np.abs(off - off_tri)
+        triplet = err_tri + TRIPLET_BIAS < err_bin
+    else:
+        triplet = np.zeros(n, dtype=bool)
+
+    q_on = np.where(triplet, on_tri, on_bin)
+    q_off = np.where(triplet, off_tri, off_bin)
+    unit = np.where(triplet, 1.0 / TRIPLET_DIVISION, 1.0 / BINARY_DIVISION)
+
+    # At least one grid step long; end where the next note starts (monophonic)
+    q_off = np.maximum(q_off, q_on + unit)
+    if n > 1:
+        next_on = q_on[1:]
+        clip = (q_off[:-1] > next_on) & (next_on >= q_on[:-1] + unit[:-1])
+        q_off[:-1] = np.where(clip, next_on, q_off[:-1])
+
+    quantized_beats = q_off - q_on
+    duration_beats = (end - start) * tempo / 60.0
+
+    rest_before = np.zeros(n)
+    if n > 1:
+        rest_before[1:] = np.maximum(q_on[1:] - q_off[:-1], 0.0)
+
+    value_counts, remaining = _decompose(quantized_beats, triplet)
+    representable = (remaining < _EPS) & (np.abs(duration_beats - quantized_beats) <= tolerance)
+
+    return {
+        "start": start,
+        "end": end,
+        "pitch": pitch,
+        "onset_beats": q_on,
+        "end_beats": q_off,
+        "duration_beats": duration_beats,
+        "quantized_beats": quantized_beats,
+        "rest_before_beats": rest_before,
+        "triplet": triplet,
+        "representable": representable,
+        "value_counts": value_counts,
+    }
+
+
+def _beat_grid(beats, tempo):
+    """Tracked beat times adapted to the final tempo, or None for a uniform grid"""
+    if beats is None or len(beats) < MIN_GRID_BEATS:
+        return None
+
+    beats = np.asarray(beats, dtype=np.float64)
+    intervals = np.diff(beats)
+    if np.any(intervals <= 0):
+        return None
+
+    ratio = tempo / (60.0 / np.median(intervals))
+
+    if abs(ratio - 1.0) <= GRID_TEMPO_TOLERANCE:
+        return beats
+    if abs(ratio - 2.0) <= 2 * GRID_TEMPO_TOLERANCE:
+        # Final tempo counts twice as many beats: add the midpoints
+        return np.sort(np.concatenate([beats, (beats[:-1] + beats[1:]) / 2.0]))
+    if abs(ratio - 0.5) <= GRID_TEMPO_TOLERANCE / 2:
+        return beats[::2]
+    return None
+
+
+def _beat_positions(times, tempo, beats=None):
+    """Seconds → fractional beat positions (tempo extrapolates outside the grid)"""
+    seconds_per_beat = 60.0 / tempo
+    grid = _beat_grid(beats, tempo)
+    if grid is None:
+        return times / seconds_per_beat
+
+    positions = np.interp(times, grid, np.arange(len(grid), dtype=np.float64))
+
+    before = times < grid[0]
+    after = times > grid[-1]
+    positions[before] = (times[before] - grid[0]) / seconds_per_beat
+    positions[after] = (len(grid) - 1) + (times[after] - grid[-1]) / seconds_per_beat
+    return positions
+
+
+def _snap(positions, division):
+    return np.round(positions * division) / division
+
+
+def _decompose(durations, triplet):
+    """
+    Greedy split of each duration into note values (largest first)
+
+    Returns:
+        (counts (notes × VALUE_NAMES), remaining beats that did not fit)
+    """
+    remaining = durations.copy()
+    counts = np.zeros((len(durations), len(_TIE_VALUES)), dtype=np.int64)
+
+    for column, (name, value) in enumerate(_TIE_VALUES):
+        allowed = np.where(triplet, name in TRIPLET_NOTE_VALUES, name in NOTE_VALUES)
+        count = np.where(allowed, np.floor(remaining / value + _EPS), 0).astype(np.int64)
+        counts[:, column] = count
+        remaining = remaining - count * value
+
+    return counts, np.abs(remaining)
@@ -1,6 +1,7 @@
 # backend/services/monophonic/note_segmentation.py
 
 import numpy as np
+from scipy.signal import lfilter
 
 # Define pitch ranges for instruments
 INSTRUMENT_PITCH_RANGES = {
@@ -12,6 +13,10 @@ INSTRUMENT_PITCH_RANGES = {
 }
 
 
+# Frames scanned per vectorized EMA step when looking for the next pitch jump
+SCAN_BLOCK = 256
+
+
 def frames_to_notes(
     time,
     freq,
@@ -19,74 +24,137 @@ def frames_to_notes(
     instrument=None,
     conf_thresh=0.6,
     pitch_change_thresh=50.0,
-    min_note_duration=0.08
+    min_note_duration=0.08,
+    pitch_change_cents=None
 ):
     """
     Convert pitch frames to musical note events
 
+    pitch_change_thresh is in Hz, as in the original per-frame segmenter
+    (outputs match it exactly), so the same threshold is a wider interval in
+    low registers than in high ones. Pass pitch_change_cents to split on a
+    fixed musical interval instead; pitch_change_thresh is then ignored.
+
     Returns:
     [
       { "start": float, "end": float, "pitch": float }
     ]
     """
 
+    notes = frames_to_notes_columnar(
+        time, freq, conf,
+        instrument=instrument,
+        conf_thresh=conf_thresh,
+        pitch_change_thresh=pitch_change_thresh,
+        min_note_duration=min_note_duration,
+        pitch_change_cents=pitch_change_cents
+    )
+
+    return [
+        {"start": round(s, 3), "end": round(e, 3), "pitch": round(p, 2)}
+        for s, e, p in zip(notes["start"], notes["end"], notes["pitch"])
+    ]
+
+
+def frames_to_notes_columnar(
+    time,
+    freq,
+    conf,
+    instrument=None,
+    conf_thresh=0.6,
+    pitch_change_thresh=50.0,
+    min_note_duration=0.08,
+    pitch_change_cents=None
+):
+    """
+    Vectorized frames_to_notes
+
+    Voiced frames come from one mask, voiced runs from run-length encoding
+    of that mask. Inside a run a note follows a smoothed pitch
+    (0.9·previous + 0.1·frame) and splits where a frame deviates from it by
+    more than pitch_change_thresh Hz (or pitch_change_cents); the smoothing is evaluated blockwise with
+    lfilter, so Python only iterates once per note.
+
+    Returns:
+        {"start": ndarray, "end": ndarray, "pitch": ndarray} (unrounded)
+    """
+
+    time = np.asarray(time, dtype=np.float64)
+    freq = np.asarray(freq, dtype=np.float64)
+    conf = np.asarray(conf, dtype=np.float64)
+    n = len(freq)
+
     # Set instrument pitch range
     min_pitch, max_pitch = (0, float("inf"))
     if instrument and instrument in INSTRUMENT_PITCH_RANGES:
         min_pitch, max_pitch = INSTRUMENT_PITCH_RANGES[instrument]
 
-    notes = []
-    current_start = None
-    current_pitch = None
-
-    for i in range(len(freq)):
-
-        # Determine if frame is voiced and within instrument range
-        voiced = conf[i] >= conf_thresh and not np.isnan(freq[i])
-        if voiced and not (min_pitch <= freq[i] <= max_pitch):
-            voiced = False  # Instrument-aware filtering
-
-        if not voiced:
-            # End current note
-            if current_start is not None:
-                end_time = time[i]
-                if end_time - current_start >= min_note_duration:
-                    notes.append({
-                        "start": round(current_start, 3),
-                        "end": round(end_time, 3),
-                        "pitch": round(current_pitch, 2)
-                    })
-                current_start = None
-                current_pitch = None
-            continue
+    # Voiced and within instrument range (NaN compares False)
+    with np.errstate(invalid="ignore"):
+        voiced = (conf >= conf_thresh) & (freq >= min_pitch) & (freq <= max_pitch)
+
+    # Run-length encoding of the voicing mask
+    edges = np.diff(np.concatenate(([False], voiced, [False])).astype(np.int8))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+
+    starts, ends, pitches = [], [], []
+
+    for run_start, run_end in zip(run_starts, run_ends):
+        segments = _split_run(freq, run_start, run_end, pitch_change_thresh, pitch_change_cents)
+        for seg_start, seg_end, pitch in segments:
+            if seg_end == n:
+                # Last note is closed at the final frame without duration filtering
+                starts.append(time[seg_start])
+                ends.append(time[-1])
+                pitches.append(pitch)
+                continue
+
+            if time[seg_end] - time[seg_start] >= min_note_duration:
+                starts.append(time[seg_start])
+                ends.append(time[seg_end])
+                pitches.append(pitch)
+
+    return {
+        "start": np.asarray(starts, dtype=np.float64),
+        "end": np.asarray(ends, dtype=np.float64),
+        "pitch": np.asarray(pitches, dtype=np.float64),
+    }
+
 
-        # First voiced frame
-        if current_start is None:
-            current_start = time[i]
-            current_pitch = freq[i]
+def _split_run(freq, start, end, pitch_change_thresh, pitch_change_cents=None):
+    """
+    Split one voiced run at pitch jumps
+
+    Yields (first_frame, end_frame_exclusive, smoothed_pitch) per note.
+    """
+    seg_start = start
+    pitch = freq[start]
+    pos = start + 1
+
+    while pos < end:
+        block = freq[pos:min(pos + SCAN_BLOCK, end)]
+
+        # Smoothed pitch after each frame of the block, continuing from `pitch`
+        smoothed, _ = lfilter([0.1], [1.0, -0.9], block, zi=[0.9 * pitch])
+        previous = np.concatenate(([pitch], smoothed[:-1]))
+
+        if pitch_change_cents is None:
+            jumps = np.flatnonzero(np.abs(block - previous) > pitch_change_thresh)
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cents = np.abs(1200.0 * np.log2(block / previous))
+            jumps = np.flatnonzero(cents > pitch_change_cents)
+        if len(jumps) == 0:
+            pitch = smoothed[-1]
+            pos += len(block)
             continue
 
         # Pitch jump → new note
-        if abs(freq[i] - current_pitch) > pitch_change_thresh:
-            end_time = time[i]
-            if end_time - current_start >= min_note_duration:
-                notes.append({
-                    "start": round(current_start, 3),
-                    "end": round(end_time, 3),
-                    "pitch": round(current_pitch, 2)
-                })
-            current_start = time[i]
-            current_pitch = freq[i]
-        else:
-            # Smooth pitch update
-            current_pitch = 0.9 * current_pitch + 0.1 * freq[i]
-
-    # Close last note
-    if current_start is not None:
-        notes.append({
-            "start": round(current_start, 3),
-            "end": round(time[-1], 3),
-            "pitch": round(current_pitch, 2)
-        })
-
-    return notes
+        jump = pos + jumps[0]
+        yield seg_start, jump, previous[jumps[0]]
+        seg_start = jump
+        pitch = freq[jump]
+        pos = jump + 1
+
+    yield seg_start, end, pitch
@@ -1,22 +1,231 @@
 #backend/services/monophonic/pitch_extraction.py
 
+import os
+
 import crepe
+import librosa
 import numpy as np
 from scipy.signal import medfilt
 
+from ..model_registry import get_model
+
+# CREPE settings (also part of the result cache key)
+CREPE_MODEL_CAPACITY = "medium"
+CREPE_STEP_SIZE = 10
+CREPE_VITERBI = True
+
+# Adaptive resolution: coarse CREPE pass, 10 ms only around onsets / pitch changes
+CREPE_ADAPTIVE = os.environ.get("PITCH_ADAPTIVE", "0") == "1"
+ADAPTIVE_COARSE_STRIDE = 5       # coarse pass every 5th frame (50 ms)
+ADAPTIVE_CHANGE_CENTS = 50       # refine where coarse pitch moves more than this
+ADAPTIVE_MARGIN_FRAMES = 5       # refined region padding on each side (50 ms)
+ADAPTIVE_SILENCE_DB = -50        # frames below this RMS are never sent to CREPE
+
+
+# Batch mode: frames per model.predict call chunk and Keras mini-batch size
+CREPE_SR = 16000
+CREPE_FRAME = 1024
+MAX_BATCH_FRAMES = 65536     # ~256 MB of float32 frames held at once
+PREDICT_BATCH_SIZE = 1024
+
+
+def extract_pitch(y, sr, model_capacity=CREPE_MODEL_CAPACITY, adaptive=None):
+    if CREPE_ADAPTIVE if adaptive is None else adaptive:
+        return extract_pitch_adaptive(y, sr, model_capacity)
+
+    # Same frames and decoding as crepe.predict, but large Keras mini-batches
+    # and bounded frame memory on long recordings
+    return extract_pitch_batch([y], sr, model_capacity)[0]
+
+
+def extract_pitch_batch(waveforms, sr=CREPE_SR, model_capacity=CREPE_MODEL_CAPACITY,
+                        batch_size=PREDICT_BATCH_SIZE, max_batch_frames=MAX_BATCH_FRAMES):
+    """
+    CREPE pitch tracks for many waveforms with batched network inference
+
+    Frames of all waveforms are stacked into large arrays (bounded by
+    max_batch_frames; long waveforms are split across several) and run
+    through the shared model together, then split back per waveform. Output
+    matches crepe.predict + _postprocess for each input.
+
+    Args:
+        waveforms: list of mono float waveforms (preprocessed)
+        sr: sample rate of the waveforms (resampled to 16 kHz if different)
+    Returns:
+        list of (time, frequency, confidence), one per waveform
+    """
+    model = get_model(f"crepe_{model_capacity}")
+
+    activations = [[] for _ in waveforms]
+    pending = []
+    pending_frames = 0
+
+    def flush():
+        nonlocal pending, pending_frames
+        if not pending:
+            return
+        frames = np.concatenate([f for _, f in pending])
+        activation = model.predict(frames, batch_size=batch_size, verbose=0)
+
+        start = 0
+        for index, f in pending:
+            activations[index].append(activation[start:start + len(f)])
+            start += len(f)
+
+        pending, pending_frames = [], 0
+
+    for index, y in enumerate(waveforms):
+        frames = _frame_audio(y, sr)
+        for start in range(0, len(frames), max_batch_frames):
+            chunk = _normalize_frames(frames[start:start + max_batch_frames])
+            if pending_frames and pending_frames + len(chunk) > max_batch_frames:
+                flush()
+            pending.append((index, chunk))
+            pending_frames += len(chunk)
+
+    flush()
+    return [_decode_activation(np.concatenate(a)) for a in activations]
+
+
+def extract_pitch_adaptive(y, sr, model_capacity=CREPE_MODEL_CAPACITY):
+    """
+    CREPE at 10 ms only where the pitch moves
+
+    1. Silent frames (RMS gate) are skipped entirely
+    2. Coarse pass: every ADAPTIVE_COARSE_STRIDE-th frame
+    3. Refine pass: every frame around onsets, coarse pitch jumps and
+       voicing changes
+    Frames that were not predicted are interpolated (cents, confidence)
+    between their predicted neighbours. Returns the same 10 ms grid as
+    extract_pitch; frequencies use local-average decoding (Viterbi needs the
+    full activation sequence).
+    """
+    model = get_model(f"crepe_{model_capacity}")
+
+    if sr != CREPE_SR:
+        y = _resample(y, sr)
+        sr = CREPE_SR
+
+    frames = _frame_audio(y, sr)
+    n = len(frames)
+    hop = int(CREPE_SR * CREPE_STEP_SIZE / 1000)
+
+    # Silence gate on the un-normalized signal
+    rms = librosa.feature.rms(y=y, frame_length=CREPE_FRAME, hop_length=hop, center=True)[0][:n]
+    voiced_energy = librosa.amplitude_to_db(rms, ref=np.max) > ADAPTIVE_SILENCE_DB
+
+    cents = np.full(n, np.nan)
+    confidence = np.zeros(n)
+    predicted = np.zeros(n, dtype=bool)
 
+    def predict(index):
+        index = index[~predicted[index]]
+        if len(index):
+            activation = model.predict(
+                _normalize_frames(frames[index]), batch_size=PREDICT_BATCH_SIZE, verbose=0
+            )
+            cents[index] = crepe.core.to_local_average_cents(activation)
+            confidence[index] = activation.max(axis=1)
+            predicted[index] = True
 
+    # --- coarse pass ---
+    coarse = np.arange(0, n, ADAPTIVE_COARSE_STRIDE)
+    predict(coarse[voiced_energy[coarse]])
 
-def extract_pitch(y, sr, model_capacity="medium"):
-    time, frequency, confidence, _ = crepe.predict(
+    # --- regions to refine ---
+    refine = np.zeros(n, dtype=bool)
+
+    onsets = librosa.onset.onset_detect(y=y, sr=sr, hop_length=hop)
+    refine[onsets[onsets < n]] = True
+
+    c = coarse[predicted[coarse]]
+    jumps = np.abs(np.diff(cents[c])) > ADAPTIVE_CHANGE_CENTS
+    voicing = np.diff(confidence[c] > 0.5)
+    for a, b in zip(c[:-1][jumps | voicing], c[1:][jumps | voicing]):
+        refine[a:b + 1] = True
+
+    # Edges of non-silent regions
+    refine[1:] |= np.diff(voiced_energy)
+
+    if ADAPTIVE_MARGIN_FRAMES:
+        kernel = np.ones(2 * ADAPTIVE_MARGIN_FRAMES + 1)
+        refine = np.convolve(refine.astype(float), kernel, mode="same") > 0
+
+    predict(np.flatnonzero(refine & voiced_energy))
+
+    print(f"[INFO] Adaptive CREPE: {predicted.sum()}/{n} frames "
+          f"({100 * predicted.sum() / max(n, 1):.0f}%)")
+
+    # --- fill the 10 ms grid ---
+    known = np.flatnonzero(predicted)
+    fill = voiced_energy & ~predicted
+    if len(known):
+        cents[fill] = np.interp(np.flatnonzero(fill), known, cents[known])
+        confidence[fill] = np.interp(np.flatnonzero(fill), known, confidence[known])
+
+    frequency = 10 * 2 ** (cents / 1200)
+    frequency[np.isnan(frequency)] = 0
+
+    time = np.arange(n) * CREPE_STEP_SIZE / 1000.0
+
+    return _postprocess(time, frequency, confidence)
+
+
+def _resample(y, sr):
+    """To 16 kHz the way crepe.get_activation does (float32, resampy kaiser_best)"""
+    y = np.asarray(y, dtype=np.float32)
+    return librosa.resample(y, orig_sr=sr, target_sr=CREPE_SR, res_type="kaiser_best")
+
+
+def _frame_audio(y, sr):
+    """
+    Centered 1024-sample frames at the CREPE hop (as crepe.get_activation)
+
+    Returns a read-only strided view; _normalize_frames copies the rows that
+    are sent to the model.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if sr != CREPE_SR:
+        y = _resample(y, sr)
+
+    y = np.pad(y, CREPE_FRAME // 2, mode="constant", constant_values=0)
+    hop = int(CREPE_SR * CREPE_STEP_SIZE / 1000)
+    n_frames = 1 + int((len(y) - CREPE_FRAME) / hop)
+
+    return np.lib.stride_tricks.as_strided(
         y,
-        sr,
-        model_capacity=model_capacity,
-        step_size=10,
-        viterbi=True
-)
+        shape=(n_frames, CREPE_FRAME),
+        strides=(y.itemsize * hop, y.itemsize),
+        writeable=False
+    )
+
+
+def _normalize_frames(frames):
+    """Per-frame zero mean / unit std, line for line crepe.get_activation"""
+    frames = frames.copy()
+    frames -= np.mean(frames, axis=1)[:, np.newaxis]
+    frames /= np.clip(np.std(frames, axis=1)[:, np.newaxis], 1e-8, None)
+    return frames
+
+
+def _decode_activation(activation):
+    """Activation matrix → (time, frequency, confidence) like crepe.predict"""
+    confidence = activation.max(axis=1)
+
+    if CREPE_VITERBI:
+        cents = crepe.core.to_viterbi_cents(activation)
+    else:
+        cents = crepe.core.to_local_average_cents(activation)
+
+    frequency = 10 * 2 ** (cents / 1200)
+    frequency[np.isnan(frequency)] = 0
+
+    time = np.arange(confidence.shape[0]) * CREPE_STEP_SIZE / 1000.0
+
+    return _postprocess(time, frequency, confidence)
 
 
+def _postprocess(time, frequency, confidence):
 # Confidence filtering
     mask = confidence > 0.5
     frequency[~mask] = np.nan
@@ -26,4 +235,4 @@ def extract_pitch(y, sr, model_capacity="medium"):
     frequency = medfilt(frequency, kernel_size=5)
 
 
-    return time, frequency, confidence
\ No newline at end of file
+    return time, frequency, confidence
@@ -0,0 +1,139 @@
+# backend/services/monophonic/pitch_payload.py
+"""
+Compact pitch-track payloads
+
+The full CREPE track is stored as parallel little-endian float32 columns
+(base64 in JSON, raw bytes for binary responses) on a uniform time grid,
+with NaN marking unvoiced frames. A small downsampled preview is included
+as plain JSON lists for clients that only draw an overview.
+"""
+
+import base64
+
+import numpy as np
+
+PAYLOAD_FORMAT = "columnar-f32"
+PREVIEW_POINTS = 500
+DTYPE = np.dtype("<f4")
+
+
+def encode_pitch_track(time, frequency, confidence, sample_rate: int,
+                       encoding: str = "base64", preview_points: int = PREVIEW_POINTS) -> dict:
+    """
+    Build the pitch_data payload
+
+    Args:
+        time, frequency, confidence: extract_pitch output (NaN = unvoiced)
+        encoding: "base64" (float32 columns) or "list" (plain JSON lists)
+        preview_points: size of the downsampled preview (0 disables it)
+    """
+    time = np.asarray(time, dtype=np.float64)
+    frequency = np.asarray(frequency, dtype=DTYPE)
+    confidence = np.asarray(confidence, dtype=DTYPE)
+
+    start, step, uniform = _grid(time)
+
+    payload = {
+        "format": PAYLOAD_FORMAT,
+        "encoding": encoding,
+        "sample_rate": sample_rate,
+        "frame_count": int(len(frequency)),
+        "voiced_count": int(np.count_nonzero(~np.isnan(frequency))),
+        "start": start,
+        "step": step,
+        "frequency": _encode(frequency, encoding),
+        "confidence": _encode(confidence, encoding),
+    }
+
+    if not uniform:
+        payload["time"] = _encode(time.astype(DTYPE), encoding)
+
+    if preview_points:
+        payload["preview"] = make_preview(time, frequency, confidence, preview_points)
+
+    return payload
+
+
+def decode_pitch_track(payload: dict):
+    """Inverse of encode_pitch_track → (time, frequency, confidence) arrays"""
+    encoding = payload["encoding"]
+    frequency = _decode(payload["frequency"], encoding)
+    confidence = _decode(payload["confidence"], encoding)
+
+    if "time" in payload:
+        time = _decode(payload["time"], encoding).astype(np.float64)
+    else:
+        time = payload["start"] + np.arange(payload["frame_count"]) * payload["step"]
+
+    return time, frequency, confidence
+
+
+def to_bytes(payload: dict) -> bytes:
+    """Raw float32 frequency column followed by the confidence column"""
+    _, frequency, confidence = decode_pitch_track(payload)
+    return frequency.astype(DTYPE).tobytes() + confidence.astype(DTYPE).tobytes()
+
+
+def make_preview(time, frequency, confidence, points: int = PREVIEW_POINTS) -> dict:
+    """
+    Downsample to at most `points` buckets
+
+    Each bucket reports the median voiced frequency and the mean confidence;
+    buckets without voiced frames are null.
+    """
+    n = len(frequency)
+    if n == 0:
+        return {"time": [], "frequency": [], "confidence": []}
+
+    buckets = min(points, n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+
+    # nanmedian per bucket via a padded (buckets, width) matrix
+    width = int(np.max(np.diff(edges)))
+    index = edges[:-1, None] + np.arange(width)[None, :]
+    valid = index < edges[1:, None]
+    index = np.minimum(index, n - 1)
+
+    freq = np.where(valid, frequency[index], np.nan)
+    conf = np.where(valid, confidence[index], np.nan)
+
+    with np.errstate(invalid="ignore"):
+        voiced = ~np.all(np.isnan(freq), axis=1)
+        median = np.full(buckets, np.nan)
+        if np.any(voiced):
+            median[voiced] = np.nanmedian(freq[voiced], axis=1)
+        mean_conf = np.nanmean(conf, axis=1)
+
+    return {
+        "time": np.round(time[edges[:-1]], 3).tolist(),
+        "frequency": [round(float(f), 2) if not np.isnan(f) else None for f in median],
+        "confidence": np.round(mean_conf, 3).tolist(),
+    }
+
+
+def _grid(time):
+    """(start, step, uniform) of the time axis"""
+    if len(time) == 0:
+        return 0.0, 0.0, True
+    if len(time) == 1:
+        return float(time[0]), 0.0, True
+
+    step = float(time[1] - time[0])
+    uniform = bool(np.allclose(np.diff(time), step, atol=1e-6))
+    return float(time[0]), step, uniform
+
+
+def _encode(values, encoding: str):
+    if encoding == "base64":
+        return base64.b64encode(np.ascontiguousarray(values, dtype=DTYPE).tobytes()).decode("ascii")
+    if encoding == "list":
+        return [round(float(v), 4) if not np.isnan(v) else None for v in values]
+    raise ValueError(f"Unknown pitch payload encoding: {encoding}")
+
+
+def _decode(values, encoding: str):
+    if encoding == "base64":
+        return np.frombuffer(base64.b64decode(values), dtype=DTYPE)
+    if encoding == "list":
+        return np.array([np.nan if v is None else v for v in values], dtype=DTYPE)
+    raise ValueError(f"Unknown pitch payload encoding: {encoding}")
@@ -0,0 +1,172 @@
+# backend/services/monophonic/pitch_pyramid.py
+"""
+Multi-resolution pitch-curve pyramid
+
+Like a waveform overview: level 0 is the full-resolution track and every
+level above summarizes PYRAMID_FACTOR buckets of the level below with the
+min / max / mean voiced frequency. A range query picks the finest level
+whose bucket count in the window fits the requested resolution, so response
+size stays constant however far the client zooms out.
+"""
+
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+from .pitch_payload import decode_pitch_track
+
+PYRAMID_FACTOR = 4
+DEFAULT_RESOLUTION = 1000
+MAX_RESOLUTION = 10000
+
+# Pyramids kept in memory (per job / result key)
+MAX_CACHED_PYRAMIDS = 16
+
+
+class PitchPyramid:
+    """min/max/mean pyramid over a uniformly sampled pitch track"""
+
+    def __init__(self, frequency, confidence, start: float, step: float):
+        """
+        Args:
+            frequency: per-frame F0 in Hz (NaN = unvoiced)
+            confidence: per-frame CREPE confidence
+            start, step: time of frame 0 and frame spacing in seconds
+        """
+        frequency = np.asarray(frequency, dtype=np.float32)
+        voiced = ~np.isnan(frequency)
+
+        self.start = float(start)
+        self.step = float(step)
+        self.frame_count = len(frequency)
+
+        level = {
+            "min": frequency,
+            "max": frequency,
+            "sum": np.where(voiced, frequency, 0.0).astype(np.float64),
+            "count": voiced.astype(np.int64),
+            "conf_sum": np.asarray(confidence, dtype=np.float64),
+            "frames": np.ones(len(frequency), dtype=np.int64),
+        }
+        self.levels = [level]
+
+        while len(level["min"]) > 1:
+            level = _reduce(level)
+            self.levels.append(level)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "PitchPyramid":
+        """Build from a columnar pitch_data payload"""
+        _, frequency, confidence = decode_pitch_track(payload)
+        return cls(frequency, confidence, payload["start"], payload["step"])
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count * self.step
+
+    def query(self, start: float = None, end: float = None,
+              resolution: int = DEFAULT_RESOLUTION) -> dict:
+        """
+        Buckets covering [start, end) seconds, at most `resolution` of them
+
+        Returns:
+            level, bucket duration, and parallel time/min/max/mean/confidence
+            lists (null where a bucket has no voiced frames)
+        """
+        resolution = int(min(max(resolution, 1), MAX_RESOLUTION))
+        start = self.start if start is None else max(float(start), self.start)
+        end = self.start + self.duration if end is None else min(float(end), self.start + self.duration)
+
+        first_frame = int(np.floor((start - self.start) / self.step)) if self.step else 0
+        last_frame = int(np.ceil((end - self.start) / self.step)) if self.step else self.frame_count
+        last_frame = max(last_frame, first_frame + 1)
+
+        # Finest level whose bucket count in the window fits the resolution
+        index = 0
+        while (index + 1 < len(self.levels)
+               and _ceil_div(last_frame, PYRAMID_FACTOR ** index) - first_frame // PYRAMID_FACTOR ** index > resolution):
+            index += 1
+
+        size = PYRAMID_FACTOR ** index
+        level = self.levels[index]
+        lo = first_frame // size
+        hi = min(_ceil_div(last_frame, size), len(level["min"]))
+
+        count = level["count"][lo:hi]
+        voiced = count > 0
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = level["sum"][lo:hi] / count
+            confidence = level["conf_sum"][lo:hi] / level["frames"][lo:hi]
+
+        return {
+            "start": start,
+            "end": end,
+            "level": index,
+            "bucket_seconds": size * self.step,
+            "time": np.round(self.start + np.arange(lo, hi) * size * self.step, 3).tolist(),
+            "min": _nullable(level["min"][lo:hi], voiced, 2),
+            "max": _nullable(level["max"][lo:hi], voiced, 2),
+            "mean": _nullable(mean, voiced, 2),
+            "confidence": np.round(confidence, 3).tolist(),
+        }
+
+
+def _reduce(level: dict) -> dict:
+    """Combine PYRAMID_FACTOR neighbouring buckets"""
+    n = len(level["min"])
+    pad = (-n) % PYRAMID_FACTOR
+
+    def blocks(values, fill):
+        if pad:
+            values = np.concatenate([values, np.full(pad, fill, dtype=values.dtype)])
+        return values.reshape(-1, PYRAMID_FACTOR)
+
+    with np.errstate(invalid="ignore"):
+        # All-NaN blocks stay NaN (unvoiced)
+        mins = blocks(level["min"], np.nan)
+        maxs = blocks(level["max"], np.nan)
+        all_nan = np.all(np.isnan(mins), axis=1)
+        reduced_min = np.full(len(mins), np.nan, dtype=np.float32)
+        reduced_max = np.full(len(maxs), np.nan, dtype=np.float32)
+        reduced_min[~all_nan] = np.nanmin(mins[~all_nan], axis=1)
+        reduced_max[~all_nan] = np.nanmax(maxs[~all_nan], axis=1)
+
+    return {
+        "min": reduced_min,
+        "max": reduced_max,
+        "sum": blocks(level["sum"], 0.0).sum(axis=1),
+        "count": blocks(level["count"], 0).sum(axis=1),
+        "conf_sum": blocks(level["conf_sum"], 0.0).sum(axis=1),
+        "frames": blocks(level["frames"], 0).sum(axis=1),
+    }
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def _nullable(values, valid, decimals):
+    return [round(float(v), decimals) if ok else None for v, ok in zip(values, valid)]
+
+
+# Global pyramid cache (LRU, keyed by job id)
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+def get_pitch_pyramid(key: str, payload: dict) -> PitchPyramid:
+    """Get or build the pyramid for a pitch_data payload"""
+    with _pyramids_lock:
+        if key in _pyramids:
+            _pyramids.move_to_end(key)
+            return _pyramids[key]
+
+    pyramid = PitchPyramid.from_payload(payload)
+
+    with _pyramids_lock:
+        _pyramids[key] = pyramid
+        while len(_pyramids) > MAX_CACHED_PYRAMIDS:
+            _pyramids.popitem(last=False)
+
+    return pyramid
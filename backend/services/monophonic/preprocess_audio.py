@@ -4,6 +4,7 @@ import librosa
 import numpy as np
 from scipy.signal import butter, filtfilt
 from .instrument_ranges import INSTRUMENT_FREQ_RANGES
+from ..audio_buffer import AudioBuffer
 
 
 
@@ -18,9 +19,19 @@ def bandpass_filter(y, sr, low, high, order=4):
 
 
 
-def preprocess_audio(audio_path: str, instrument: str):
-# Load audio
-    y, sr = librosa.load(audio_path, sr=16000, mono=True)
+def preprocess_audio(audio, instrument: str, return_offset: bool = False):
+    """
+    Normalize, trim silence and band-pass for the instrument
+
+    return_offset: also return the seconds of leading silence trimmed off
+        (times measured on the result are that much earlier than in the input)
+    """
+# Load audio (path, or shared AudioBuffer decoded once per upload)
+    sr = 16000
+    if isinstance(audio, AudioBuffer):
+        y = audio.mono(sr).copy()
+    else:
+        y, sr = librosa.load(audio, sr=sr, mono=True)
 
 
 # Normalize
@@ -28,7 +39,8 @@ def preprocess_audio(audio_path: str, instrument: str):
 
 
 # Trim silence
-    y, _ = librosa.effects.trim(y, top_db=25)
+    y, index = librosa.effects.trim(y, top_db=25)
+    offset = index[0] / sr
 
 
 # Instrument‑aware band‑pass
@@ -37,4 +49,6 @@ def preprocess_audio(audio_path: str, instrument: str):
         y = bandpass_filter(y, sr, low, high)
 
 
+    if return_offset:
+        return y, sr, offset
     return y, sr
\ No newline at end of file
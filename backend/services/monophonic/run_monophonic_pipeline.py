@@ -2,35 +2,31 @@
 
 from services.monophonic.preprocess_audio import preprocess_audio
 from services.monophonic.pitch_extraction import extract_pitch
-import numpy as np
+from services.monophonic.pitch_payload import encode_pitch_track
 
 
-def run_monophonic_pipeline(audio_path: str, instrument: str):
+def run_monophonic_pipeline(audio, instrument: str, return_frames: bool = False):
     """
     Full monophonic pipeline:
     preprocess → pitch extraction
+
+    audio: file path or shared AudioBuffer
+    return_frames: also return the raw (time, frequency, confidence) arrays
+        and the trimmed leading silence in seconds (frame times start after it)
     """
 
     print("[INFO] Running monophonic preprocessing...")
-    y, sr = preprocess_audio(audio_path, instrument)
+    y, sr, trim_offset = preprocess_audio(audio, instrument, return_offset=True)
 
     print("[INFO] Extracting pitch using CREPE...")
     time, frequency, confidence = extract_pitch(y, sr)
 
-    # Convert numpy → JSON safe
-    pitch_data = [
-        {
-            "time": float(t),
-            "frequency": float(f) if not np.isnan(f) else None,
-            "confidence": float(c)
-        }
-        for t, f, c in zip(time, frequency, confidence)
-        if c > 0.5 and not np.isnan(f)
-    ]
-
-    print(f"[INFO] Extracted {len(pitch_data)} pitch points")
-
-    return {
-        "sample_rate": sr,
-        "pitch_points": pitch_data[:300]  # limit for frontend safety
-    }
+    # Full-resolution columnar payload (float32 columns + small preview)
+    result = encode_pitch_track(time, frequency, confidence, sr)
+
+    print(f"[INFO] Extracted {result['voiced_count']} pitch points "
+          f"({result['frame_count']} frames)")
+
+    if return_frames:
+        return result, (time, frequency, confidence), trim_offset
+    return result
@@ -3,26 +3,57 @@
 import librosa
 import numpy as np
 
-def estimate_tempo_and_beats(audio_path):
+from ..audio_buffer import AudioBuffer
+
+# Onset envelope settings (also part of the result cache key)
+# 16 kHz is the view preprocess_audio already builds, so no extra resample/decode
+TEMPO_SR = 16000
+TEMPO_HOP_LENGTH = 256     # 16 ms frames
+
+
+def compute_onset_envelope(audio, sr=TEMPO_SR, hop_length=TEMPO_HOP_LENGTH):
+    """
+    Onset strength envelope from a downsampled mono view
+
+    audio: file path, shared AudioBuffer, or mono waveform already at sr
+    Returns:
+        onset envelope (one value per hop_length samples)
     """
-    Estimate tempo and beats from audio using Librosa
+
+    if isinstance(audio, AudioBuffer):
+        y = audio.mono(sr)
+    elif isinstance(audio, np.ndarray):
+        y = audio
+    else:
+        y, sr = librosa.load(audio, sr=sr, mono=True)
+
+    return librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+
+
+def estimate_tempo_and_beats(audio=None, onset_envelope=None, sr=TEMPO_SR,
+                             hop_length=TEMPO_HOP_LENGTH):
     """
+    Estimate tempo and beats from one onset envelope
 
-    y, sr = librosa.load(audio_path, sr=None, mono=True)
+    audio: file path or shared AudioBuffer (ignored if onset_envelope is given)
+    onset_envelope: precomputed envelope at sr / hop_length
+    """
 
-    # Onset envelope
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    if onset_envelope is None:
+        onset_envelope = compute_onset_envelope(audio, sr, hop_length)
 
     # Tempo (librosa returns array sometimes)
-    tempo = librosa.beat.tempo(onset_envelope=onset_env, sr=sr)
+    tempo = librosa.beat.tempo(onset_envelope=onset_envelope, sr=sr, hop_length=hop_length)
 
     if isinstance(tempo, np.ndarray):
         tempo = float(tempo[0])
 
-    # Beat tracking
+    # Beat tracking at the tempo above (bpm given → no second tempo estimate)
     beats = librosa.beat.beat_track(
-        onset_envelope=onset_env,
+        onset_envelope=onset_envelope,
         sr=sr,
+        hop_length=hop_length,
+        bpm=tempo,
         units="time"
     )[1]
 
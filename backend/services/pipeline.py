@@ -0,0 +1,339 @@
+# backend/services/pipeline.py
+"""
+Full upload pipeline: type detection → monophonic chain or Demucs + instrument detection
+Runs inside a job worker process, so inputs and outputs must stay picklable
+"""
+
+import os
+import uuid
+import shutil
+from pathlib import Path
+
+from services import detect_type as detect_type_module
+from services.detect_instruments import detect_all_instruments, detect_all_instruments_batched
+from services.monophonic import pitch_extraction, tempo_beat_estimation, note_quantization
+from services import separate_demucs, stem_encoding
+from services.separate_demucs import separate_polyphonic, separate_polyphonic_streaming
+from services.detect_type import detect_type
+from services.transcription import transcribe_monophonic
+from services.stem_encoding import wait_for_stems
+from services.audio_buffer import AudioBuffer
+from services.metrics import begin_request, end_request, measure
+from services.progress import emit
+from services.ingest import PART_SUFFIX, probe_duration, read_upload_hash, wait_for_upload
+from services.result_cache import ResultCache, get_result_cache, hash_file, hash_audio, make_cache_key
+
+# Bump when pipeline logic changes in a way that invalidates cached results
+PIPELINE_VERSION = 9
+
+
+def pipeline_config(preset: str = separate_demucs.DEFAULT_PRESET) -> dict:
+    """Model/parameter versions that affect results (part of the cache key)"""
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "demucs": {
+            "preset": preset,
+            **separate_demucs.get_preset(preset),
+            "split": separate_demucs.DEMUCS_SPLIT,
+            "streaming_min_duration": separate_demucs.STREAMING_MIN_DURATION,
+            "stream_window": separate_demucs.STREAM_WINDOW_SECONDS,
+            "stream_overlap": separate_demucs.STREAM_OVERLAP_SECONDS,
+        },
+        "stems": {
+            "format": stem_encoding.STEM_FORMAT,
+            **stem_encoding.get_stem_format(),
+            "lossy_quality": stem_encoding.STEM_LOSSY_QUALITY,
+        },
+        "tempo": {
+            "sr": tempo_beat_estimation.TEMPO_SR,
+            "hop_length": tempo_beat_estimation.TEMPO_HOP_LENGTH,
+        },
+        "quantize": {
+            "binary_division": note_quantization.BINARY_DIVISION,
+            "triplet_division": note_quantization.TRIPLET_DIVISION,
+            "triplet_bias": note_quantization.TRIPLET_BIAS,
+            "grid_tempo_tolerance": note_quantization.GRID_TEMPO_TOLERANCE,
+        },
+        "crepe": {
+            "capacity": pitch_extraction.CREPE_MODEL_CAPACITY,
+            "step_size": pitch_extraction.CREPE_STEP_SIZE,
+            "viterbi": pitch_extraction.CREPE_VITERBI,
+            "adaptive": pitch_extraction.CREPE_ADAPTIVE,
+        },
+        "detect_type_crepe": {
+            "capacity": detect_type_module.CREPE_MODEL_CAPACITY,
+            "step_size": detect_type_module.CREPE_STEP_SIZE,
+        },
+        "detect_type_fast": {
+            "mono_harmonicity": detect_type_module.FAST_MONO_HARMONICITY,
+            "poly_harmonicity": detect_type_module.FAST_POLY_HARMONICITY,
+            "max_flatness": detect_type_module.FAST_MAX_FLATNESS,
+        },
+        "detect_type_windows": {
+            "windows": detect_type_module.ANALYSIS_WINDOWS,
+            "min_duration": detect_type_module.MULTI_WINDOW_MIN_DURATION,
+            "window_duration": detect_type_module.ANALYSIS_DURATION,
+        },
+    }
+
+
+def process_audio(
+    file_path: str,
+    stems_dir: str,
+    audio_url: str,
+    preset: str = separate_demucs.DEFAULT_PRESET,
+    streaming_upload: bool = False,
+    cache: ResultCache = None
+) -> dict:
+    """
+    Detect audio type and process accordingly, reusing cached results
+
+    Args:
+        file_path: Path to the uploaded audio file
+        stems_dir: Root directory for Demucs stems (one sub-directory per cache key)
+        audio_url: Public URL of the uploaded file (monophonic response)
+        preset: Demucs separation preset (see SEPARATION_PRESETS)
+        streaming_upload: the file may still be arriving (<file>.part); classify
+            its first seconds while waiting for the rest
+        cache: result cache whose stems root is stems_dir (default: the API's)
+
+    Returns:
+        JSON-safe result dict (same shape the /upload/ endpoint used to return)
+
+    Recordings of STREAMING_MIN_DURATION or more are never decoded as a
+    whole: their duration comes from the file header, the raw-bytes hash is
+    the cache key, detect_type seeks to its analysis windows and Demucs
+    streams the file. Only a monophonic result decodes the (mono) track,
+    because the transcription chain needs the complete waveform.
+    """
+
+    cache = cache if cache is not None else get_result_cache()
+    config = pipeline_config(preset)
+    begin_request()
+
+    early_type = None
+    if streaming_upload:
+        early_type = _classify_while_uploading(file_path)
+
+    duration = probe_duration(file_path)
+    long_track = duration is not None and duration >= separate_demucs.STREAMING_MIN_DURATION
+
+    # Raw-bytes alias first (no decode), then decoded-audio hash
+    with measure("cache_lookup"):
+        raw_hash = read_upload_hash(file_path) or hash_file(file_path)
+        file_hash = make_cache_key(raw_hash, config)
+        key = file_hash if long_track else cache.lookup_file(file_hash)
+
+    # Decode once; every stage below reads from this buffer
+    audio = None
+    if key is None:
+        with measure("decode"):
+            audio = AudioBuffer.load(file_path)
+        with measure("cache_lookup"):
+            key = make_cache_key(hash_audio(audio.samples, audio.sr), config)
+
+    result = cache.get(key)
+    if result is not None:
+        print(f"[INFO] Cache hit: {key}")
+        cache.add_file_alias(file_hash, key)
+        emit("type", {"type": result.get("type"), "confidence": result.get("confidence"), "cache_hit": True})
+        return _with_request_info(result, audio_url, key, cache_hit=True)
+
+    print(f"[INFO] Cache miss: {key}")
+    if audio is None and not long_track:
+        with measure("decode"):
+            audio = AudioBuffer.load(file_path)
+    if audio is not None:
+        duration = audio.duration
+
+    # The early decision equals a full one only when detect_type would use a single window
+    if early_type is not None and duration >= detect_type_module.MULTI_WINDOW_MIN_DURATION:
+        early_type = None
+
+    # Write into a private staging directory, published under the cache key when
+    # complete, so concurrent jobs for the same audio never share half-written files
+    job_stems_dir = Path(stems_dir) / key
+    work_dir = Path(stems_dir) / f".{key}.{uuid.uuid4().hex[:8]}"
+    try:
+        result = _run_pipeline(
+            audio if audio is not None else file_path,
+            work_dir, f"/stems/{key}", preset, audio_type=early_type
+        )
+        _publish_stems(work_dir, job_stems_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with measure("cache_store"):
+        cache.put(
+            key,
+            result,
+            stems_dir=str(job_stems_dir) if job_stems_dir.exists() else None,
+            file_hash=None if long_track else file_hash
+        )
+
+    return _with_request_info(result, audio_url, key, cache_hit=False)
+
+
+def _publish_stems(work_dir: Path, job_stems_dir: Path):
+    """Move a finished staging directory to its cache-key path (first writer wins)"""
+    if not work_dir.exists():
+        return
+    try:
+        os.replace(work_dir, job_stems_dir)
+    except OSError:
+        # Another job with the same key published identical stems first
+        print(f"[INFO] Stems for {job_stems_dir.name} already published, discarding duplicate")
+
+
+def _with_request_info(result: dict, audio_url: str, key: str, cache_hit: bool) -> dict:
+    """Attach per-request fields that must not come from the cache"""
+    result = dict(result)
+    if result.get("is_monophonic"):
+        result["audio_file"] = audio_url
+    result["cache"] = {"key": key, "hit": cache_hit}
+    result["timings"] = end_request()
+    return result
+
+
+def _classify_while_uploading(file_path: str):
+    """
+    Run detect_type on the first seconds of a streaming upload, then wait for it
+
+    Returns:
+        (type, confidence) from the first analysis window, or None
+    """
+    part_path = Path(file_path).with_name(Path(file_path).name + PART_SUFFIX)
+
+    early_type = None
+    if not Path(file_path).exists():
+        try:
+            with measure("detect_type_early"):
+                early_type = detect_type(str(part_path), windows=1, raise_errors=True)
+        except Exception as e:
+            print(f"[WARNING] Early detect_type failed, will retry on the full file: {e}")
+
+    with measure("upload_wait"):
+        wait_for_upload(file_path)
+
+    return early_type
+
+
+def _source_path(audio):
+    """File behind an AudioBuffer or path argument (None for in-memory buffers)"""
+    if isinstance(audio, AudioBuffer):
+        return audio.path
+    return str(audio)
+
+
+def _run_pipeline(audio, work_dir: Path, url_prefix: str, preset: str,
+                  audio_type=None) -> dict:
+    """
+    Uncached pipeline run
+
+    audio: decoded AudioBuffer, or the file path of a long recording that is
+        only decoded if it turns out to be monophonic
+    work_dir: directory for stems / MusicXML of this run
+    url_prefix: public URL the contents of work_dir will be served under
+    audio_type: (type, confidence) already decided (skips detect_type)
+    """
+
+    # Detect audio type
+    if audio_type is None:
+        print("[INFO] Detecting audio type...")
+        with measure("detect_type"):
+            # From the file, detect_type seeks to each analysis window itself
+            audio_type = detect_type(_source_path(audio) or audio)
+    audio_type, confidence = audio_type
+    print(f"[INFO] Detected type: {audio_type} ({confidence*100:.1f}% confidence)")
+    emit("type", {"type": audio_type, "confidence": float(confidence), "cache_hit": False})
+
+    # Decision: Monophonic or Polyphonic?
+    if audio_type == "monophonic":
+        print("[INFO] Monophonic audio detected - skipping stem separation")
+
+        if not isinstance(audio, AudioBuffer):
+            # The transcription stages only read mono views
+            with measure("decode"):
+                audio = AudioBuffer.load(audio, mono=True)
+
+        # Instrument / pitch / beats run concurrently, notation stages follow
+        transcription = transcribe_monophonic(audio, output_dir=work_dir)
+
+        musicxml_url = None
+        if transcription["musicxml_path"]:
+            relative = Path(transcription["musicxml_path"]).relative_to(work_dir).as_posix()
+            musicxml_url = f"{url_prefix}/{relative}"
+
+        return {
+            "message": "Monophonic audio detected",
+            "type": audio_type,
+            "confidence": float(confidence),
+            "is_monophonic": True,
+            "instrument": transcription["instrument"],
+            "pitch_data": transcription["pitch_data"],
+            "note_data": {
+                "notes": transcription["notes"],
+                "quantized_notes": transcription["quantized_notes"],
+                "note_tempo": transcription["note_tempo"],
+            },
+            "tempo_data": transcription["beats"],
+            "final_tempo": transcription["tempo"],
+            "key": transcription["key"],
+            "musicxml": musicxml_url,
+        }
+
+    # Polyphonic
+    print("[INFO] Polyphonic audio detected - separating stems with Demucs...")
+
+    def stem_url(path):
+        return f"{url_prefix}/{Path(path).relative_to(work_dir).as_posix()}"
+
+    def stem_written(name, path):
+        emit("stem", {"name": name, "url": stem_url(path)})
+
+    # Separate stems using Demucs (long recordings are streamed window by window)
+    if isinstance(audio, AudioBuffer):
+        streaming = audio.path and audio.duration >= separate_demucs.STREAMING_MIN_DURATION
+    else:
+        streaming = True
+    with measure("demucs"):
+        if streaming:
+            stem_paths = separate_polyphonic_streaming(
+                _source_path(audio), output_dir=str(work_dir), preset=preset
+            )
+            for name, path in stem_paths.items():
+                stem_written(name, path)
+        else:
+            # Stems are encoded in the background while YAMNet runs
+            stem_paths, stem_audio = separate_polyphonic(
+                audio, output_dir=str(work_dir), preset=preset,
+                return_audio=True, background_write=True, on_stem_written=stem_written
+            )
+    print(f"[INFO] Stems separated: {list(stem_paths.keys())}")
+
+    # Detect instruments in each stem
+    print("[INFO] Detecting instruments in stems...")
+    with measure("yamnet"):
+        if streaming:
+            # Streamed stems only exist on disk
+            instruments = detect_all_instruments(stem_paths)
+        else:
+            instruments = detect_all_instruments_batched(stem_audio)
+    for name, detected in instruments.items():
+        emit("instruments", {"stem": name, "instruments": detected})
+
+    with measure("stem_encode"):
+        wait_for_stems(stem_paths.values())
+
+    # Create response with relative URLs
+    stems_response = {name: stem_url(path) for name, path in stem_paths.items()}
+
+    return {
+        "message": "Processing complete",
+        "type": audio_type,
+        "confidence": float(confidence),
+        "is_monophonic": False,
+        "separation_preset": preset,
+        "stems": stems_response,
+        "instruments": instruments
+    }
@@ -0,0 +1,112 @@
+# backend/services/progress.py
+"""
+Per-job progress events
+
+Pipeline stages call emit() as partial results become available (audio
+type, each written stem, instruments, pitch chunks, notes...). A worker
+process runs one job at a time, so the current job's event log is module
+state: an append-only JSONL file per job that the API process tails and
+forwards to clients (GET /jobs/{id}/events). Outside a job (batch CLI,
+benchmarks) emit() does nothing.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+EVENTS_DIR = Path(os.environ.get("JOB_EVENTS_DIR", Path(__file__).resolve().parents[1] / "events"))
+
+_job = None          # {"path", "seq"} of the job running in this process
+_lock = threading.Lock()
+
+
+def events_path(job_id: str) -> Path:
+    return EVENTS_DIR / f"{job_id}.jsonl"
+
+
+def _json_default(value):
+    # NumPy scalars/arrays from the pipeline stages
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def begin_job(job_id: str):
+    """Route emit() calls of this process to job_id's event log"""
+    global _job
+    EVENTS_DIR.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        _job = {"path": events_path(job_id), "seq": 0}
+
+
+def end_job():
+    global _job
+    with _lock:
+        _job = None
+
+
+def emit(event: str, data: dict = None):
+    """Append one event to the current job's log (no-op outside a job)"""
+    with _lock:
+        if _job is None:
+            return
+        _job["seq"] += 1
+        line = json.dumps(
+            {"seq": _job["seq"], "event": event, "time": time.time(), "data": data or {}},
+            default=_json_default
+        )
+        try:
+            with open(_job["path"], "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"[WARNING] Could not write progress event '{event}': {e}")
+
+
+def run_with_events(job_id: str, fn, args, kwargs):
+    """Worker-side wrapper: fn(*args, **kwargs) with progress routed to job_id"""
+    begin_job(job_id)
+    # First line of the log: tells the API process the job left the queue
+    emit("started", {"pid": os.getpid()})
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        end_job()
+
+
+# ============================================================
+# API SIDE
+# ============================================================
+
+def job_started(job_id: str) -> bool:
+    """True once a worker has picked up the job (its event log exists)"""
+    return events_path(job_id).exists()
+
+
+def read_events(job_id: str, offset: int = 0):
+    """
+    Complete events appended since byte offset
+
+    Returns:
+        (events, new_offset) — a trailing partial line is left for the next call
+    """
+    try:
+        with open(events_path(job_id), "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+
+    end = data.rfind(b"\n") + 1
+    events = []
+    for line in data[:end].splitlines():
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return events, offset + end
+
+
+def delete_events(job_id: str):
+    events_path(job_id).unlink(missing_ok=True)
@@ -0,0 +1,308 @@
+# backend/services/result_cache.py
+"""
+Persistent content-addressed cache for pipeline results
+
+Keys are a hash of the decoded audio plus the pipeline configuration, so a
+re-upload of the same song (even under another filename) is served from disk
+and its stems are reused. Entries are evicted least-recently-used once the
+cache grows past its size budget.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = Path(os.environ.get("RESULT_CACHE_DIR", BASE_DIR / "cache"))
+
+# Stems directory of the API (the only place the default cache deletes stems)
+STEMS_DIR = BASE_DIR / "stems"
+
+# Total budget for cached results + their stems
+MAX_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+
+# Entries stored by other worker processes are counted after a rescan of the
+# entries directory at least this often (each process keeps its own size index)
+INDEX_REFRESH_SECONDS = float(os.environ.get("RESULT_CACHE_INDEX_REFRESH_SECONDS", 300))
+
+# Read size when hashing raw upload bytes
+_HASH_CHUNK = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """sha256 of the raw file bytes (cheap alias lookup before decoding)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_audio(y: np.ndarray, sr: int) -> str:
+    """sha256 of decoded samples, independent of container/encoding metadata"""
+    digest = hashlib.sha256()
+    digest.update(str(int(sr)).encode())
+    digest.update(str(y.shape).encode())
+    digest.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def make_cache_key(audio_hash: str, config: dict) -> str:
+    """Combine audio hash and pipeline config into one key"""
+    config_blob = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(f"{audio_hash}:{config_blob}".encode()).hexdigest()[:32]
+
+
+def _dir_size(path: Path) -> int:
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _atomic_write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class ResultCache:
+    """
+    On-disk result cache
+
+    Layout:
+        <cache_dir>/entries/<key>.json    result + bookkeeping (mtime = last access)
+        <cache_dir>/files/<file_sha>      alias from raw upload bytes → key
+        <cache_dir>/pins/<job_id>         key whose stems a live API job still serves
+    Stems belonging to an entry live in their own directory (recorded in the
+    entry) and are deleted together with it, but only when that directory is
+    inside stems_root; entries pointing elsewhere are treated as misses and
+    dropped without touching their stems. Pinned entries are never evicted,
+    so result URLs stay valid for the lifetime of the job that returned them.
+
+    Entry sizes are kept in an in-memory index, so put() only rescans the
+    cache directory when the budget is exceeded or the index is stale.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES, stems_root=STEMS_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.stems_root = Path(stems_root).resolve()
+        self.entries_dir = self.cache_dir / "entries"
+        self.files_dir = self.cache_dir / "files"
+        self.pins_dir = self.cache_dir / "pins"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self.pins_dir.mkdir(parents=True, exist_ok=True)
+
+        self._sizes = None        # key → bytes (entry file + stems), built on first use
+        self._total = 0
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.entries_dir / f"{key}.json"
+
+    def _owns(self, stems_dir) -> bool:
+        """True if stems_dir lies inside this cache's stems root"""
+        return Path(stems_dir).resolve().is_relative_to(self.stems_root)
+
+    # --------------------------------
+    # Lookup
+    # --------------------------------
+
+    def get(self, key: str):
+        """Return cached result dict for key, or None"""
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Stems were removed behind our back, or belong to another stems
+        # root (their URLs would not resolve here) → treat as miss
+        stems_dir = entry.get("stems_dir")
+        if stems_dir and (not self._owns(stems_dir) or not Path(stems_dir).exists()):
+            self.delete(key)
+            return None
+
+        # Record access for LRU (the stems directory too, for the storage janitor)
+        try:
+            os.utime(path, None)
+            if stems_dir:
+                os.utime(stems_dir, None)
+        except FileNotFoundError:
+            return None
+
+        return entry["result"]
+
+    def lookup_file(self, file_hash: str):
+        """Resolve a raw-file hash to a cache key (None if unknown)"""
+        try:
+            key = (self.files_dir / file_hash).read_text().strip()
+        except FileNotFoundError:
+            return None
+        return key if self._entry_path(key).exists() else None
+
+    # --------------------------------
+    # Store
+    # --------------------------------
+
+    def put(self, key: str, result: dict, stems_dir: str = None, file_hash: str = None):
+        """Store a result (and optionally the stems directory it references)"""
+        size = _dir_size(Path(stems_dir)) if stems_dir else 0
+        entry = {
+            "key": key,
+            "created_at": time.time(),
+            "stems_dir": stems_dir,
+            "size_bytes": size,  # stems only; the entry file is added when indexed
+            "result": result,
+        }
+        path = self._entry_path(key)
+        _atomic_write_json(path, entry)
+
+        if file_hash:
+            self.add_file_alias(file_hash, key)
+
+        with self._lock:
+            if self._sizes is None or time.time() - self._scanned_at > INDEX_REFRESH_SECONDS:
+                self._scan()
+            else:
+                entry_bytes = size + path.stat().st_size
+                self._total += entry_bytes - self._sizes.get(key, 0)
+                self._sizes[key] = entry_bytes
+            over_budget = self._total > self.max_bytes
+
+        if over_budget:
+            self.evict()
+
+    def add_file_alias(self, file_hash: str, key: str):
+        (self.files_dir / file_hash).write_text(key)
+
+    # --------------------------------
+    # Pins
+    # --------------------------------
+
+    def pin(self, job_id: str, key: str):
+        """Keep key (and its stems) while job_id is alive"""
+        (self.pins_dir / job_id).write_text(key)
+
+    def unpin(self, job_id: str):
+        (self.pins_dir / job_id).unlink(missing_ok=True)
+
+    def pinned_keys(self) -> set:
+        keys = set()
+        for pin in self.pins_dir.iterdir():
+            try:
+                keys.add(pin.read_text().strip())
+            except FileNotFoundError:
+                continue
+        return keys
+
+    def clear_pins(self):
+        """Drop all pins (the jobs that held them are gone after a restart)"""
+        for pin in self.pins_dir.iterdir():
+            pin.unlink(missing_ok=True)
+
+    # --------------------------------
+    # Eviction
+    # --------------------------------
+
+    def delete(self, key: str):
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                stems_dir = json.load(f).get("stems_dir")
+        except (FileNotFoundError, json.JSONDecodeError):
+            stems_dir = None
+
+        if stems_dir and self._owns(stems_dir):
+            shutil.rmtree(stems_dir, ignore_errors=True)
+        path.unlink(missing_ok=True)
+
+        with self._lock:
+            if self._sizes is not None:
+                self._total -= self._sizes.pop(key, 0)
+
+    def _scan(self):
+        """
+        Rebuild the size index from the entries directory (caller holds _lock)
+
+        Only entries missing from the index are parsed; the others cost a stat.
+
+        Returns:
+            (last_access, size, key) for every entry
+        """
+        known = self._sizes or {}
+        sizes, entries = {}, []
+        for path in self.entries_dir.glob("*.json"):
+            key = path.stem
+            try:
+                stat = path.stat()
+                size = known.get(key)
+                if size is None:
+                    with open(path) as f:
+                        size = json.load(f).get("size_bytes", 0) + stat.st_size
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            sizes[key] = size
+            entries.append((stat.st_mtime, size, key))
+
+        self._sizes = sizes
+        self._total = sum(sizes.values())
+        self._scanned_at = time.time()
+        return entries
+
+    def _entries(self):
+        """(last_access, size, key) for every entry"""
+        with self._lock:
+            return self._scan()
+
+    def total_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Drop least-recently-used unpinned entries until the cache fits its budget"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        pinned = self.pinned_keys()
+
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            print(f"[INFO] Evicting cached result {key} ({size / 1024 ** 2:.1f} MB)")
+            self.delete(key)
+            total -= size
+
+        # Drop aliases that point at evicted entries
+        for alias in self.files_dir.iterdir():
+            try:
+                key = alias.read_text().strip()
+            except FileNotFoundError:
+                continue
+            if not self._entry_path(key).exists():
+                alias.unlink(missing_ok=True)
+
+
+# Global cache instance (one per process)
+_result_cache = None
+
+def get_result_cache() -> ResultCache:
+    """Get or create the result cache"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -1,59 +1,187 @@
 # backend/services/separate_demucs.py
 
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import torch
 import torchaudio
+import numpy as np
 import soundfile as sf
 
 from demucs.pretrained import get_model
 from demucs.apply import apply_model
+from demucs.htdemucs import HTDemucs
 
+from services.audio_buffer import AudioBuffer
+from services.model_registry import get_registry
+from services.stem_encoding import (
+    STEM_FORMAT, get_stem_format, stem_path, open_stem_writer, encode_stem_async, wait_for_stems
+)
 from services.utils.env_fix import fix_windows_conda
 
 # Fix DLL issue (Windows + Conda)
 fix_windows_conda()
 
 BASE_DIR = Path(__file__).resolve().parents[2]
-MODEL_PATH = BASE_DIR / "models" / "htdemucs" / "htdemucs.th"
-
-# Cache the model globally to avoid reloading
-_cached_model = None
-
-def get_cached_model():
-    """Load model once and cache it"""
-    global _cached_model
-    if _cached_model is None:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Demucs model not found at {MODEL_PATH}")
-        
-        print("[INFO] Loading Demucs model (first time only)...")
-        model = get_model("htdemucs")
-        state = torch.load(MODEL_PATH, map_location="cpu", weights_only=False)
+DEMUCS_MODEL = "htdemucs"
+
+# Quality/speed presets, selectable per request (settings are part of the result cache key)
+# segment: seconds per transformer chunk (None: the model's own, 7.8 s for
+# HTDemucs); HTDemucs models were trained on 7.8 s chunks and cannot take
+# longer ones, shorter chunks are cheaper (attention cost) at some loss of context
+SEPARATION_PRESETS = {
+    # Previews: no shift trick, minimal window overlap, short chunks
+    "fast": {"model": DEMUCS_MODEL, "shifts": 0, "overlap": 0.1, "segment": 4.0},
+    # Former hard-coded settings: shifts reduced from default 10, default
+    # overlap, model-default chunks (same output as before presets existed)
+    "balanced": {"model": DEMUCS_MODEL, "shifts": 1, "overlap": 0.25, "segment": None},
+    # Batch jobs: fine-tuned bag of 4 models, more shift averaging, wider
+    # cross-fades, full training-length chunks
+    "quality": {"model": "htdemucs_ft", "shifts": 5, "overlap": 0.5, "segment": 7.8},
+}
+DEFAULT_PRESET = "balanced"
+DEMUCS_SPLIT = True     # Process in chunks to save memory
+
+# CPU execution: split the track into segments separated in parallel processes.
+# workers × threads_per_worker should roughly match the physical core count.
+DEMUCS_CPU_WORKERS = int(os.environ.get("DEMUCS_CPU_WORKERS", 1))
+# Unset (0): derived from the core count by default_threads_per_worker()
+DEMUCS_THREADS_PER_WORKER = int(os.environ.get("DEMUCS_THREADS_PER_WORKER", 0))
+PARALLEL_OVERLAP_SECONDS = 2.0   # cross-faded region between neighbouring segments
+
+def default_threads_per_worker(workers: int = DEMUCS_CPU_WORKERS) -> int:
+    """
+    Torch threads for each Demucs process
+
+    Every pipeline worker process may run Demucs at the same time, so the
+    cores are divided by PIPELINE_WORKERS × workers, not by workers alone.
+    """
+    if DEMUCS_THREADS_PER_WORKER > 0:
+        return DEMUCS_THREADS_PER_WORKER
+
+    # Imported lazily: jobs reads PIPELINE_WORKERS on import, which the
+    # batch runner only sets once its arguments are parsed
+    from services.jobs import MAX_WORKERS
+    return max(1, (os.cpu_count() or 1) // (max(1, MAX_WORKERS) * max(1, workers)))
+
+
+def get_preset(name: str) -> dict:
+    """Settings for a named separation preset"""
+    if name not in SEPARATION_PRESETS:
+        raise ValueError(
+            f"Unknown separation preset '{name}' "
+            f"(choose from: {', '.join(SEPARATION_PRESETS)})"
+        )
+    return SEPARATION_PRESETS[name]
+
+
+def load_demucs_model(name: str = DEMUCS_MODEL):
+    """Load a Demucs model (uncached — use get_cached_model)"""
+    model_path = BASE_DIR / "models" / name / f"{name}.th"
+
+    print(f"[INFO] Loading Demucs model '{name}'...")
+    model = get_model(name)
+
+    # Local weights for the default model are required; other variants
+    # fall back to the pretrained weights fetched by demucs itself
+    if model_path.exists():
+        state = torch.load(model_path, map_location="cpu", weights_only=False)
         model.load_state_dict(state)
-        model.eval()
-        
-        # Use GPU if available
-        if torch.cuda.is_available():
-            model = model.cuda()
-            print("[INFO] Using GPU acceleration")
-        else:
-            print("[INFO] Using CPU (slower)")
-        
-        _cached_model = model
+    elif name == DEMUCS_MODEL:
+        raise FileNotFoundError(f"Demucs model not found at {model_path}")
+    model.eval()
+    
+    # Use GPU if available
+    if torch.cuda.is_available():
+        model = model.cuda()
+        print("[INFO] Using GPU acceleration")
+    else:
+        print("[INFO] Using CPU (slower)")
     
-    return _cached_model
+    return model
+
+
+def get_cached_model(name: str = DEMUCS_MODEL):
+    """Load model once per process (shared through the model registry)"""
+    return get_registry().get(f"demucs:{name}", lambda: load_demucs_model(name))
+
+
+def _use_segment(model, segment):
+    """
+    Make the HTDemucs models of a bag run on `segment`-second chunks
+
+    apply_model(segment=...) only sets the chunk length; HTDemucs pads every
+    chunk back to its own `segment` attribute, so that is lowered too (as
+    BagOfModels(segment=...) does). The training length is remembered so
+    presets sharing the cached model can switch back. None = training length.
+    """
+    for sub in getattr(model, "models", [model]):
+        if not isinstance(sub, HTDemucs):
+            continue
+        if not hasattr(sub, "train_segment"):
+            sub.train_segment = sub.segment
+        sub.segment = sub.train_segment if segment is None else min(segment, float(sub.train_segment))
+
+
+def _run_model(model, mix, settings: dict):
+    """apply_model with preset settings; mix is (batch, channels, samples)"""
+    _use_segment(model, settings["segment"])
+    with torch.no_grad():  # Disable gradient computation for inference
+        return apply_model(
+            model,
+            mix,
+            shifts=settings["shifts"],
+            overlap=settings["overlap"],
+            split=DEMUCS_SPLIT,
+            segment=settings["segment"]
+        )
+
+
+def separate_polyphonic(
+    audio,
+    output_dir: str,
+    preset: str = DEFAULT_PRESET,
+    workers: int = DEMUCS_CPU_WORKERS,
+    threads_per_worker: int = None,
+    return_audio: bool = False,
+    stem_format: str = STEM_FORMAT,
+    background_write: bool = False,
+    on_stem_written=None
+):
+    """
+    Separate audio into Demucs stems
 
+    audio: file path or shared AudioBuffer (its 44.1 kHz view is reused)
+    preset: name from SEPARATION_PRESETS
+    workers / threads_per_worker: CPU only — with workers > 1 the track is
+        split into segments separated in parallel processes
+        (threads default: default_threads_per_worker(workers))
+    return_audio: also return the in-memory stems as AudioBuffers, so later
+        stages don't have to read the stem files back
+    stem_format: name from stem_encoding.STEM_FORMATS
+    background_write: return while the stems are still being encoded; call
+        stem_encoding.wait_for_stems(stem_paths.values()) before serving them
+    on_stem_written: optional callback(name, path) as each stem file is complete
 
-def separate_polyphonic(input_file: str, output_dir: str):
+    Returns:
+        stem_paths, or (stem_paths, stem_audio) with return_audio=True
+    """
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Use cached model
-    model = get_cached_model()
+    settings = get_preset(preset)
+    model = get_cached_model(settings["model"])
     device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"[INFO] Separation preset: {preset} {settings}")
 
     # Load audio
-    wav, sr = torchaudio.load(input_file)
+    if isinstance(audio, AudioBuffer):
+        sr = model.samplerate
+        wav = torch.from_numpy(audio.channels(sr))
+    else:
+        wav, sr = torchaudio.load(audio)
     
     print(f"[INFO] Loaded audio: {wav.shape} channels, {sr} Hz")
 
@@ -83,33 +211,262 @@ def separate_polyphonic(input_file: str, output_dir: str):
     print(f"[INFO] Final input shape: {wav.shape} (batch, channels, samples)")
 
     # Apply Demucs with optimizations
-    with torch.no_grad():  # Disable gradient computation for inference
-        stems = apply_model(
-            model, 
-            wav,
-            shifts=1,      # Reduced from default 10 (faster but slightly less quality)
-            overlap=0.25,  # Default, you can reduce to 0.1 for more speed
-            split=True     # Process in chunks to save memory
-        )
+    if threads_per_worker is None:
+        threads_per_worker = default_threads_per_worker(workers)
+    if device == "cpu" and workers > 1:
+        stems = _apply_model_parallel(wav[0], model, preset, workers, threads_per_worker).unsqueeze(0)
+    else:
+        if device == "cpu":
+            torch.set_num_threads(threads_per_worker)
+        stems = _run_model(model, wav, settings)
 
     print(f"[INFO] Separation complete, output shape: {stems.shape}")
 
-    # Save stems
+    # Save stems (encoded on the background writer)
     stem_paths = {}
+    stem_buffers = {}
     for i, name in enumerate(model.sources):
-        out_file = output_dir / f"{name}.wav"
-        
+        out_file = stem_path(output_dir, name, stem_format)
+
         # Get stem audio (remove batch dimension, move to CPU)
-        stem_audio = stems[0, i].cpu().numpy().T
-        
-        print(f"[INFO] Saving {name} stem: {stem_audio.shape}")
-        
-        sf.write(
-            out_file,
-            stem_audio,
-            model.samplerate
+        stem_audio = stems[0, i].cpu().numpy()
+        if return_audio:
+            stem_buffers[name] = AudioBuffer(stem_audio, model.samplerate, path=str(out_file))
+
+        print(f"[INFO] Saving {name} stem as {stem_format}: {stem_audio.shape}")
+        encode_stem_async(
+            stem_audio, model.samplerate, out_file, stem_format,
+            on_done=(lambda path, name=name: on_stem_written(name, str(path))) if on_stem_written else None
         )
         stem_paths[name] = str(out_file)
-        print(f"[INFO] ✓ Saved {name} to {out_file}")
 
-    return stem_paths
\ No newline at end of file
+    if not background_write:
+        wait_for_stems(stem_paths.values())
+        print(f"[INFO] ✓ Saved stems to {output_dir}")
+
+    if return_audio:
+        return stem_paths, stem_buffers
+    return stem_paths
+
+# ============================================================
+# SEGMENT-PARALLEL CPU SEPARATION
+# ============================================================
+
+_segment_pool = None
+_segment_pool_config = None
+
+
+def _init_segment_worker(threads: int, model_name: str):
+    """Pool initializer: pin torch threads and load the preset's model once per worker"""
+    torch.set_num_threads(threads)
+    get_cached_model(model_name)
+
+
+def _separate_segment(segment: np.ndarray, preset: str) -> np.ndarray:
+    """Separate one (channels, samples) segment → (sources, channels, samples)"""
+    settings = get_preset(preset)
+    model = get_cached_model(settings["model"])
+    est = _run_model(model, torch.from_numpy(segment).unsqueeze(0), settings)
+    return est[0].numpy()
+
+
+def _get_segment_pool(workers: int, threads: int, model_name: str) -> ProcessPoolExecutor:
+    """Reuse the worker pool across calls (models stay loaded in the workers)"""
+    global _segment_pool, _segment_pool_config
+    config = (workers, threads, model_name)
+    if _segment_pool is None or _segment_pool_config != config:
+        if _segment_pool is not None:
+            _segment_pool.shutdown()
+        print(f"[INFO] Starting Demucs CPU pool: {workers} worker(s) × {threads} thread(s), "
+              f"model '{model_name}'")
+        _segment_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_segment_worker,
+            initargs=(threads, model_name)
+        )
+        _segment_pool_config = config
+    return _segment_pool
+
+
+def _apply_model_parallel(wav, model, preset: str, workers: int, threads_per_worker: int):
+    """
+    Run Demucs on overlapping segments in parallel CPU processes
+
+    Args:
+        wav: (channels, samples) tensor at model.samplerate
+    Returns:
+        (sources, channels, samples) tensor, segments cross-faded over the overlap
+    """
+    total = wav.shape[-1]
+    overlap = int(PARALLEL_OVERLAP_SECONDS * model.samplerate)
+    hop = max(math.ceil(total / workers), overlap + 1)
+
+    bounds = []
+    start = 0
+    while start < total:
+        bounds.append((start, min(start + hop + overlap, total)))
+        start += hop
+
+    print(f"[INFO] Parallel CPU separation: {len(bounds)} segment(s) on {workers} worker(s)")
+
+    audio = wav.cpu().numpy()
+    pool = _get_segment_pool(workers, threads_per_worker, get_preset(preset)["model"])
+    futures = [pool.submit(_separate_segment, audio[:, s:e].copy(), preset) for s, e in bounds]
+
+    out = np.zeros((len(model.sources), audio.shape[0], total), dtype=np.float32)
+    weight = np.zeros(total, dtype=np.float32)
+
+    for i, ((s, e), future) in enumerate(zip(bounds, futures)):
+        est = future.result()
+        length = e - s
+
+        # Trapezoid window: ramps where this segment overlaps a neighbour
+        w = np.ones(length, dtype=np.float32)
+        if i > 0:
+            ramp = min(overlap, length)
+            w[:ramp] = np.linspace(0.0, 1.0, ramp, dtype=np.float32)
+        if i < len(bounds) - 1:
+            ramp = min(overlap, length)
+            w[-ramp:] = np.minimum(w[-ramp:], np.linspace(1.0, 0.0, ramp, dtype=np.float32))
+
+        out[..., s:e] += est * w
+        weight[s:e] += w
+
+    out /= np.maximum(weight, 1e-8)
+    return torch.from_numpy(out)
+
+
+# ============================================================
+# STREAMING SEPARATION (long recordings)
+# ============================================================
+
+# Tracks at least this long are separated window by window
+STREAMING_MIN_DURATION = 600.0   # seconds
+
+# Window/overlap for streaming mode (input read, Demucs run and stems written per window)
+STREAM_WINDOW_SECONDS = 30.0
+STREAM_OVERLAP_SECONDS = 2.0
+
+
+def _to_stereo(wav):
+    """Demucs expects exactly 2 channels"""
+    if wav.shape[0] == 1:
+        return wav.repeat(2, 1)
+    return wav[:2, :]
+
+
+def separate_polyphonic_streaming(
+    input_file: str,
+    output_dir: str,
+    preset: str = DEFAULT_PRESET,
+    window_seconds: float = STREAM_WINDOW_SECONDS,
+    overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+    stem_format: str = STEM_FORMAT
+):
+    """
+    Separate a long recording with bounded memory
+
+    The input is read in overlapping windows, each window is separated on its
+    own, neighbouring windows are linearly cross-faded over the overlap, and
+    finished samples are appended to the stem files straight away. Peak RAM
+    depends on the window length, not on the track length. Formats with a
+    fixed sample rate (Opus) fall back to FLAC here, since the stems are
+    encoded window by window at the model rate.
+
+    Returns:
+        dict stem name → file path (same as separate_polyphonic)
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("overlap_seconds must be smaller than window_seconds")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    settings = get_preset(preset)
+    model = get_cached_model(settings["model"])
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    out_sr = model.samplerate
+
+    if device == "cpu":
+        torch.set_num_threads(default_threads_per_worker(1))
+
+    fixed_sr = get_stem_format(stem_format)["samplerate"]
+    if fixed_sr and fixed_sr != out_sr:
+        print(f"[WARNING] Stem format '{stem_format}' needs {fixed_sr} Hz, streaming stems are written as FLAC")
+        stem_format = "flac"
+
+    stem_paths = {name: str(stem_path(output_dir, name, stem_format)) for name in model.sources}
+
+    with sf.SoundFile(input_file) as src:
+        in_sr = src.samplerate
+        total = src.frames
+        ratio = out_sr / in_sr
+
+        window = int(window_seconds * in_sr)
+        hop = window - int(overlap_seconds * in_sr)
+        keep = int(overlap_seconds * out_sr)    # output samples held back for the next cross-fade
+
+        print(f"[INFO] Streaming separation: {total / in_sr:.1f}s at {in_sr} Hz, "
+              f"{window_seconds:.0f}s windows, {overlap_seconds:.1f}s overlap")
+
+        writers = {
+            name: open_stem_writer(path, out_sr, 2, stem_format)
+            for name, path in stem_paths.items()
+        }
+
+        try:
+            written = 0       # output samples already on disk
+            pending = None    # (sources, 2, n) tail waiting to be cross-faded
+
+            def flush(block):
+                nonlocal written
+                if block.shape[-1] == 0:
+                    return
+                for i, name in enumerate(model.sources):
+                    writers[name].write(np.clip(block[i].T, -1.0, 1.0))
+                written += block.shape[-1]
+
+            start = 0
+            while start < total:
+                src.seek(start)
+                chunk = src.read(window, dtype="float32", always_2d=True)
+                if len(chunk) == 0:
+                    break
+                is_last = start + len(chunk) >= total
+
+                wav = _to_stereo(torch.from_numpy(chunk.T.copy()))
+                if in_sr != out_sr:
+                    wav = torchaudio.functional.resample(wav, in_sr, out_sr)
+
+                est = _run_model(model, wav.unsqueeze(0).to(device), settings)[0].cpu().numpy()
+
+                # Cross-fade the held-back tail of the previous window into this one
+                if pending is not None:
+                    out_start = int(round(start * ratio))
+                    ov = written + pending.shape[-1] - out_start
+                    ov = max(0, min(ov, pending.shape[-1], est.shape[-1]))
+                    if ov:
+                        fade = np.linspace(0.0, 1.0, ov, dtype=np.float32)
+                        est[..., :ov] = pending[..., -ov:] * (1.0 - fade) + est[..., :ov] * fade
+                    flush(pending[..., :pending.shape[-1] - ov])
+                    pending = None
+
+                hold = 0 if is_last else min(keep, est.shape[-1])
+                flush(est[..., :est.shape[-1] - hold])
+                if hold:
+                    pending = est[..., -hold:]
+
+                print(f"[INFO] Separated {min(start + len(chunk), total) / in_sr:.1f}s / {total / in_sr:.1f}s")
+
+                if is_last:
+                    break
+                start += hop
+
+            if pending is not None:
+                flush(pending)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    print(f"[INFO] ✓ Streaming separation complete ({written / out_sr:.1f}s per stem)")
+    return stem_paths
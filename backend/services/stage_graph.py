@@ -0,0 +1,144 @@
+# backend/services/stage_graph.py
+"""
+Minimal declarative stage graph (DAG) runner
+
+Stages name the stages they depend on; a stage is submitted to a thread pool
+as soon as all of its dependencies have finished, so independent stages run
+concurrently. Threads (not processes) are used because stages share large
+in-memory inputs (the decoded AudioBuffer, models) and the heavy work
+(TensorFlow, NumPy, librosa) releases the GIL.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from services.metrics import measure
+
+STAGE_WORKERS = int(os.environ.get("PIPELINE_STAGE_WORKERS", "3"))
+
+
+class Stage:
+    """One node of the graph: func(*dependency_results) → result"""
+
+    def __init__(self, name: str, func, deps=(), optional: bool = False):
+        """
+        Args:
+            name: unique stage name (key in the results dict)
+            func: called with the results of deps, in order
+            deps: names of stages that must finish first
+            optional: on failure record the error and skip dependents
+                instead of failing the whole graph
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.optional = optional
+
+
+def _check_graph(stages: dict):
+    """Unknown dependencies or cycles raise ValueError"""
+    for stage in stages.values():
+        for dep in stage.deps:
+            if dep not in stages:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Cycle in stage graph at '{name}'")
+        visiting.add(name)
+        for dep in stages[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in stages:
+        visit(name)
+
+
+def _timed(name, func, args):
+    """Run func under measure(name), returning (value, error, start, record)"""
+    start = time.perf_counter()
+    value, error = None, None
+    with measure(name) as record:
+        try:
+            value = func(*args)
+        except Exception as e:
+            error = e
+    return value, error, start, record
+
+
+def run_stages(stages, max_workers: int = None, on_stage_done=None):
+    """
+    Execute a stage graph
+
+    on_stage_done: optional callback(name, result) for each successful stage,
+        called as soon as it finishes (e.g. to publish partial results)
+
+    Returns:
+        (results, timings): stage name → result, and stage name →
+        {"status", "start_sec", "wall_sec", "cpu_sec", "peak_rss_mb"[, "error"]}
+        with start_sec relative to the start of the graph
+    Raises:
+        the exception of the first failing non-optional stage
+    """
+    stages = {stage.name: stage for stage in stages}
+    _check_graph(stages)
+
+    results = {}
+    timings = {}
+    pending = dict(stages)
+    running = {}
+    graph_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or STAGE_WORKERS) as pool:
+        while pending or running:
+            # Submit every stage whose dependencies are finished
+            for name, stage in list(pending.items()):
+                if any(dep not in timings for dep in stage.deps):
+                    continue
+                del pending[name]
+
+                if any(timings[dep]["status"] != "done" for dep in stage.deps):
+                    results[name] = None
+                    timings[name] = {"status": "skipped"}
+                    continue
+
+                args = [results[dep] for dep in stage.deps]
+                running[pool.submit(_timed, name, stage.func, args)] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                value, error, start, record = future.result()
+
+                results[name] = value
+                timings[name] = {
+                    "status": "done" if error is None else "failed",
+                    "start_sec": round(start - graph_start, 3),
+                    "wall_sec": record["wall_sec"],
+                    "cpu_sec": record["cpu_sec"],
+                    "peak_rss_mb": record["peak_rss_mb"],
+                }
+
+                if error is not None:
+                    timings[name]["error"] = str(error)
+                    print(f"[WARNING] Stage '{name}' failed: {error}")
+                    if not stages[name].optional:
+                        for other in running:
+                            other.cancel()
+                        raise error
+                elif on_stage_done is not None:
+                    try:
+                        on_stage_done(name, value)
+                    except Exception as e:
+                        print(f"[WARNING] on_stage_done('{name}') failed: {e}")
+
+    return results, timings
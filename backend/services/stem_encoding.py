@@ -0,0 +1,181 @@
+# backend/services/stem_encoding.py
+"""
+Stem file encoding
+
+Demucs produces float32 stems; writing them as 32-bit float WAV costs about
+80 MB per stem for a 5-minute song. Stems are written in a configurable
+format instead (16-bit WAV, FLAC, Ogg Vorbis or Ogg Opus), and encoding runs
+on a background thread so it overlaps instrument detection. Callers that
+hand out stem URLs wait for the writes with wait_for_stems().
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from services.audio_buffer import AudioBuffer
+
+# name → soundfile settings (samplerate: fixed output rate, None = keep)
+STEM_FORMATS = {
+    "wav": {"format": "WAV", "subtype": "FLOAT", "ext": ".wav", "samplerate": None},
+    "pcm16": {"format": "WAV", "subtype": "PCM_16", "ext": ".wav", "samplerate": None},
+    "flac": {"format": "FLAC", "subtype": "PCM_16", "ext": ".flac", "samplerate": None},
+    "ogg": {"format": "OGG", "subtype": "VORBIS", "ext": ".ogg", "samplerate": None},
+    # Opus only supports 8/12/16/24/48 kHz (needs libsndfile >= 1.0.29)
+    "opus": {"format": "OGG", "subtype": "OPUS", "ext": ".opus", "samplerate": 48000},
+}
+# Lossless and ~4× smaller than float WAV
+STEM_FORMAT = os.environ.get("STEM_FORMAT", "flac")
+
+# Vorbis/Opus quality (0.0 – 1.0, libsndfile VBR setting)
+STEM_LOSSY_QUALITY = float(os.environ.get("STEM_LOSSY_QUALITY", 0.6))
+
+STEM_WRITE_WORKERS = int(os.environ.get("STEM_WRITE_WORKERS", 2))
+
+MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg; codecs=opus",
+    ".musicxml": "application/vnd.recordare.musicxml+xml",
+}
+
+_write_pool = None
+_pending = {}        # path → Future of a background write
+_pending_lock = threading.Lock()
+
+
+def get_stem_format(name: str = None) -> dict:
+    """Settings for a named stem format (STEM_FORMAT if None)"""
+    name = name or STEM_FORMAT
+    if name not in STEM_FORMATS:
+        raise ValueError(
+            f"Unknown stem format '{name}' "
+            f"(choose from: {', '.join(STEM_FORMATS)})"
+        )
+    return STEM_FORMATS[name]
+
+
+def stem_path(output_dir, name: str, fmt: str = None) -> Path:
+    """File path of stem `name` in format `fmt`"""
+    return Path(output_dir) / f"{name}{get_stem_format(fmt)['ext']}"
+
+
+def open_stem_writer(path, samplerate: int, channels: int, fmt: str = None) -> sf.SoundFile:
+    """SoundFile opened for incremental writing in format `fmt`"""
+    settings = get_stem_format(fmt)
+    if settings["samplerate"] and settings["samplerate"] != samplerate:
+        raise ValueError(f"Stem format '{fmt}' requires {settings['samplerate']} Hz input")
+
+    options = {}
+    if settings["subtype"] in ("VORBIS", "OPUS"):
+        options["compression_level"] = 1.0 - STEM_LOSSY_QUALITY
+
+    return sf.SoundFile(
+        str(path), "w",
+        samplerate=samplerate,
+        channels=channels,
+        format=settings["format"],
+        subtype=settings["subtype"],
+        **options
+    )
+
+
+def encode_stem(samples: np.ndarray, sr: int, path, fmt: str = None):
+    """
+    Write one stem
+
+    Args:
+        samples: (channels, n) float waveform
+        sr: sample rate of samples
+    """
+    settings = get_stem_format(fmt)
+    out_sr = settings["samplerate"] or sr
+    if out_sr != sr:
+        samples = AudioBuffer(samples, sr).channels(out_sr)
+
+    # Encode to a temporary name so a half-written file is never served
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open_stem_writer(tmp, out_sr, samples.shape[0], fmt) as writer:
+        writer.write(np.clip(samples, -1.0, 1.0).T)
+    os.replace(tmp, path)
+
+
+def _get_write_pool() -> ThreadPoolExecutor:
+    global _write_pool
+    if _write_pool is None:
+        _write_pool = ThreadPoolExecutor(max_workers=STEM_WRITE_WORKERS, thread_name_prefix="stem-writer")
+    return _write_pool
+
+
+def encode_stem_async(samples: np.ndarray, sr: int, path, fmt: str = None, on_done=None):
+    """
+    Queue encode_stem on the background writer; returns the Future
+
+    on_done: optional callback(path) once the file is complete
+    """
+    future = _get_write_pool().submit(encode_stem, samples, sr, path, fmt)
+    if on_done is not None:
+        future.add_done_callback(lambda f: f.exception() is None and on_done(path))
+    with _pending_lock:
+        _pending[str(path)] = future
+    return future
+
+
+def wait_for_stems(paths):
+    """
+    Block until background writes of these stem paths are finished
+
+    Raises:
+        the exception of a failed write
+    """
+    for path in paths:
+        with _pending_lock:
+            future = _pending.get(str(path))
+        if future is None:
+            continue
+        try:
+            future.result()
+        finally:
+            with _pending_lock:
+                if _pending.get(str(path)) is future:
+                    del _pending[str(path)]
+
+
+def transcode_file(source, target, fmt: str):
+    """Re-encode an existing stem file into another format (target written atomically)"""
+    samples, sr = sf.read(str(source), dtype="float32", always_2d=True)
+    encode_stem(samples.T, sr, target, fmt)
+    print(f"[INFO] Transcoded {Path(source).name} → {Path(target).name}")
+
+
+_transcode_locks = {}
+
+
+def get_transcoded(source, fmt: str) -> Path:
+    """
+    Path of `source` in format `fmt`, transcoding it on first request
+
+    Stems already in the requested encoding are returned as-is; other
+    formats are cached in a <fmt>/ sub-directory next to the source.
+    """
+    source = Path(source)
+    settings = get_stem_format(fmt)
+
+    if source.suffix == settings["ext"] and sf.info(str(source)).subtype == settings["subtype"]:
+        return source
+
+    target = source.parent / fmt / f"{source.stem}{settings['ext']}"
+    with _pending_lock:
+        lock = _transcode_locks.setdefault(str(target), threading.Lock())
+
+    with lock:
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            transcode_file(source, target, fmt)
+    return target
@@ -0,0 +1,226 @@
+# backend/services/storage_janitor.py
+"""
+Background cleanup of uploads/ and stems/
+
+A daemon thread in the API process periodically:
+  1. forgets jobs that finished more than JOB_TTL ago (unpinning their results),
+  2. deletes uploads and stem directories not accessed for JOB_TTL,
+  3. evicts least-recently-used ones while the two directories exceed
+     STORAGE_MAX_BYTES.
+Uploads of known jobs and stems pinned by them are never touched, so every
+URL a job returned stays valid until the job expires.
+"""
+
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+
+from services.ingest import PART_SUFFIX
+from services.jobs import get_job_manager, JOB_TTL
+from services.result_cache import get_result_cache
+from services.progress import EVENTS_DIR
+
+# Disk budget for uploads + stems together
+STORAGE_MAX_BYTES = int(os.environ.get("STORAGE_MAX_BYTES", 20 * 1024 ** 3))
+
+# Seconds between sweeps
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL_SECONDS", 300))
+
+# Anything touched more recently than this may belong to a job that is still
+# being written (before it has a result to pin) and is left alone
+JANITOR_GRACE = float(os.environ.get("JANITOR_GRACE_SECONDS", 3600))
+
+
+def _tree_stats(path: Path):
+    """(size in bytes, newest mtime) of a file or directory tree"""
+    stat = path.stat()
+    if not path.is_dir():
+        return stat.st_size, stat.st_mtime
+
+    size, newest = 0, stat.st_mtime
+    for child in path.rglob("*"):
+        try:
+            child_stat = child.stat()
+        except FileNotFoundError:
+            continue
+        newest = max(newest, child_stat.st_mtime)
+        if child.is_file():
+            size += child_stat.st_size
+    return size, newest
+
+
+def _upload_id(name: str) -> str:
+    """Upload files are <upload_id>_<filename>[.part|.sha256]"""
+    return name.split("_", 1)[0]
+
+
+class StorageJanitor:
+    """Evicts uploads and stems by age and disk budget (LRU on last access)"""
+
+    def __init__(self, upload_dir, stems_dir, ttl: float = JOB_TTL,
+                 max_bytes: int = STORAGE_MAX_BYTES, interval: float = JANITOR_INTERVAL,
+                 grace: float = JANITOR_GRACE):
+        self.upload_dir = Path(upload_dir)
+        self.stems_dir = Path(stems_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.grace = grace
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --------------------------------
+    # Lifecycle
+    # --------------------------------
+
+    def start(self):
+        """Start the sweep thread (pins left by a previous server run are dropped)"""
+        if self._thread is not None:
+            return
+        get_result_cache().clear_pins()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-janitor", daemon=True)
+        self._thread.start()
+        print(f"[INFO] Storage janitor started (TTL {self.ttl:.0f}s, "
+              f"budget {self.max_bytes / 1024 ** 3:.1f} GB, every {self.interval:.0f}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[WARNING] Storage sweep failed: {e}")
+
+    # --------------------------------
+    # Sweep
+    # --------------------------------
+
+    def _items(self):
+        """
+        Deletable units as dicts: upload groups (all files of one upload_id)
+        and top-level entries of the stems directory
+        """
+        items = []
+
+        groups = {}
+        if self.upload_dir.exists():
+            for path in self.upload_dir.iterdir():
+                groups.setdefault(_upload_id(path.name), []).append(path)
+        for upload_id, paths in groups.items():
+            try:
+                stats = [_tree_stats(p) for p in paths]
+            except FileNotFoundError:
+                continue
+            items.append({
+                "kind": "upload",
+                "name": upload_id,
+                "paths": paths,
+                "size": sum(size for size, _ in stats),
+                "last_access": max(mtime for _, mtime in stats),
+                # Aborted uploads are only removed by age
+                "staging": any(p.name.endswith(PART_SUFFIX) for p in paths),
+            })
+
+        if self.stems_dir.exists():
+            for path in self.stems_dir.iterdir():
+                try:
+                    size, last_access = _tree_stats(path)
+                except FileNotFoundError:
+                    continue
+                items.append({
+                    "kind": "stems",
+                    "name": path.name,
+                    "paths": [path],
+                    "size": size,
+                    "last_access": last_access,
+                    # Staging directories of running jobs are only removed by age
+                    "staging": path.name.startswith("."),
+                })
+
+        return items
+
+    def sweep(self) -> dict:
+        """
+        One cleanup pass
+
+        Returns:
+            {"expired_jobs", "deleted", "freed_bytes", "total_bytes"}
+        """
+        manager = get_job_manager()
+        cache = get_result_cache()
+
+        expired_jobs = manager.expire(self.ttl)
+        pinned_uploads = manager.upload_ids()
+        pinned_keys = cache.pinned_keys()
+
+        now = time.time()
+        items = sorted(self._items(), key=lambda item: item["last_access"])
+        total = sum(item["size"] for item in items)
+        deleted, freed = [], 0
+
+        for item in items:
+            pinned = item["name"] in (pinned_uploads if item["kind"] == "upload" else pinned_keys)
+            age = now - item["last_access"]
+            if pinned or age < self.grace:
+                continue
+
+            expired = age > self.ttl
+            over_budget = total > self.max_bytes and not item["staging"]
+            if not (expired or over_budget):
+                continue
+
+            self._delete(item, cache)
+            total -= item["size"]
+            freed += item["size"]
+            deleted.append(f"{item['kind']}:{item['name']}")
+
+        # Event logs left behind by a previous server run
+        if EVENTS_DIR.exists():
+            for path in EVENTS_DIR.glob("*.jsonl"):
+                try:
+                    if now - path.stat().st_mtime > self.ttl and manager.get(path.stem) is None:
+                        path.unlink()
+                except FileNotFoundError:
+                    continue
+
+        if expired_jobs or deleted:
+            print(f"[INFO] Storage sweep: {len(expired_jobs)} job(s) expired, {len(deleted)} item(s) deleted, "
+                  f"{freed / 1024 ** 2:.1f} MB freed, {total / 1024 ** 2:.1f} MB in use")
+
+        return {
+            "expired_jobs": len(expired_jobs),
+            "deleted": deleted,
+            "freed_bytes": freed,
+            "total_bytes": total,
+        }
+
+    def _delete(self, item: dict, cache):
+        if item["kind"] == "stems" and not item["staging"]:
+            # Drop the cached result too, so it is not served without its stems
+            cache.delete(item["name"])
+
+        for path in item["paths"]:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+
+# Global janitor (one per API process)
+_janitor = None
+
+def get_janitor(upload_dir=None, stems_dir=None) -> StorageJanitor:
+    """Get or create the storage janitor"""
+    global _janitor
+    if _janitor is None:
+        base_dir = Path(__file__).resolve().parents[1]
+        _janitor = StorageJanitor(upload_dir or base_dir / "uploads", stems_dir or base_dir / "stems")
+    return _janitor
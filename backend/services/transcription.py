@@ -0,0 +1,175 @@
+# backend/services/transcription.py
+"""
+Monophonic transcription as a stage graph
+
+    instrument ──► pitch ──► notes ──► note_tempo ──┐
+    onset_envelope ──► beats ───────────────────────┴► tempo ──► quantize ──► key ──► naming ──► musicxml
+
+Two branches run concurrently: instrument detection followed by the pitch
+chain (CREPE waits for YAMNet, because the band-pass filter applied before
+pitch tracking depends on the detected instrument), and onset envelope plus
+beat tracking. Quantization (on the tracked beat grid, shifted by the
+silence trimmed before pitch tracking), key detection, naming and MusicXML
+export follow once their inputs are ready. Every stage is timed, and partial
+results are published as progress events as soon as their stage finishes.
+"""
+
+from pathlib import Path
+
+from services.stage_graph import Stage, run_stages
+from services.progress import emit
+from services.monophonic.pitch_payload import encode_pitch_track
+from services.detect_monophonic_instrument import detect_single_instrument
+from services.monophonic.run_monophonic_pipeline import run_monophonic_pipeline
+from services.monophonic.note_segmentation import frames_to_notes
+from services.monophonic.tempo_beat_estimation import compute_onset_envelope, estimate_tempo_and_beats
+from services.monophonic.note_based_tempo import estimate_tempo_from_notes
+from services.monophonic.tempo_selector import select_final_tempo
+from services.monophonic.note_quantization import quantize_notes
+from services.monophonic.key_detection import detect_key
+from services.monophonic.note_naming import apply_key_aware_naming
+
+MUSICXML_FILENAME = "transcription.musicxml"
+
+# Pitch track is published in chunks of this length (keeps events small)
+PITCH_CHUNK_SECONDS = 10.0
+
+
+def transcribe_monophonic(audio, output_dir: Path = None) -> dict:
+    """
+    Run the full monophonic chain on a shared AudioBuffer
+
+    Args:
+        audio: decoded AudioBuffer
+        output_dir: where the MusicXML file is written (skipped if None)
+
+    Returns:
+        dict with instrument, pitch_data, notes, tempo, key, named notes,
+        musicxml path and per-stage timings
+    """
+
+    def pitch(instrument):
+        return run_monophonic_pipeline(
+            audio=audio,
+            instrument=instrument.get("instrument", "unknown"),
+            return_frames=True
+        )
+
+    stages = [
+        Stage("instrument", lambda: detect_single_instrument(audio)),
+        Stage("onset_envelope", lambda: compute_onset_envelope(audio)),
+        Stage("beats", lambda env: estimate_tempo_and_beats(onset_envelope=env), deps=["onset_envelope"]),
+        Stage("pitch", pitch, deps=["instrument"]),
+        Stage("notes", lambda p: frames_to_notes(*p[1]), deps=["pitch"]),
+        Stage("note_tempo", estimate_tempo_from_notes, deps=["notes"]),
+        Stage("tempo", select_final_tempo, deps=["beats", "note_tempo"]),
+        # Beats are tracked on the untrimmed audio, notes on the trimmed signal
+        Stage(
+            "quantize",
+            lambda notes, tempo, beats, p: quantize_notes(
+                notes, tempo["tempo"], beats=beats["beats"], beat_offset=p[2]
+            ),
+            deps=["notes", "tempo", "beats", "pitch"]
+        ),
+        Stage("key", detect_key, deps=["quantize"]),
+        Stage("naming", lambda q, key: apply_key_aware_naming(q, _key_name(key)), deps=["quantize", "key"]),
+        Stage(
+            "musicxml",
+            lambda named, key, tempo: _export_musicxml(named, key, tempo, output_dir),
+            deps=["naming", "key", "tempo"],
+            optional=True
+        ),
+    ]
+
+    results, timings = run_stages(stages, on_stage_done=_publish_stage)
+
+    total = max((t["start_sec"] + t["wall_sec"] for t in timings.values() if "wall_sec" in t), default=0.0)
+    print(f"[INFO] Transcription finished in {total:.2f}s")
+
+    return {
+        "instrument": results["instrument"],
+        "pitch_data": results["pitch"][0],
+        "notes": results["notes"],
+        "beats": results["beats"],
+        "note_tempo": results["note_tempo"],
+        "tempo": results["tempo"],
+        "quantized_notes": results["naming"],
+        "key": results["key"],
+        "musicxml_path": results["musicxml"],
+        "timings": timings,
+    }
+
+
+def _publish_stage(name, value):
+    """Progress events for the stages a client can show early"""
+    if name == "instrument":
+        emit("instrument", value)
+    elif name == "pitch":
+        _publish_pitch(value[0], value[1])
+    elif name == "notes":
+        emit("notes", {"notes": value})
+    elif name == "tempo":
+        emit("tempo", value)
+    elif name == "key":
+        emit("key", value)
+    elif name == "naming":
+        emit("quantized_notes", {"notes": value})
+
+
+def _publish_pitch(payload, frames):
+    """Preview first, then the full track as columnar chunks"""
+    emit("pitch_preview", {
+        "frame_count": payload["frame_count"],
+        "voiced_count": payload["voiced_count"],
+        "preview": payload.get("preview"),
+    })
+
+    time, frequency, confidence = frames
+    if not len(time):
+        return
+    step = payload["step"] or PITCH_CHUNK_SECONDS
+    frames_per_chunk = max(1, int(round(PITCH_CHUNK_SECONDS / step)))
+
+    for index, start in enumerate(range(0, len(time), frames_per_chunk)):
+        end = start + frames_per_chunk
+        chunk = encode_pitch_track(
+            time[start:end], frequency[start:end], confidence[start:end],
+            payload["sample_rate"], preview_points=0
+        )
+        emit("pitch_chunk", {"index": index, "first_frame": start, **chunk})
+
+
+def _key_name(key):
+    """detect_key result → name used for note spelling ("D", "D minor")"""
+    if not key:
+        return None
+    return key["key"] if key["mode"] == "major" else f"{key['key']} minor"
+
+
+def _export_musicxml(named_notes, key, tempo, output_dir):
+    """Write MusicXML next to the job's other artefacts; returns the path"""
+    from services.monophonic.export_musicxml import export_key_aware_notes_to_musicxml
+
+    if output_dir is None or not key:
+        return None
+
+    notes = [
+        {**n, "pitch": n["note_name"]}
+        for n in named_notes
+        if n["note_name"] != "Rest"
+    ]
+    if not notes:
+        return None
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / MUSICXML_FILENAME
+
+    export_key_aware_notes_to_musicxml(
+        notes,
+        f"{key['key']} {key['mode']}",
+        bpm=tempo["tempo"],
+        output_file=str(output_file)
+    )
+
+    return str(output_file)
@@ -0,0 +1,268 @@
+# backend/services/yamnet_batch.py
+"""
+Batched YAMNet inference over several stems at once
+
+YAMNet's SavedModel takes a single 16 kHz waveform, so stems are packed into
+one waveform on 0.48 s patch-hop boundaries with a silent hop between them.
+One forward pass scores every 0.96 s patch; patches are then assigned back to
+the stem they lie entirely inside.
+"""
+
+import csv
+from typing import Dict, List
+
+import numpy as np
+
+from services.model_registry import YAMNET_PATH, get_model
+
+YAMNET_SR = 16000
+PATCH_HOP = 7680          # 0.48 s
+PATCH_WINDOW = 15600      # 0.96 s patch incl. STFT window overhang
+
+YAMNET_HUB_HANDLE = "https://tfhub.dev/google/yamnet/1"
+
+# Score a class as present in a patch above this value
+PATCH_THRESHOLD = 0.1
+# Drop instruments below this aggregated confidence
+MIN_CONFIDENCE = 0.05
+
+# AudioSet display name → (instrument, category), per stem
+STEM_CLASS_MAP = {
+    "vocals": {
+        "Singing": ("vocals", "vocals"),
+        "Male singing": ("male_vocals", "vocals"),
+        "Female singing": ("female_vocals", "vocals"),
+        "Child singing": ("child_vocals", "vocals"),
+        "Choir": ("choir", "vocals"),
+        "Synthetic singing": ("synthetic_vocals", "vocals"),
+        "Rapping": ("rap_vocals", "vocals"),
+        "Humming": ("humming", "vocals"),
+        "Yodeling": ("yodeling", "vocals"),
+        "Chant": ("chant", "vocals"),
+        "Speech": ("spoken_word", "vocals"),
+    },
+    "drums": {
+        "Drum kit": ("drum_kit", "percussion"),
+        "Drum": ("drum_kit", "percussion"),
+        "Snare drum": ("snare_drum", "percussion"),
+        "Bass drum": ("kick_drum", "percussion"),
+        "Hi-hat": ("hi_hat", "percussion"),
+        "Cymbal": ("cymbals", "percussion"),
+        "Crash cymbal": ("cymbals", "percussion"),
+        "Drum roll": ("drum_kit", "percussion"),
+        "Rimshot": ("snare_drum", "percussion"),
+        "Drum machine": ("drum_machine", "percussion"),
+        "Tabla": ("tabla", "percussion"),
+        "Tambourine": ("tambourine", "percussion"),
+        "Cowbell": ("cowbell", "percussion"),
+        "Timpani": ("timpani", "percussion"),
+        "Bongo": ("bongo", "percussion"),
+        "Conga": ("conga", "percussion"),
+    },
+    "bass": {
+        "Bass guitar": ("bass_guitar", "bass"),
+        "Double bass": ("double_bass", "bass"),
+        "Synthesizer": ("synth_bass", "bass"),
+        "Tuba": ("tuba", "bass"),
+        "Cello": ("cello", "bass"),
+    },
+    "other": {
+        "Guitar": ("guitar", "strings"),
+        "Electric guitar": ("guitar", "strings"),
+        "Acoustic guitar": ("guitar", "strings"),
+        "Steel guitar, slide guitar": ("guitar", "strings"),
+        "Violin, fiddle": ("violin", "strings"),
+        "Cello": ("cello", "strings"),
+        "Harp": ("harp", "strings"),
+        "Banjo": ("banjo", "strings"),
+        "Mandolin": ("mandolin", "strings"),
+        "Ukulele": ("ukulele", "strings"),
+        "Sitar": ("sitar", "strings"),
+        "Piano": ("piano", "keyboard"),
+        "Electric piano": ("electric_piano", "keyboard"),
+        "Organ": ("organ", "keyboard"),
+        "Hammond organ": ("organ", "keyboard"),
+        "Harpsichord": ("harpsichord", "keyboard"),
+        "Synthesizer": ("synthesizer", "keyboard"),
+        "Trumpet": ("trumpet", "brass"),
+        "Trombone": ("trombone", "brass"),
+        "French horn": ("french_horn", "brass"),
+        "Brass instrument": ("brass_instrument", "brass"),
+        "Saxophone": ("saxophone", "woodwind"),
+        "Flute": ("flute", "woodwind"),
+        "Clarinet": ("clarinet", "woodwind"),
+        "Harmonica": ("harmonica", "woodwind"),
+        "Accordion": ("accordion", "other"),
+        "Bagpipes": ("bagpipes", "woodwind"),
+        "Marimba, xylophone": ("marimba", "percussion"),
+        "Vibraphone": ("vibraphone", "percussion"),
+        "Glockenspiel": ("glockenspiel", "percussion"),
+        "Steelpan": ("steelpan", "percussion"),
+    },
+}
+
+# Every mapped class, for recordings that are not a Demucs stem (solo instruments
+# and voices); "other" wins where stems map a class differently
+ALL_CLASS_MAP = {
+    class_name: target
+    for stem_map in STEM_CLASS_MAP.values()
+    for class_name, target in stem_map.items()
+}
+
+
+def load_yamnet_model():
+    """Load the raw YAMNet SavedModel; returns (model, class_names)"""
+    import tensorflow as tf
+
+    if YAMNET_PATH.exists():
+        print("[INFO] Loading YAMNet for batched inference (local model)...")
+        model = tf.saved_model.load(str(YAMNET_PATH))
+    else:
+        import tensorflow_hub as hub
+        print("[INFO] Loading YAMNet for batched inference (from TF Hub)...")
+        model = hub.load(YAMNET_HUB_HANDLE)
+
+    class_map_path = model.class_map_path().numpy().decode("utf-8")
+    with tf.io.gfile.GFile(class_map_path) as f:
+        class_names = [row["display_name"] for row in csv.DictReader(f)]
+
+    return model, class_names
+
+
+def get_yamnet_model():
+    """Shared (model, class_names), loaded once per process via the registry"""
+    return get_model("yamnet")
+
+
+def _pack(waveforms: Dict[str, np.ndarray]):
+    """
+    Concatenate 16 kHz waveforms on patch-hop boundaries
+
+    Returns:
+        packed waveform, {name: (first_patch, last_patch_exclusive)}
+    """
+    parts = []
+    spans = {}
+    offset = 0
+
+    for name, y in waveforms.items():
+        # Pad to a whole number of hops (at least one full patch), then one silent hop
+        n_hops = max(int(np.ceil(len(y) / PATCH_HOP)), int(np.ceil(PATCH_WINDOW / PATCH_HOP)))
+        padded = np.zeros((n_hops + 1) * PATCH_HOP, dtype=np.float32)
+        padded[:len(y)] = y
+
+        # Patch i spans [i*hop, i*hop + window); keep those ending before the next stem
+        first = offset // PATCH_HOP
+        last = first + n_hops - 1
+        spans[name] = (first, last)
+
+        parts.append(padded)
+        offset += len(padded)
+
+    return np.concatenate(parts), spans
+
+
+def score_stems(waveforms: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Run YAMNet once over all stems
+
+    Args:
+        waveforms: stem name → mono float waveform at 16 kHz
+    Returns:
+        stem name → (patches, 521) score matrix
+    """
+    model, _ = get_yamnet_model()
+    packed, spans = _pack(waveforms)
+
+    scores, _, _ = model(packed)
+    scores = scores.numpy()
+
+    return {
+        name: scores[first:min(last, len(scores))]
+        for name, (first, last) in spans.items()
+    }
+
+
+def scores_to_instruments(stem_name: str, scores: np.ndarray, class_map: Dict = None,
+                          min_confidence: float = MIN_CONFIDENCE) -> List[Dict]:
+    """
+    Aggregate patch scores into instrument detections for one stem
+
+    class_map: AudioSet class → (instrument, category) (default: the stem's map)
+    min_confidence: drop instruments below this aggregated confidence
+    """
+    _, class_names = get_yamnet_model()
+    if class_map is None:
+        class_map = STEM_CLASS_MAP.get(stem_name, STEM_CLASS_MAP["other"])
+    total_segments = int(len(scores))
+
+    best = {}
+    if total_segments:
+        for idx, class_name in enumerate(class_names):
+            if class_name not in class_map:
+                continue
+
+            instrument, category = class_map[class_name]
+            column = scores[:, idx]
+            max_conf = float(np.max(column))
+            mean_conf = float(np.mean(column))
+            confidence = 0.5 * max_conf + 0.5 * mean_conf
+
+            if confidence < min_confidence:
+                continue
+            if instrument in best and best[instrument]["confidence"] >= confidence:
+                continue
+
+            best[instrument] = {
+                "instrument": instrument,
+                "confidence": round(confidence, 3),
+                "category": category,
+                "yamnet_class": class_name,
+                "max_confidence": round(max_conf, 3),
+                "mean_confidence": round(mean_conf, 3),
+                "segments_detected": int(np.sum(column > PATCH_THRESHOLD)),
+                "total_segments": total_segments,
+                "sources": ["YAMNet"],
+                "detectors_agreed": 1,
+            }
+
+    return sorted(best.values(), key=lambda x: x["confidence"], reverse=True)
+
+
+class SharedYAMNetDetector:
+    """
+    Detector interface (detect_instruments) over the registry's single YAMNet
+
+    Every caller gets its own confidence threshold while the model itself is
+    loaded once per process; detections use the same aggregation as the
+    batched stem path.
+    """
+
+    def __init__(self, confidence_threshold: float = MIN_CONFIDENCE, class_map: Dict = None):
+        self.confidence_threshold = confidence_threshold
+        self.class_map = ALL_CLASS_MAP if class_map is None else class_map
+
+    def detect_instruments(self, audio, monophonic_mode: bool = False) -> List[Dict]:
+        """
+        Instruments in one recording, most confident first
+
+        audio: file path, AudioBuffer or mono 16 kHz waveform
+        monophonic_mode: accepted for compatibility; solo recordings and
+            mixes use the same class map
+        """
+        from services.audio_buffer import AudioBuffer
+
+        if isinstance(audio, AudioBuffer):
+            y = audio.mono(YAMNET_SR)
+        elif isinstance(audio, np.ndarray):
+            y = audio
+        else:
+            import librosa
+            y, _ = librosa.load(str(audio), sr=YAMNET_SR, mono=True)
+
+        scores = score_stems({"audio": y})["audio"]
+        return scores_to_instruments(
+            "audio", scores,
+            class_map=self.class_map,
+            min_confidence=self.confidence_threshold
+        )
@@ -1,4 +1,124 @@
 // frontend/renderer.js
+const API_BASE = "http://127.0.0.1:8000";
+const JOB_POLL_INTERVAL_MS = 1000;
+
+async function waitForJob(jobId) {
+    while (true) {
+        const res = await fetch(`${API_BASE}/jobs/${jobId}`);
+        if (!res.ok) {
+            throw new Error(`HTTP error: ${res.status} - ${await res.text()}`);
+        }
+
+        const job = await res.json();
+        if (job.status === "done") {
+            const resultRes = await fetch(`${API_BASE}/jobs/${jobId}/result`);
+            if (!resultRes.ok) {
+                throw new Error(`HTTP error: ${resultRes.status} - ${await resultRes.text()}`);
+            }
+            return resultRes.json();
+        }
+        if (job.status === "failed") {
+            throw new Error(`Processing failed: ${job.error}`);
+        }
+        if (job.status === "cancelled") {
+            throw new Error("Processing was cancelled");
+        }
+
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
+// Follow a job over Server-Sent Events, rendering partial results as they arrive.
+// Resolves with the final result; falls back to polling if the stream breaks.
+function streamJob(jobId, onEvent) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+        let finished = false;
+        // Set when the server ends a long stream on purpose; the close that
+        // follows is answered by EventSource's own reconnect (with Last-Event-ID)
+        let reconnecting = false;
+        const finish = (fn, value) => {
+            finished = true;
+            source.close();
+            fn(value);
+        };
+
+        const partialEvents = [
+            "status", "type", "stem", "instruments", "instrument", "pitch_preview",
+            "pitch_chunk", "notes", "tempo", "key", "quantized_notes"
+        ];
+        for (const name of partialEvents) {
+            source.addEventListener(name, e => onEvent(name, JSON.parse(e.data)));
+        }
+
+        source.addEventListener("result", e => finish(resolve, JSON.parse(e.data)));
+        source.addEventListener("reconnect", () => { reconnecting = true; });
+        source.addEventListener("error", e => {
+            if (finished) return;
+            if (e.data) {
+                const error = JSON.parse(e.data);
+                finish(reject, new Error(`Processing ${error.status || "failed"}: ${error.detail}`));
+            } else if (reconnecting && source.readyState === EventSource.CONNECTING) {
+                // Stream lifetime reached: let EventSource resume where it left off
+                reconnecting = false;
+            } else {
+                // Connection problem (no payload): poll instead of auto-reconnecting
+                console.warn("[WARNING] Event stream lost, polling job status");
+                finished = true;
+                source.close();
+                waitForJob(jobId).then(resolve, reject);
+            }
+        });
+    });
+}
+
+// Accumulates progress events into the shape of a final result
+function createPartialRenderer(status) {
+    const partial = { stems: {}, instruments: {}, pitch_data: null, note_data: null };
+
+    return (name, data) => {
+        switch (name) {
+            case "status":
+                if (!partial.type) status.querySelector("small").textContent = `Job ${data.status}...`;
+                break;
+            case "type":
+                partial.type = data.type;
+                status.querySelector("small").innerHTML =
+                    `Audio type: <strong>${data.type}</strong> (${(data.confidence * 100).toFixed(0)}% confidence)` +
+                    (data.type === "polyphonic" ? " — separating stems..." : " — transcribing...");
+                break;
+            case "stem":
+                partial.stems[data.name] = data.url;
+                displayStems(partial.stems, partial.instruments);
+                break;
+            case "instruments":
+                partial.instruments[data.stem] = data.instruments;
+                displayStems(partial.stems, partial.instruments);
+                break;
+            case "instrument":
+                partial.instrument = data;
+                break;
+            case "pitch_preview":
+                partial.pitch_data = data;
+                break;
+            case "notes":
+                partial.note_data = { notes: data.notes };
+                break;
+            case "tempo":
+                partial.final_tempo = data;
+                break;
+            case "key":
+                partial.key = data;
+                break;
+        }
+
+        if (partial.type === "monophonic" && partial.instrument &&
+            ["instrument", "pitch_preview", "notes", "tempo", "key"].includes(name)) {
+            displayMonophonicResult(partial);
+        }
+    };
+}
+
 document.getElementById("uploadBtn").onclick = async () => {
     const fileInput = document.getElementById("audioFile");
     const status = document.getElementById("status");
@@ -10,6 +130,8 @@ document.getElementById("uploadBtn").onclick = async () => {
     }
 
     const formData = new FormData();
+    // preset first: the server can then start processing before the upload finishes
+    formData.append("preset", document.getElementById("preset").value);
     formData.append("file", fileInput.files[0]);
 
     // Show processing
@@ -36,21 +158,26 @@ document.getElementById("uploadBtn").onclick = async () => {
     }, 500);
 
     try {
-        const res = await fetch("http://127.0.0.1:8000/upload/", {
+        const res = await fetch(`${API_BASE}/upload/`, {
             method: "POST",
             body: formData
         });
 
-        clearInterval(progressInterval);
-        const bar = document.getElementById("progressBar");
-        if (bar) bar.style.width = "100%";
-
         if (!res.ok) {
             const errorText = await res.text();
             throw new Error(`HTTP error: ${res.status} - ${errorText}`);
         }
 
-        const result = await res.json();
+        // Upload returns a job ID immediately; stream partial results until the pipeline finishes
+        const job = await res.json();
+        console.log("[DEBUG] Job queued:", job);
+        const result = window.EventSource
+            ? await streamJob(job.job_id, createPartialRenderer(status))
+            : await waitForJob(job.job_id);
+
+        clearInterval(progressInterval);
+        const bar = document.getElementById("progressBar");
+        if (bar) bar.style.width = "100%";
         console.log("[DEBUG] Full Response:", result);
 
         const confidenceText = result.confidence?.toFixed(2) || "N/A";
@@ -120,8 +247,19 @@ function displayMonophonicResult(result) {
     `;
 
     /* ===================== ADDED CODE (ONLY THIS PART) ===================== */
-    if (result.pitch_data && result.pitch_data.pitch_points) {
-        const pitches = result.pitch_data.pitch_points.slice(0, 20);
+    if (result.pitch_data && result.pitch_data.preview) {
+        // Overview buckets; the full track is in pitch_data (base64 float32) or /jobs/{id}/pitch.bin
+        const preview = result.pitch_data.preview;
+        const pitches = [];
+        for (let i = 0; i < preview.time.length && pitches.length < 20; i++) {
+            if (preview.frequency[i] !== null) {
+                pitches.push({
+                    time: preview.time[i],
+                    frequency: preview.frequency[i],
+                    confidence: preview.confidence[i]
+                });
+            }
+        }
 
         let pitchHTML = `
             <div style="margin-top: 25px; background: white; padding: 20px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
@@ -147,7 +285,7 @@ function displayMonophonicResult(result) {
         pitchHTML += `
                 </table>
                 <p style="font-size:13px;color:#666; margin-top:10px;">
-                    Showing first 20 pitch points
+                    Showing first 20 preview points of ${result.pitch_data.voiced_count} voiced frames
                 </p>
             </div>
         `;
@@ -193,6 +331,24 @@ if (result.note_data && result.note_data.notes) {
 }
 /* ===================== END NOTE SEGMENTS ===================== */
 
+    /* ===================== NOTATION SUMMARY ===================== */
+if (result.final_tempo || result.key || result.musicxml) {
+    const keyText = result.key ? `${result.key.key} ${result.key.mode}` : "unknown";
+    const tempoText = result.final_tempo
+        ? `${result.final_tempo.tempo} BPM (${result.final_tempo.source})`
+        : "unknown";
+
+    stemsDiv.innerHTML += `
+        <div style="margin-top: 25px; background: white; padding: 20px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
+            <h4 style="margin-bottom: 15px;">📜 Notation</h4>
+            <p style="margin: 5px 0;"><strong>Key:</strong> ${keyText}</p>
+            <p style="margin: 5px 0;"><strong>Tempo:</strong> ${tempoText}</p>
+            ${result.musicxml ? `<p style="margin: 5px 0;"><a href="${API_BASE}${result.musicxml}" download>Download MusicXML</a></p>` : ''}
+        </div>
+    `;
+}
+/* ===================== END NOTATION SUMMARY ===================== */
+
 }
 
 
@@ -219,7 +375,7 @@ function displayStems(stems, instruments) {
             <h4 style="color: #764ba2; margin: 0 0 15px 0; font-size: 20px; text-transform: uppercase;">
                 ${name} ${getStemEmoji(name)}
             </h4>
-            <audio controls style="width: 100%; margin-bottom: 15px;" src="http://127.0.0.1:8000${url}"></audio>
+            <audio controls preload="metadata" style="width: 100%; margin-bottom: 15px;" src="${API_BASE}${url}"></audio>
         `;
 
         // Check if we have instrument data
@@ -0,0 +1,206 @@
+# scripts/batch_process.py
+"""
+Offline batch runner: process a directory (or manifest) of songs
+
+Files are fanned out over a process pool whose workers load the models once.
+Each finished file is appended to <output>/summary.jsonl, which doubles as
+the checkpoint: re-running the same command skips files already recorded as
+done (same path, size, modification time and pipeline configuration, so a
+run with another --preset processes everything again). Uses the same process_audio
+pipeline as the API, with its own result cache under <output>/cache, so the
+API's cache eviction never touches batch stems (and vice versa).
+
+Usage:
+    python scripts/batch_process.py songs/ --output batch_out [--workers 2] [--preset balanced]
+    python scripts/batch_process.py manifest.txt --output batch_out
+Manifest: one path per line, or JSONL with a "path" field.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.pipeline import process_audio, pipeline_config
+from services.separate_demucs import SEPARATION_PRESETS, DEFAULT_PRESET
+from services.model_registry import warm_up_models
+from services.result_cache import ResultCache, make_cache_key
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aiff", ".aif"}
+SUMMARY_FILE = "summary.jsonl"
+
+# Batch outputs are the deliverable: the batch cache is never evicted
+BATCH_CACHE_MAX_BYTES = sys.maxsize
+
+# Result cache of this worker process (one per output directory)
+_cache = None
+
+
+def collect_inputs(source: Path):
+    """Audio files under a directory, or the entries of a manifest file"""
+    if source.is_dir():
+        return sorted(
+            p.resolve() for p in source.rglob("*")
+            if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS
+        )
+
+    paths = []
+    for line in source.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = json.loads(line)["path"] if line.startswith("{") else line
+        path = Path(path)
+        if not path.is_absolute():
+            path = source.parent / path
+        paths.append(path.resolve())
+    return paths
+
+
+def config_id(preset: str) -> str:
+    """Short hash of everything in the pipeline configuration that affects results"""
+    return make_cache_key("batch", pipeline_config(preset))[:16]
+
+
+def fingerprint(path: Path, config: str) -> str:
+    """Checkpoint identity of an input file processed under config (config_id)"""
+    stat = path.stat()
+    return f"{path}|{stat.st_size}|{int(stat.st_mtime)}|{config}"
+
+
+def load_checkpoint(summary_path: Path) -> set:
+    """Fingerprints already processed successfully"""
+    done = set()
+    if not summary_path.exists():
+        return done
+
+    with open(summary_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # torn last line of an interrupted run
+            if entry.get("status") == "done":
+                done.add(entry["fingerprint"])
+    return done
+
+
+def _get_cache(output_dir: Path) -> ResultCache:
+    """Result cache of the batch, owning only <output>/stems"""
+    global _cache
+    if _cache is None or _cache.cache_dir != output_dir / "cache":
+        _cache = ResultCache(output_dir / "cache", BATCH_CACHE_MAX_BYTES, stems_root=output_dir / "stems")
+    return _cache
+
+
+def _process_one(path: str, output_dir: str, preset: str) -> dict:
+    """Worker task: run the pipeline and store the full result as JSON"""
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+
+    result = process_audio(
+        path, str(output_dir / "stems"), Path(path).as_uri(), preset,
+        cache=_get_cache(output_dir)
+    )
+
+    key = result["cache"]["key"]
+    result_path = output_dir / "results" / f"{key}.json"
+    result_path.parent.mkdir(parents=True, exist_ok=True)
+    result_path.write_text(json.dumps(result))
+
+    musicxml = result.get("musicxml")
+    return {
+        "type": result.get("type"),
+        "cache_key": key,
+        "cache_hit": result["cache"]["hit"],
+        "result_file": str(result_path),
+        "stems_dir": str(output_dir / "stems" / key),
+        "musicxml": str(output_dir / musicxml.lstrip("/")) if musicxml else None,
+        "notes": len(result.get("note_data", {}).get("notes", [])),
+        "wall_sec": round(time.perf_counter() - start, 3),
+    }
+
+
+def _append(summary, entry: dict):
+    summary.write(json.dumps(entry) + "\n")
+    summary.flush()
+    os.fsync(summary.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of audio files or manifest file")
+    parser.add_argument("--output", required=True, help="output directory (stems, results, cache, summary.jsonl)")
+    parser.add_argument("--workers", type=int, default=max(1, min(2, os.cpu_count() or 1)))
+    parser.add_argument("--preset", default=DEFAULT_PRESET, choices=list(SEPARATION_PRESETS))
+    parser.add_argument("--no-resume", action="store_true", help="reprocess files already in summary.jsonl")
+    parser.add_argument("--no-warmup", action="store_true", help="load models lazily in each worker")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    output_dir = Path(args.output).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = output_dir / SUMMARY_FILE
+
+    # Worker count as seen by the pipeline (Demucs divides the cores by it)
+    os.environ["PIPELINE_WORKERS"] = str(args.workers)
+
+    inputs = collect_inputs(source)
+    done = set() if args.no_resume else load_checkpoint(summary_path)
+    config = config_id(args.preset)
+    todo = [p for p in inputs if p.exists() and fingerprint(p, config) not in done]
+    missing = [p for p in inputs if not p.exists()]
+
+    print(f"[INFO] {len(inputs)} input(s): {len(inputs) - len(todo) - len(missing)} already done, "
+          f"{len(todo)} to process, {len(missing)} missing")
+    if not todo:
+        return
+
+    failures = 0
+    with open(summary_path, "a") as summary, ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=None if args.no_warmup else warm_up_models
+    ) as pool:
+        for path in missing:
+            _append(summary, {"path": str(path), "status": "missing", "finished_at": time.time()})
+
+        futures = {
+            pool.submit(_process_one, str(path), str(output_dir), args.preset): path
+            for path in todo
+        }
+
+        for index, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            entry = {
+                "path": str(path),
+                "fingerprint": fingerprint(path, config),
+                "preset": args.preset,
+                "config": config,
+            }
+
+            try:
+                entry.update(future.result())
+                entry["status"] = "done"
+                print(f"[INFO] [{index}/{len(todo)}] {path.name}: {entry['type']} "
+                      f"({entry['wall_sec']:.1f}s{', cached' if entry['cache_hit'] else ''})")
+            except Exception as e:
+                failures += 1
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+                print(f"[ERROR] [{index}/{len(todo)}] {path.name}: {e}")
+
+            entry["finished_at"] = time.time()
+            _append(summary, entry)
+
+    print(f"[INFO] Finished: {len(todo) - failures} done, {failures} failed → {summary_path}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# scripts/benchmark_demucs_cpu.py
+"""
+Wall-clock comparison of CPU Demucs execution modes:
+single apply_model call vs segment-parallel workers × threads splits
+
+Usage:
+    python scripts/benchmark_demucs_cpu.py [audio_file] [--seconds 60]
+Without an audio file a synthetic stereo mix is generated.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import torch
+from services.audio_buffer import AudioBuffer
+from services.separate_demucs import separate_polyphonic
+
+
+def synth_mix(seconds: float, sr: int = 44100) -> AudioBuffer:
+    """Deterministic stereo test mix: bass line, chord pad and clicks"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    bass = 0.3 * np.sin(2 * np.pi * 55.0 * t)
+    pad = sum(0.1 * np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    clicks = np.zeros_like(t)
+    clicks[::sr // 2] = 1.0
+    clicks = np.convolve(clicks, np.exp(-np.arange(400) / 60.0), mode="same")
+    noise = 0.01 * rng.standard_normal(len(t))
+    mono = (bass + pad + 0.5 * clicks + noise).astype(np.float32)
+    return AudioBuffer(np.stack([mono, np.roll(mono, 11)]), sr)
+
+
+def configurations(cores: int):
+    """(workers, threads_per_worker) splits to try"""
+    configs = [(1, cores)]
+    workers = 2
+    while workers <= cores:
+        configs.append((workers, max(1, cores // workers)))
+        workers *= 2
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_file", nargs="?")
+    parser.add_argument("--seconds", type=float, default=60.0, help="synthetic mix length")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        print("[WARNING] CUDA is available; this benchmark only measures the CPU path")
+
+    audio = AudioBuffer.load(args.audio_file) if args.audio_file else synth_mix(args.seconds)
+    cores = os.cpu_count() or 1
+    print(f"[INFO] Input: {audio.duration:.1f}s, {cores} logical cores")
+
+    # Warm up: model load + 44.1 kHz view are not part of the measurement
+    audio.channels(44100)
+
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for workers, threads in configurations(cores):
+            times = []
+            for _ in range(args.repeats + 1):
+                start = time.perf_counter()
+                separate_polyphonic(audio, out_dir, workers=workers, threads_per_worker=threads)
+                times.append(time.perf_counter() - start)
+            best = min(times[1:])   # first run includes model/pool start-up
+            results.append((workers, threads, best))
+
+    baseline = results[0][2]
+    print("\nworkers  threads  wall_s  x_realtime  speedup")
+    for workers, threads, wall in results:
+        print(f"{workers:7d}  {threads:7d}  {wall:6.1f}  {audio.duration / wall:10.2f}  {baseline / wall:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
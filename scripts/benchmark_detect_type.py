@@ -0,0 +1,90 @@
+# scripts/benchmark_detect_type.py
+"""
+Latency of the mono/poly decision: spectral fast path vs always-CREPE
+
+Usage:
+    python scripts/benchmark_detect_type.py [audio_file ...] [--repeats 3]
+Without audio files a synthetic monophonic melody and a polyphonic mix are used.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.audio_buffer import AudioBuffer
+from services.detect_type import detect_type
+
+
+def _saw(freq, t, partials=8):
+    return sum(np.sin(2 * np.pi * k * freq * t) / k for k in range(1, partials + 1))
+
+
+def synth_mono(seconds: float = 5.0, sr: int = 22050) -> AudioBuffer:
+    """Single-line sawtooth melody, one note every 0.5 s"""
+    notes = [261.63, 293.66, 329.63, 349.23, 392.0, 440.0, 493.88, 523.25]
+    n = int(0.5 * sr)
+    t = np.arange(n) / sr
+    env = np.minimum(1.0, t / 0.02) * np.exp(-t * 1.5)
+    y = np.concatenate([
+        0.2 * _saw(notes[i % len(notes)], t) * env
+        for i in range(int(seconds / 0.5))
+    ])
+    return AudioBuffer(y.astype(np.float32), sr)
+
+
+def synth_poly(seconds: float = 5.0, sr: int = 22050) -> AudioBuffer:
+    """Chords over a bass line with kick/hi-hat clicks"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    chord = sum(0.08 * _saw(f, t, 5) for f in (261.63, 329.63, 392.0, 493.88))
+    bass = 0.2 * np.sin(2 * np.pi * 65.41 * t)
+    drums = np.zeros_like(t)
+    drums[::sr // 4] = 1.0
+    drums = np.convolve(drums, rng.standard_normal(800) * np.exp(-np.arange(800) / 120.0), mode="same")
+    return AudioBuffer((chord + bass + 0.3 * drums).astype(np.float32), sr)
+
+
+def _time(audio, use_fast_path, repeats):
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = detect_type(audio, use_fast_path=use_fast_path)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_files", nargs="*")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.audio_files:
+        inputs = [(Path(p).name, AudioBuffer.load(p)) for p in args.audio_files]
+    else:
+        inputs = [("synthetic_mono", synth_mono()), ("synthetic_poly", synth_poly())]
+
+    # Warm up: CREPE model load is not part of the measurement
+    detect_type(inputs[0][1], use_fast_path=False)
+
+    rows = []
+    for name, audio in inputs:
+        (full_type, _), full_s = _time(audio, False, args.repeats)
+        (fast_type, fast_conf), fast_s = _time(audio, True, args.repeats)
+        rows.append((name, full_type, full_s, fast_type, fast_conf, fast_s))
+
+    print("\ninput                 full_type    full_s  fast_type    conf   fast_s  speedup")
+    for name, full_type, full_s, fast_type, fast_conf, fast_s in rows:
+        print(f"{name:20s}  {full_type:11s}  {full_s:6.2f}  {fast_type:11s}  {fast_conf:4.2f}  "
+              f"{fast_s:6.2f}  {full_s / fast_s:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
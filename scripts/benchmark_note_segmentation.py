@@ -0,0 +1,105 @@
+# scripts/benchmark_note_segmentation.py
+"""
+frames_to_notes: original per-frame loop vs vectorized segmenter
+
+Usage:
+    python scripts/benchmark_note_segmentation.py [--minutes 60]
+Uses a synthetic 10 ms pitch track (melody with vibrato, rests and dropouts)
+and checks that both implementations produce identical notes.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.monophonic.note_segmentation import frames_to_notes
+
+
+def frames_to_notes_loop(time, freq, conf, conf_thresh=0.6, pitch_change_thresh=50.0,
+                         min_note_duration=0.08):
+    """The original per-frame implementation (no instrument range), for reference"""
+    notes = []
+    current_start = None
+    current_pitch = None
+
+    for i in range(len(freq)):
+        voiced = conf[i] >= conf_thresh and not np.isnan(freq[i])
+
+        if not voiced:
+            if current_start is not None:
+                end_time = time[i]
+                if end_time - current_start >= min_note_duration:
+                    notes.append({"start": round(current_start, 3), "end": round(end_time, 3),
+                                  "pitch": round(current_pitch, 2)})
+                current_start = None
+                current_pitch = None
+            continue
+
+        if current_start is None:
+            current_start = time[i]
+            current_pitch = freq[i]
+            continue
+
+        if abs(freq[i] - current_pitch) > pitch_change_thresh:
+            end_time = time[i]
+            if end_time - current_start >= min_note_duration:
+                notes.append({"start": round(current_start, 3), "end": round(end_time, 3),
+                              "pitch": round(current_pitch, 2)})
+            current_start = time[i]
+            current_pitch = freq[i]
+        else:
+            current_pitch = 0.9 * current_pitch + 0.1 * freq[i]
+
+    if current_start is not None:
+        notes.append({"start": round(current_start, 3), "end": round(time[-1], 3),
+                      "pitch": round(current_pitch, 2)})
+
+    return notes
+
+
+def synth_track(minutes: float, step: float = 0.01):
+    """Melody of 50-800 ms notes with vibrato, rests and unvoiced dropouts"""
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 / step)
+    t = np.arange(n) * step
+
+    lengths = rng.integers(5, 80, size=n // 5 + 1)
+    note_idx = np.repeat(np.arange(len(lengths)), lengths)[:n]
+    base = 220.0 * 2 ** (rng.integers(0, 24, size=len(lengths)) / 12)
+    freq = base[note_idx] * 2 ** (0.3 * np.sin(2 * np.pi * 5.5 * t) / 12)
+
+    rest = rng.random(len(lengths)) < 0.15
+    conf = np.where(rest[note_idx], 0.1, 0.9) - 0.5 * (rng.random(n) < 0.02)
+    freq[conf < 0.5] = np.nan
+    return t, freq, conf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60.0)
+    args = parser.parse_args()
+
+    t, freq, conf = synth_track(args.minutes)
+    print(f"[INFO] {len(t)} frames ({args.minutes:.0f} min)")
+
+    start = time.perf_counter()
+    reference = frames_to_notes_loop(t, freq, conf)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    notes = frames_to_notes(t, freq, conf)
+    vector_s = time.perf_counter() - start
+
+    print(f"loop:       {loop_s:7.3f}s  ({len(reference)} notes)")
+    print(f"vectorized: {vector_s:7.3f}s  ({len(notes)} notes)  speedup {loop_s / vector_s:.1f}x")
+    print(f"identical:  {notes == reference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# scripts/benchmark_pipeline.py
+"""
+Reproducible latency/memory benchmark of the pipeline services
+
+Synthesizes deterministic audio (sawtooth melodies at a known tempo and
+polyphonic mixes), times each service function at several input lengths and
+writes the results as JSON, so runs can be compared across commits.
+
+Usage:
+    python scripts/benchmark_pipeline.py [--sizes 10,30,120] [--repeats 3]
+                                         [--skip separate_polyphonic,musicxml] [--output results.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.audio_buffer import AudioBuffer
+from services.metrics import measure
+from services.detect_type import detect_type
+from services.separate_demucs import separate_polyphonic, DEFAULT_PRESET
+from services.monophonic.pitch_extraction import extract_pitch
+from services.monophonic.note_segmentation import frames_to_notes
+from services.monophonic.note_quantization import quantize_notes
+from services.monophonic.key_detection import detect_key
+from services.monophonic.note_naming import apply_key_aware_naming
+
+SR = 44100
+TEMPO = 100.0
+SCALE = [261.63, 293.66, 329.63, 349.23, 392.0, 440.0, 493.88, 523.25]   # C major
+RESULTS_DIR = Path(__file__).resolve().parents[1] / "benchmarks"
+
+
+# ============================================================
+# SYNTHETIC AUDIO
+# ============================================================
+
+def _saw(freq, t, partials=8):
+    return sum(np.sin(2 * np.pi * k * freq * t) / k for k in range(1, partials + 1))
+
+
+def synth_melody(seconds: float, sr: int = SR, tempo: float = TEMPO) -> AudioBuffer:
+    """Monophonic C-major sawtooth melody, one note per beat"""
+    beat = int(sr * 60.0 / tempo)
+    t = np.arange(beat) / sr
+    env = np.minimum(1.0, t / 0.01) * np.minimum(1.0, (beat / sr - t) / 0.03)
+    notes = [0.2 * _saw(SCALE[(i * 3) % len(SCALE)], t) * env
+             for i in range(int(np.ceil(seconds * sr / beat)))]
+    y = np.concatenate(notes)[:int(seconds * sr)]
+    return AudioBuffer(y.astype(np.float32), sr)
+
+
+def synth_mix(seconds: float, sr: int = SR, tempo: float = TEMPO) -> AudioBuffer:
+    """Stereo chords + bass + drum clicks on the beat"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    chord = sum(0.06 * _saw(f, t, 5) for f in (261.63, 329.63, 392.0))
+    bass = 0.2 * np.sin(2 * np.pi * 65.41 * t)
+    drums = np.zeros_like(t)
+    drums[::int(sr * 60.0 / tempo)] = 1.0
+    drums = np.convolve(drums, rng.standard_normal(800) * np.exp(-np.arange(800) / 120.0), mode="same")
+    mono = (chord + bass + 0.3 * drums).astype(np.float32)
+    return AudioBuffer(np.stack([mono, np.roll(mono, 11)]), sr)
+
+
+# ============================================================
+# HARNESS
+# ============================================================
+
+def run_case(name, size, func, repeats):
+    """Time func() `repeats` times; the first call also counts (cold start is visible in max)"""
+    walls, cpus, peaks = [], [], []
+    value = None
+    try:
+        for _ in range(repeats):
+            with measure(name) as record:
+                value = func()
+            walls.append(record["wall_sec"])
+            cpus.append(record["cpu_sec"])
+            peaks.append(record["peak_rss_mb"] or 0.0)
+    except Exception as e:
+        print(f"[WARNING] {name} @ {size}s failed: {e}")
+        return {"function": name, "input_sec": size, "error": str(e)}, None
+
+    print(f"[INFO] {name:18s} {size:6.0f}s  median {statistics.median(walls):8.3f}s")
+    return {
+        "function": name,
+        "input_sec": size,
+        "repeats": repeats,
+        "wall_sec": {"min": min(walls), "median": statistics.median(walls), "max": max(walls)},
+        "cpu_sec": {"median": statistics.median(cpus)},
+        "peak_rss_mb": max(peaks),
+    }, value
+
+
+def benchmark_size(seconds, repeats, skip, work_dir):
+    melody = synth_melody(seconds)
+    mix = synth_mix(seconds)
+    results = []
+    outputs = {}    # name → value of every case that ran successfully
+
+    def case(name, func, needs=()):
+        """
+        Run one case unless it is skipped or an input case did not succeed;
+        either way it gets a report line and later independent cases still run
+        """
+        missing = [dep for dep in needs if dep not in outputs]
+        reason = None
+        if name in skip:
+            reason = "skipped with --skip"
+        elif missing:
+            reason = f"needs {', '.join(missing)} (skipped or failed)"
+
+        if reason is not None:
+            print(f"[INFO] {name:18s} {seconds:6.0f}s  skipped: {reason}")
+            results.append({"function": name, "input_sec": seconds, "skipped": reason})
+            return None
+
+        result, value = run_case(name, seconds, func, repeats)
+        results.append(result)
+        if "error" not in result:
+            outputs[name] = value
+        return value
+
+    case("detect_type_mono", lambda: detect_type(melody))
+    case("detect_type_poly", lambda: detect_type(mix))
+    case("separate_polyphonic", lambda: separate_polyphonic(
+        mix, str(Path(work_dir) / f"demucs_{seconds}"), preset=DEFAULT_PRESET))
+
+    y16 = melody.mono(16000)
+    case("extract_pitch", lambda: extract_pitch(y16, 16000))
+    case("frames_to_notes", lambda: frames_to_notes(*outputs["extract_pitch"]), needs=["extract_pitch"])
+
+    grid = np.arange(0.0, seconds, 60.0 / TEMPO)
+    case("quantize_notes", lambda: quantize_notes(outputs["frames_to_notes"], TEMPO, beats=grid),
+         needs=["frames_to_notes"])
+    case("detect_key", lambda: detect_key(outputs["quantize_notes"]), needs=["quantize_notes"])
+
+    def export():
+        from services.monophonic.export_musicxml import export_key_aware_notes_to_musicxml
+        quantized = outputs["quantize_notes"]
+        key = outputs.get("detect_key")
+        named = apply_key_aware_naming(quantized, key["key"] if key else None)
+        export_key_aware_notes_to_musicxml(
+            [{**n, "pitch": n["note_name"]} for n in named if n["note_name"] != "Rest"],
+            f"{key['key']} {key['mode']}" if key else "C major",
+            bpm=TEMPO,
+            output_file=str(Path(work_dir) / f"bench_{seconds}.musicxml")
+        )
+    case("musicxml", export, needs=["quantize_notes"])
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,30,120", help="input lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip", default="", help="comma-separated case names to skip (e.g. separate_polyphonic)")
+    parser.add_argument("--output", help="JSON file (default: benchmarks/<commit>.json)")
+    args = parser.parse_args()
+
+    sizes = [float(s) for s in args.sizes.split(",") if s]
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    commit = _git_commit()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for seconds in sizes:
+            results.extend(benchmark_size(seconds, args.repeats, skip, work_dir))
+
+    report = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "tempo_bpm": TEMPO,
+        "sizes_sec": sizes,
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{(commit or 'local')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"[INFO] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# test_note_quantization.py
+"""
+Grid choice, ties and tempo reconciliation of note quantization
+Run with: python -m pytest test_note_quantization.py
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from backend.services.monophonic.preprocess_audio import preprocess_audio
+from backend.services.monophonic.note_quantization import (
+    quantize_notes,
+    quantize_notes_columnar,
+    _beat_grid,
+    _beat_positions,
+)
+
+# 60 BPM: one beat per second, so times are beat positions
+TEMPO = 60.0
+
+
+def _notes(*spans):
+    return [{"start": s, "end": e, "pitch": 440.0} for s, e in spans]
+
+
+def test_triplet_grid_chosen_for_triplet_onsets():
+    notes = quantize_notes(_notes((0.0, 1 / 3), (1 / 3, 2 / 3), (2 / 3, 1.0)), TEMPO)
+    assert [n["triplet"] for n in notes] == [True, True, True]
+    assert [n["duration_name"] for n in notes] == ["eighth_triplet"] * 3
+
+
+def test_binary_grid_chosen_for_binary_onsets():
+    notes = quantize_notes(_notes((0.0, 0.5), (0.5, 0.75), (0.75, 1.0)), TEMPO)
+    assert [n["triplet"] for n in notes] == [False, False, False]
+    assert [n["duration_name"] for n in notes] == ["eighth", "sixteenth", "sixteenth"]
+
+
+def test_triplets_disabled_stays_binary():
+    notes = quantize_notes(_notes((0.0, 1 / 3), (1 / 3, 2 / 3)), TEMPO, triplets=False)
+    assert not any(n["triplet"] for n in notes)
+
+
+def test_long_duration_is_tied():
+    (note,) = quantize_notes(_notes((0.0, 5.0)), TEMPO)
+    assert note["duration_name"] == "whole+quarter"
+    assert note["tie"] == ["whole", "quarter"]
+    assert note["quantized_beats"] == 5.0
+
+
+def test_single_value_has_no_tie():
+    (note,) = quantize_notes(_notes((0.0, 1.5)), TEMPO)
+    assert note["duration_name"] == "dotted_quarter"
+    assert note["tie"] == []
+
+
+def test_triplet_note_clipped_to_binary_onset_is_unknown():
+    # The triplet note is cut at the next (binary) onset: 11/12 beat has no
+    # triplet decomposition
+    notes = quantize_notes(_notes((1 / 3, 4 / 3), (1.25, 2.0)), TEMPO)
+    assert notes[0]["triplet"] and not notes[1]["triplet"]
+    assert np.isclose(notes[0]["quantized_beats"], 11 / 12)
+    assert notes[0]["duration_name"] == "unknown"
+    assert notes[1]["duration_name"] == "dotted_eighth"
+
+
+def test_duration_outside_tolerance_is_unknown():
+    # Held for 2 beats but the next onset cuts it to 1
+    notes = quantize_notes(_notes((0.0, 2.0), (1.0, 2.0)), TEMPO)
+    assert notes[0]["quantized_beats"] == 1.0
+    assert notes[0]["duration_name"] == "unknown"
+    assert notes[1]["duration_name"] == "quarter"
+
+
+def test_rest_before_and_onsets():
+    notes = quantize_notes(_notes((0.0, 1.0), (2.0, 3.0)), TEMPO)
+    assert [n["onset_beats"] for n in notes] == [0.0, 2.0]
+    assert [n["rest_before_beats"] for n in notes] == [0.0, 1.0]
+
+
+def test_columnar_shapes():
+    columns = quantize_notes_columnar([0.0, 1.0], [1.0, 2.0], [440.0, 494.0], TEMPO)
+    assert columns["value_counts"].shape[0] == 2
+    assert columns["quantized_beats"].tolist() == [1.0, 1.0]
+
+
+def test_beat_grid_same_tempo_uses_beats():
+    beats = np.arange(8, dtype=float)
+    assert np.array_equal(_beat_grid(beats, 60.0), beats)
+
+
+def test_beat_grid_double_tempo_adds_midpoints():
+    beats = np.arange(8, dtype=float)
+    grid = _beat_grid(beats, 120.0)
+    assert np.allclose(grid, np.arange(15) / 2.0)
+
+
+def test_beat_grid_half_tempo_drops_every_other_beat():
+    beats = np.arange(8, dtype=float) / 2.0
+    assert np.array_equal(_beat_grid(beats, 60.0), beats[::2])
+
+
+def test_beat_grid_falls_back_to_uniform():
+    beats = np.arange(8, dtype=float)
+    assert _beat_grid(beats, 90.0) is None          # 1.5x: no reconciliation
+    assert _beat_grid(beats[:3], 60.0) is None      # too few beats
+    assert _beat_grid(beats[::-1], 60.0) is None    # not increasing
+
+
+def test_beat_positions_follow_tempo_drift():
+    # Beats slow down slightly; each tracked beat still lands on an integer
+    beats = np.concatenate([[0.0], np.cumsum(np.linspace(1.0, 1.05, 8))])
+    positions = _beat_positions(beats, TEMPO, beats)
+    assert np.allclose(positions, np.arange(len(beats)))
+
+    # Outside the grid the tempo extrapolates
+    outside = _beat_positions(np.array([-1.0, beats[-1] + 2.0]), TEMPO, beats)
+    assert np.allclose(outside, [-1.0, len(beats) + 1.0])
+
+
+def test_beat_offset_aligns_trimmed_notes_with_tracked_beats():
+    # 1.3 s of leading silence: beats are tracked on the full signal, notes
+    # on the trimmed one (eighth notes at 60 BPM starting at its first sample)
+    beats = 1.3 + np.arange(12, dtype=float)
+    spans = [(i * 0.5, (i + 1) * 0.5) for i in range(8)]
+
+    notes = quantize_notes(_notes(*spans), TEMPO, beats=beats, beat_offset=1.3)
+    assert [n["onset_beats"] for n in notes] == [i * 0.5 for i in range(8)]
+    assert [n["duration_name"] for n in notes] == ["eighth"] * 8
+    assert not any(n["triplet"] for n in notes)
+
+
+def test_beat_values_are_rounded():
+    beats = 0.15 + np.arange(12, dtype=float)
+    notes = quantize_notes(_notes((0.0, 1.0), (1.0, 2.0)), TEMPO, beats=beats, beat_offset=0.15)
+    assert [n["quantized_beats"] for n in notes] == [1.0, 1.0]
+    assert [n["onset_beats"] for n in notes] == [0.0, 1.0]
+
+
+def test_preprocess_reports_trimmed_leading_silence():
+    sr = 16000
+    tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(sr) / sr)
+    y = np.concatenate([np.zeros(int(1.3 * sr)), tone]).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lead_in.wav")
+        sf.write(path, y, sr)
+        trimmed, out_sr, offset = preprocess_audio(path, "unknown", return_offset=True)
+
+    assert out_sr == sr
+    # trim() works on 2048-sample frames, so the cut lands up to a frame early
+    assert 1.3 - 2048 / sr <= offset <= 1.3
+    assert len(trimmed) < len(y)
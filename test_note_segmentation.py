@@ -0,0 +1,60 @@
+# test_note_segmentation.py
+"""
+Vectorized frames_to_notes against the original per-frame loop
+Run with: python -m pytest test_note_segmentation.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+
+from benchmark_note_segmentation import frames_to_notes_loop, synth_track
+from backend.services.monophonic.note_segmentation import frames_to_notes, frames_to_notes_columnar
+
+
+def test_matches_loop_reference():
+    t, freq, conf = synth_track(minutes=0.5)
+    assert frames_to_notes(t, freq, conf) == frames_to_notes_loop(t, freq, conf)
+
+
+def test_matches_loop_reference_with_custom_thresholds():
+    t, freq, conf = synth_track(minutes=0.5)
+    kwargs = {"conf_thresh": 0.8, "pitch_change_thresh": 20.0, "min_note_duration": 0.15}
+    assert frames_to_notes(t, freq, conf, **kwargs) == frames_to_notes_loop(t, freq, conf, **kwargs)
+
+
+def test_track_ending_voiced_and_unvoiced_edges():
+    t = np.arange(40) * 0.01
+    freq = np.full(40, 440.0)
+    conf = np.full(40, 0.9)
+    conf[:3] = 0.1        # starts unvoiced
+    freq[20:] = 660.0     # jump, last note runs to the final frame
+    assert frames_to_notes(t, freq, conf) == frames_to_notes_loop(t, freq, conf)
+    assert [n["pitch"] for n in frames_to_notes(t, freq, conf)] == [440.0, 660.0]
+
+
+def test_empty_and_unvoiced_tracks():
+    t = np.arange(10) * 0.01
+    assert frames_to_notes([], [], []) == []
+    assert frames_to_notes(t, np.full(10, np.nan), np.zeros(10)) == []
+
+
+def test_cents_threshold_splits_low_semitones():
+    # A2 → A#2 is 100 cents but only ~6.5 Hz: the Hz threshold keeps one note
+    t = np.arange(60) * 0.01
+    freq = np.where(np.arange(60) < 30, 110.0, 110.0 * 2 ** (1 / 12))
+    conf = np.full(60, 0.9)
+
+    assert len(frames_to_notes(t, freq, conf)) == 1
+    notes = frames_to_notes(t, freq, conf, pitch_change_cents=50.0)
+    assert [n["start"] for n in notes] == [0.0, 0.3]
+
+
+def test_columnar_result():
+    t, freq, conf = synth_track(minutes=0.1)
+    notes = frames_to_notes_columnar(t, freq, conf)
+    assert len(notes["start"]) == len(notes["end"]) == len(notes["pitch"])
+    assert np.all(notes["end"] >= notes["start"])
@@ -0,0 +1,76 @@
+# test_pitch_payload.py
+"""
+Columnar pitch payload layout and round trip
+Run with: python -m pytest test_pitch_payload.py
+"""
+
+import json
+
+import numpy as np
+
+from backend.services.monophonic.pitch_payload import (
+    encode_pitch_track,
+    decode_pitch_track,
+    to_bytes,
+    make_preview,
+)
+
+
+def _track(n=200):
+    time = np.arange(n) * 0.01
+    frequency = 220.0 + np.arange(n, dtype=np.float64)
+    frequency[::7] = np.nan
+    confidence = np.linspace(0.0, 1.0, n)
+    return time, frequency, confidence
+
+
+def test_base64_round_trip():
+    time, frequency, confidence = _track()
+    payload = json.loads(json.dumps(encode_pitch_track(time, frequency, confidence, 16000)))
+
+    t, f, c = decode_pitch_track(payload)
+    assert "time" not in payload  # uniform grid → start/step only
+    assert np.allclose(t, time)
+    assert np.array_equal(np.isnan(f), np.isnan(frequency))
+    assert np.allclose(f, frequency.astype(np.float32), equal_nan=True)
+    assert np.allclose(c, confidence.astype(np.float32))
+    assert payload["frame_count"] == 200
+    assert payload["voiced_count"] == int(np.count_nonzero(~np.isnan(frequency)))
+
+
+def test_list_round_trip_uses_null_for_unvoiced():
+    time, frequency, confidence = _track(20)
+    payload = encode_pitch_track(time, frequency, confidence, 16000, encoding="list")
+    assert payload["frequency"][0] is None
+
+    _, f, _ = decode_pitch_track(payload)
+    assert np.array_equal(np.isnan(f), np.isnan(frequency))
+
+
+def test_non_uniform_time_is_stored():
+    time, frequency, confidence = _track(10)
+    time[5:] += 0.5
+    payload = encode_pitch_track(time, frequency, confidence, 16000)
+    t, _, _ = decode_pitch_track(payload)
+    assert "time" in payload
+    assert np.allclose(t, time)
+
+
+def test_bytes_layout_frequencies_then_confidences():
+    time, frequency, confidence = _track(50)
+    raw = to_bytes(encode_pitch_track(time, frequency, confidence, 16000))
+    assert len(raw) == 2 * 50 * 4
+
+    columns = np.frombuffer(raw, dtype="<f4").reshape(2, 50)
+    assert np.allclose(columns[0], frequency.astype(np.float32), equal_nan=True)
+    assert np.isnan(columns[0][0])  # NaN = unvoiced
+    assert np.allclose(columns[1], confidence.astype(np.float32))
+
+
+def test_preview_buckets():
+    time, frequency, confidence = _track(1000)
+    preview = make_preview(time, frequency, confidence, points=10)
+    assert len(preview["time"]) == len(preview["frequency"]) == 10
+
+    frequency[:] = np.nan
+    assert make_preview(time, frequency, confidence, points=10)["frequency"] == [None] * 10
@@ -0,0 +1,75 @@
+# test_pitch_pyramid.py
+"""
+Pitch pyramid level selection and range queries
+Run with: python -m pytest test_pitch_pyramid.py
+"""
+
+import numpy as np
+
+from backend.services.monophonic.pitch_pyramid import PitchPyramid, PYRAMID_FACTOR
+from backend.services.monophonic.pitch_payload import encode_pitch_track
+
+STEP = 0.01
+
+
+def _pyramid(n=4096):
+    frequency = 100.0 + np.arange(n, dtype=np.float64)
+    frequency[:64] = np.nan          # unvoiced lead-in
+    confidence = np.full(n, 0.5)
+    return PitchPyramid(frequency, confidence, start=0.0, step=STEP), frequency
+
+
+def test_levels_shrink_by_factor():
+    pyramid, _ = _pyramid()
+    lengths = [len(level["min"]) for level in pyramid.levels]
+    assert lengths[0] == 4096 and lengths[-1] == 1
+    assert all(a == b * PYRAMID_FACTOR for a, b in zip(lengths, lengths[1:]))
+
+
+def test_full_resolution_when_it_fits():
+    pyramid, frequency = _pyramid()
+    result = pyramid.query(1.0, 2.0, resolution=1000)
+    assert result["level"] == 0
+    assert len(result["time"]) == 100
+    assert np.allclose(result["mean"], frequency[100:200])
+
+
+def test_zoomed_out_picks_coarser_level():
+    pyramid, frequency = _pyramid()
+    result = pyramid.query(resolution=100)
+    # Level 2 would need 4096 / 4**2 = 256 buckets; level 3 has 64
+    assert result["level"] == 3
+    assert len(result["time"]) == 64
+    size = PYRAMID_FACTOR ** result["level"]
+    assert result["bucket_seconds"] == size * STEP
+
+    # Bucket min/max/mean summarize the voiced frames they cover
+    voiced = frequency[size:2 * size]
+    assert result["min"][1] == round(float(np.nanmin(voiced)), 2)
+    assert result["max"][1] == round(float(np.nanmax(voiced)), 2)
+    assert result["mean"][1] == round(float(np.nanmean(voiced)), 2)
+
+
+def test_unvoiced_buckets_are_null():
+    pyramid, _ = _pyramid()
+    result = pyramid.query(0.0, 0.64, resolution=1000)
+    assert result["level"] == 0
+    assert result["min"] == [None] * 64
+    assert result["confidence"] == [0.5] * 64
+
+
+def test_range_is_clamped_to_track():
+    pyramid, _ = _pyramid()
+    result = pyramid.query(-5.0, 1000.0, resolution=10000)
+    assert result["start"] == 0.0
+    assert np.isclose(result["end"], 4096 * STEP)
+    assert len(result["time"]) == 4096
+
+
+def test_from_payload_matches_direct_build():
+    time = np.arange(500) * STEP
+    frequency = 300.0 + np.sin(time) * 10
+    confidence = np.full(500, 0.9)
+    pyramid = PitchPyramid.from_payload(encode_pitch_track(time, frequency, confidence, 16000))
+    direct = PitchPyramid(frequency, confidence, 0.0, STEP)
+    assert pyramid.query(resolution=50) == direct.query(resolution=50)